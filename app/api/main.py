@@ -1,20 +1,44 @@
-from fastapi import FastAPI, HTTPException
+import time
+_IMPORT_T0 = time.perf_counter()
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from app.core.schema import QuestionRequest, AskResponse, IngestJsonRequest, IngestJsonResponse, SourcesResponse, HealthResponse
+from fastapi.responses import RedirectResponse, StreamingResponse, Response, JSONResponse
+from app.core.schema import QuestionRequest, AskBatchRequest, AskResponse, IngestJsonRequest, IngestJsonResponse, IngestJobResponse, SourcesResponse, HealthResponse
 from app.core.config import settings
-from app.ingest.indexer import build_index_from_dir, build_index_from_payload
-from app.vectorstore.chroma_store import get_vectorstore
-from app.rag.retriever import retrieve_with_scores
-from app.rag.generator import generate_answer
+from app.core.startup import STARTUP, warm_up_in_background
+from app.ingest.uploads import save_stream, iter_upload, UploadError, UploadSizeLimit
+from app.ingest.jobs import get_jobs
+from app.rag.retriever import retrieve_with_scores, retrieve_many, index_version, query_embedding
+from app.rag.fusion import FusionParams
+from app.rag.filters import SearchFilter
+from app.rag.lexical_index import get_bm25_index
+from app.rag.cache import LRUCache, SemanticCache, normalize_question
+from app.rag.reranker import get_reranker
+from app.rag.generator import agenerate_answer, astream_answer
+from app.core.concurrency import run_blocking
+from app.core.clients import aclose as close_http_clients, on_close
+from app.core import metrics
+from app.core.metrics import timed, observe_request
+from app.ingest.upsert import estimate_tokens
 from app.rag.prompt import build_prompt
 from datetime import datetime
-import time
+import json, asyncio
 
 from time import perf_counter
-from typing import Dict
+from typing import Dict, Any, List, Optional
+# indexer (loader PDF/OCR) dan chromadb diimport saat dipakai; lihat preload() untuk mode fork
+STARTUP.record("import", time.perf_counter() - _IMPORT_T0)
+
 _VS = None
-_METRICS: Dict[str, float | int] = {"q_count": 0, "last_latency_ms": 0, "avg_latency_ms": 0}
+# cache jawaban (opsional): key memuat versi index, jadi re-index otomatis membuat entry lama tidak terpakai
+_ANSWERS = LRUCache(maxsize=settings.ANSWER_CACHE_SIZE, ttl=settings.ANSWER_CACHE_TTL) if settings.ANSWER_CACHE_TTL > 0 else None
+# cache jawaban semantik (opsional): pertanyaan yang mirip (embedding query dari vector store) memakai jawaban lama
+_SEMANTIC = SemanticCache(settings.SEMANTIC_CACHE_SIZE, settings.SEMANTIC_CACHE_TTL,
+                          settings.SEMANTIC_CACHE_THRESHOLD) if settings.SEMANTIC_CACHE else None
+
+def get_vectorstore(create_if_missing: bool = True):
+    from app.vectorstore.chroma_store import get_vectorstore as _get
+    return _get(create_if_missing=create_if_missing)
 
 def _vs():
     global _VS
@@ -22,7 +46,44 @@ def _vs():
         _VS = get_vectorstore(create_if_missing=False)
     return _VS
 
+@on_close
+def _reset_vs():
+    # embeddings OpenAI di vector store memegang pool HTTP yang ditutup saat shutdown
+    global _VS
+    _VS = None
+
 app = FastAPI(title="RAG Chatbot API", version="1.0.0")
+
+def preload():
+    """
+    Import chromadb/langchain + load bobot CrossEncoder sekali. `python -m app.serve` memanggil ini di parent
+    sebelum fork (worker berbagi halaman model, copy-on-write). Client Chroma (SQLite) sengaja tidak dibuka
+    di sini: koneksi tidak aman dibawa lewat fork, jadi dibuat per worker saat warm-up.
+    """
+    with STARTUP.phase("imports_chroma"):
+        import app.vectorstore.chroma_store  # noqa: F401
+        from langchain_chroma.vectorstores import maximal_marginal_relevance  # noqa: F401
+    if settings.RERANK_WARMUP:
+        with STARTUP.phase("reranker_load"):
+            get_reranker().model
+
+def _warm_up():
+    # vector store bersama + satu predict CrossEncoder sebelum /ready hijau, bukan di request pertama
+    with STARTUP.phase("vector_store"):
+        _vs()
+    if settings.RERANK_WARMUP:
+        with STARTUP.phase("reranker_warmup"):
+            get_reranker().warmup()
+
+@app.on_event("startup")
+def _warmup():
+    # server langsung menerima koneksi; /ready 503 sampai warm-up selesai
+    warm_up_in_background(_warm_up)
+
+@app.on_event("shutdown")
+async def _close_clients():
+    await close_http_clients()
+
 @app.get("/", include_in_schema=False)
 def root():
     # Langsung arahkan ke Swagger UI
@@ -34,21 +95,52 @@ app.add_middleware(
     allow_origins=["*"], allow_credentials=True,
     allow_methods=["*"], allow_headers=["*"],
 )
+# upload yang Content-Length-nya melebihi UPLOAD_MAX_MB ditolak sebelum body dibaca
+app.add_middleware(UploadSizeLimit)
 
 @app.get("/health", response_model=HealthResponse)
-def health():
-    vs_exists = get_vectorstore(create_if_missing=False) is not None
-    return HealthResponse(status="ok", vector_index_ready=vs_exists, provider=settings.PROVIDER, model=settings.LLM_MODEL)
+async def health():
+    # pakai vector store bersama; tidak membuat PersistentClient + embedding baru per request
+    vs = _vs()
+    vs_exists = vs is not None and (await run_blocking(vs._collection.count)) > 0
+    version = await run_blocking(index_version, vs) if vs_exists else None
+    return HealthResponse(status="ok", vector_index_ready=vs_exists, provider=settings.PROVIDER, model=settings.LLM_MODEL,
+                          index_version=version, semantic_cache=_SEMANTIC.stats() if _SEMANTIC is not None else None)
 
-@app.get("/sources", response_model=SourcesResponse)
-def sources():
+@app.get("/ready")
+def ready():
+    # readiness probe: 200 setelah vector store dibuka dan CrossEncoder di-warm-up (liveness tetap /health)
+    return JSONResponse(STARTUP.status(), status_code=200 if STARTUP.ready else 503)
+
+def _reload_vs() -> Optional[str]:
+    global _VS
     vs = get_vectorstore(create_if_missing=False)
+    if vs is None:
+        return None  # belum ada koleksi (belum pernah ingest)
+    get_bm25_index(vs)  # muat ulang BM25 dari disk jika ingest proses lain sudah menyimpan versi baru
+    # swap atomik: request yang sedang jalan tetap memegang instance lama sampai selesai
+    _VS = vs
+    return index_version(vs)
+
+@app.post("/reload")
+async def reload_index():
+    version = await run_blocking(_reload_vs)
+    return {"status": "ok" if version is not None else "no_index", "index_version": version}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # histogram latency per request & per tahap (embedding, vector_search, bm25, rerank, prompt_build, generation)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/sources", response_model=SourcesResponse)
+async def sources():
+    vs = _vs()
     if vs is None:
         return SourcesResponse(documents=[], vector_store="Chroma", total_chunks=0)
     # Chroma tidak expose daftar dokumen secara langsung;
     # namun kita bisa baca metadatas via collection.get()
     coll = vs._collection
-    ids = coll.get(include=["metadatas"]).get("metadatas", [])
+    ids = (await run_blocking(coll.get, include=["metadatas"])).get("metadatas", [])
     files = {}
     for mlist in ids:
         for md in (mlist if isinstance(mlist, list) else [mlist]):
@@ -61,50 +153,146 @@ def sources():
     return SourcesResponse(documents=docs, vector_store="Chroma", total_chunks=total)
 
 @app.post("/ingest-json", response_model=IngestJsonResponse)
-def ingest_json(payload: IngestJsonRequest):
+async def ingest_json(payload: IngestJsonRequest):
     try:
-        stats = build_index_from_payload(payload)
+        from app.ingest.indexer import build_index_from_payload
+        stats = await run_blocking(build_index_from_payload, payload)
         return IngestJsonResponse(status="ok", indexed_files=stats["files"], vector_store="Chroma", total_chunks=stats["total_chunks"])
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/ask", response_model=AskResponse)
-def ask(req: QuestionRequest):
-    vs = _vs()
-    if vs is None:
-        raise HTTPException(status_code=400, detail="no_index: Upload & build index dulu (gunakan /ingest-json atau CLI).")
+def _submit_ingest(saved: List[Dict[str, Any]]) -> IngestJobResponse:
+    from app.ingest.indexer import build_index_from_files
+    job = get_jobs().submit(saved, lambda: build_index_from_files(saved))
+    return IngestJobResponse(**job.to_dict())
 
-    t0 = time.time()
-    # Ambil dokumen relevan + skor (0..1)
-    docs_scores = retrieve_with_scores(vs, req.question, top_k=req.top_k)
-    contexts = [ds[0] for ds in docs_scores]
-    scores = [float(ds[1]) for ds in docs_scores] if docs_scores else []
-    avg_sim = sum(scores)/len(scores) if scores else 0.0
+@app.post("/ingest/upload", response_model=IngestJobResponse, status_code=202)
+async def ingest_upload(files: List[UploadFile] = File(...)):
+    """
+    Upload multipart: tiap file disalin ke DATA_DIR per potongan UPLOAD_CHUNK_BYTES (sha256 sambil jalan),
+    lalu di-index sebagai job background. Pantau lewat GET /ingest/jobs/{job_id}.
+    Body multipart sudah di-spool Starlette ke file sementara sebelum handler ini jalan; untuk file besar
+    pakai PUT /ingest/upload/{filename} yang di-stream langsung.
+    """
+    saved = []
+    try:
+        for f in files:
+            saved.append(await save_stream(f.filename, iter_upload(f)))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _submit_ingest(saved)
 
-    # Susun prompt
-    prompt = build_prompt(contexts, req.question)
+@app.put("/ingest/upload/{filename}", response_model=IngestJobResponse, status_code=202)
+async def ingest_upload_raw(filename: str, request: Request):
+    # body mentah (mis. curl -T file.pdf / Transfer-Encoding: chunked) di-stream langsung tanpa parsing multipart
+    try:
+        saved = [await save_stream(filename, request.stream())]
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _submit_ingest(saved)
+
+@app.get("/ingest/jobs/{job_id}", response_model=IngestJobResponse)
+def ingest_job(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return IngestJobResponse(**job.to_dict())
+
+@app.get("/ingest/jobs", response_model=List[IngestJobResponse])
+def ingest_jobs():
+    return [IngestJobResponse(**j.to_dict()) for j in get_jobs().list()]
 
-    # Generate jawaban dari LLM
-    answer_text = generate_answer(prompt, temperature=req.temperature, max_tokens=req.max_tokens)
+def _fusion(req) -> FusionParams:
+    # bobot fusion per request; field yang kosong diisi default dari .env
+    return FusionParams.resolve(**(req.fusion.model_dump() if req.fusion else {}))
 
+def _filter(req) -> Optional[SearchFilter]:
+    # scope source / tipe file / halaman; dipush ke where Chroma + kandidat BM25 (lihat app/rag/filters.py)
+    try:
+        return SearchFilter.resolve(**req.filter.model_dump()) if req.filter else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _semantic_get(vs, question: str, version: str, scope: tuple, stats: Dict[str, Any]):
+    """(sources, answer, avg_sim) dari pertanyaan lama yang cukup mirip, atau None; kemiripannya dicatat di stats."""
+    hit = _SEMANTIC.get(query_embedding(vs, question, stats), scope, version)
+    stats["cache"]["semantic"] = "hit" if hit is not None else "miss"
+    if hit is None:
+        return None
+    stats["semantic"] = {"similarity": round(hit.similarity, 4), "question": hit.question}
+    return hit.value
+
+def _semantic_set(vs, question: str, version: str, scope: tuple, value: tuple):
+    _SEMANTIC.set(query_embedding(vs, question, {}), scope, value, question, version)
+
+def _context_sources(contexts) -> List[str]:
     # Siapkan context_sources yang rapi
     sources = []
     for d in contexts:
         md = d.metadata or {}
         src = md.get("source", "unknown")
-        page = md.get("page")
+        page, page_end = md.get("page"), md.get("page_end")
         line_start = md.get("line_start")
         line_end = md.get("line_end")
         if page is not None:
-            label = f"{src}: page {page}"
+            label = f"{src}: page {page}" if page_end in (None, page) else f"{src}: pages {page}–{page_end}"
         elif line_start is not None and line_end is not None:
             label = f"{src}: lines {line_start}–{line_end}"
         else:
             label = f"{src}"
         if label not in sources:
             sources.append(label)
+    return sources
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(req: QuestionRequest):
+    vs = _vs()
+    if vs is None:
+        raise HTTPException(status_code=400, detail="no_index: Upload & build index dulu (gunakan /ingest-json atau CLI).")
+
+    flt = _filter(req)
+    t0 = time.time()
+    stats: Dict[str, Any] = {"cache": {}, "timings_ms": {}}
+    timings = stats["timings_ms"]
+    try:
+        version = await run_blocking(index_version, vs)
+        fusion = _fusion(req)
+        answer_key = (normalize_question(req.question), req.top_k, req.temperature, settings.LLM_MODEL, version, fusion, flt)
+        cached = _ANSWERS.get(answer_key) if _ANSWERS is not None else None
+        stats["cache"]["answer"] = "hit" if cached is not None else ("miss" if _ANSWERS is not None else "disabled")
+        semantic_scope = (req.top_k, req.temperature, settings.LLM_MODEL, fusion, flt)
+        if cached is None and _SEMANTIC is not None:
+            cached = await run_blocking(_semantic_get, vs, req.question, version, semantic_scope, stats)
+
+        if cached is not None:
+            sources, answer_text, avg_sim = cached
+        else:
+            # Ambil dokumen relevan + skor (0..1) — retrieval + rerank blocking, jalan di executor terbatas
+            docs_scores = await run_blocking(retrieve_with_scores, vs, req.question, top_k=req.top_k, stats=stats, fusion=fusion,
+                                             flt=flt)
+            contexts = [ds[0] for ds in docs_scores]
+            scores = [float(ds[1]) for ds in docs_scores] if docs_scores else []
+            avg_sim = sum(scores)/len(scores) if scores else 0.0
+
+            # Susun prompt
+            with timed(timings, "prompt_build"):
+                prompt = build_prompt(contexts, req.question, scores, max_tokens=req.max_tokens)
+
+            # Generate jawaban dari LLM
+            with timed(timings, "generation"):
+                answer_text = await agenerate_answer(prompt, temperature=req.temperature, max_tokens=req.max_tokens)
+
+            sources = _context_sources(contexts)
+            if _ANSWERS is not None:
+                _ANSWERS.set(answer_key, (sources, answer_text, avg_sim))
+            if _SEMANTIC is not None:
+                await run_blocking(_semantic_set, vs, req.question, version, semantic_scope, (sources, answer_text, avg_sim))
+    except Exception:
+        observe_request("/ask", time.time() - t0, timings, stats["cache"], status="error")
+        raise
 
     latency_ms = int((time.time() - t0) * 1000)
+    observe_request("/ask", time.time() - t0, timings, stats["cache"])
     return AskResponse(
         question=req.question,
         context_sources=sources,
@@ -117,5 +305,223 @@ def ask(req: QuestionRequest):
             "top_k": req.top_k,
             "avg_similarity": round(avg_sim, 3),
             "provider": settings.PROVIDER,
+            "index_version": version,
+            "cache": stats["cache"],
+            "semantic_cache": stats.get("semantic"),
+            "rerank_ms": stats.get("rerank_ms"),
+            "rerank_skipped": stats.get("rerank_skipped"),
+            "filter_chunks": stats.get("filter_chunks"),
+            "timings_ms": timings,
         }
     )
+
+@app.post("/ask-batch")
+async def ask_batch(req: AskBatchRequest):
+    """
+    NDJSON, satu baris per pertanyaan sesuai urutan selesai (`index` = posisi di `questions`), ditutup baris `summary`.
+    Retrieval dikerjakan per blok: embedding semua pertanyaan dalam satu batch dan rerank semua pasangan
+    (pertanyaan, kandidat) dalam satu panggilan CrossEncoder; panggilan LLM paralel dibatasi BATCH_LLM_CONCURRENCY.
+    """
+    vs = _vs()
+    if vs is None:
+        raise HTTPException(status_code=400, detail="no_index: Upload & build index dulu (gunakan /ingest-json atau CLI).")
+    if len(req.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"too_many_questions: maksimum {settings.BATCH_MAX_QUESTIONS} per request.")
+    flt = _filter(req)
+
+    async def lines():
+        t0 = time.time()
+        version = await run_blocking(index_version, vs)
+        fusion = _fusion(req)
+        sem = asyncio.Semaphore(max(1, settings.BATCH_LLM_CONCURRENCY))
+        done: asyncio.Queue = asyncio.Queue()
+        timings: Dict[str, float] = {}
+        counts = {"answer_cache_hits": 0, "retrieval_cache_hits": 0, "rerank_skipped": 0, "errors": 0}
+        tasks: List[asyncio.Task] = []
+
+        def result(i: int, question: str, sources: List[str], answer_text: str, avg_sim: float, cache: str, gen_ms=None):
+            return {"index": i, "question": question, "context_sources": sources, "answer": answer_text, "metadata": {
+                "model": settings.LLM_MODEL,
+                "latency_ms": int((time.time() - t0) * 1000),
+                "generation_ms": gen_ms,
+                "avg_similarity": round(avg_sim, 3),
+                "index_version": version,
+                "cache": {"answer": cache},
+            }}
+
+        async def answer(i: int, question: str, docs_scores, answer_key):
+            try:
+                contexts = [ds[0] for ds in docs_scores]
+                scores = [float(ds[1]) for ds in docs_scores]
+                avg_sim = sum(scores)/len(scores) if scores else 0.0
+                prompt = build_prompt(contexts, question, scores, max_tokens=req.max_tokens)
+                async with sem:
+                    t_gen = time.perf_counter()
+                    answer_text = await agenerate_answer(prompt, temperature=req.temperature, max_tokens=req.max_tokens)
+                    gen_ms = round((time.perf_counter() - t_gen) * 1000, 2)
+                timings["generation"] = round(timings.get("generation", 0.0) + gen_ms, 2)
+                sources = _context_sources(contexts)
+                if _ANSWERS is not None:
+                    _ANSWERS.set(answer_key, (sources, answer_text, avg_sim))
+                line = result(i, question, sources, answer_text, avg_sim, "miss" if _ANSWERS is not None else "disabled", gen_ms)
+            except Exception as e:
+                counts["errors"] += 1
+                line = {"index": i, "question": question, "error": str(e)}
+            await done.put(line)
+
+        async def produce():
+            todo = []
+            for i, q in enumerate(req.questions):
+                answer_key = (normalize_question(q), req.top_k, req.temperature, settings.LLM_MODEL, version, fusion, flt)
+                cached = _ANSWERS.get(answer_key) if _ANSWERS is not None else None
+                if cached is not None:
+                    counts["answer_cache_hits"] += 1
+                    await done.put(result(i, q, *cached, "hit"))
+                else:
+                    todo.append((i, q, answer_key))
+            for s in range(0, len(todo), max(1, settings.BATCH_RETRIEVAL_SIZE)):
+                block = todo[s:s + settings.BATCH_RETRIEVAL_SIZE]
+                bstats: Dict[str, Any] = {}
+                try:
+                    results = await run_blocking(retrieve_many, vs, [q for _, q, _ in block], top_k=req.top_k, stats=bstats,
+                                                 fusion=fusion, flt=flt)
+                    if len(results) != len(block):
+                        # zip di bawah akan diam-diam membuang pertanyaan yang tidak punya hasil
+                        raise RuntimeError(f"retrieve_many returned {len(results)} results for {len(block)} questions")
+                except Exception as e:
+                    for i, q, _ in block:
+                        counts["errors"] += 1
+                        await done.put({"index": i, "question": q, "error": str(e)})
+                    continue
+                for stage, ms in bstats.get("timings_ms", {}).items():
+                    timings[stage] = round(timings.get(stage, 0.0) + ms, 2)
+                counts["retrieval_cache_hits"] += bstats.get("cache", {}).get("retrieval_hits", 0)
+                counts["rerank_skipped"] += bstats.get("rerank_skipped", 0)
+                # LLM untuk blok ini mulai jalan selagi blok berikutnya di-retrieve
+                for (i, q, answer_key), docs_scores in zip(block, results):
+                    tasks.append(asyncio.create_task(answer(i, q, docs_scores, answer_key)))
+
+        producer = asyncio.create_task(produce())
+        emitted = set()
+        try:
+            while len(emitted) < len(req.questions):
+                # producer ikut ditunggu: jika gagal di luar try per blok, baris yang kurang tidak akan pernah datang
+                getter = asyncio.ensure_future(done.get())
+                await asyncio.wait({getter} if producer.done() else {getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    line = getter.result()
+                    emitted.add(line["index"])
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+                    continue
+                getter.cancel()
+                if producer.exception() is not None:
+                    # jawaban yang sudah jalan tetap dikirim, pertanyaan sisanya dilaporkan error
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    while not done.empty():
+                        line = done.get_nowait()
+                        emitted.add(line["index"])
+                        yield json.dumps(line, ensure_ascii=False) + "\n"
+                    for i, q in enumerate(req.questions):
+                        if i not in emitted:
+                            counts["errors"] += 1
+                            yield json.dumps({"index": i, "question": q, "error": str(producer.exception())}, ensure_ascii=False) + "\n"
+                    break
+        finally:
+            # client putus di tengah jalan → hentikan retrieval & panggilan LLM yang tersisa
+            for t in [producer, *tasks]:
+                t.cancel()
+        observe_request("/ask-batch", time.time() - t0, timings)
+        yield json.dumps({"summary": {
+            "questions": len(req.questions),
+            "latency_ms": int((time.time() - t0) * 1000),
+            "index_version": version,
+            "timings_ms": timings,
+            **counts,
+        }}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream(req: QuestionRequest):
+    """
+    Server-Sent Events: `sources` (context_sources) dulu, lalu `token` per potongan jawaban,
+    ditutup `done` berisi metadata (ttft_ms, latency_ms, token counts). Error dikirim sebagai event `error`.
+    """
+    vs = _vs()
+    if vs is None:
+        raise HTTPException(status_code=400, detail="no_index: Upload & build index dulu (gunakan /ingest-json atau CLI).")
+    flt = _filter(req)
+
+    async def events():
+        t0 = time.time()
+        stats: Dict[str, Any] = {"cache": {}, "timings_ms": {}}
+        timings = stats["timings_ms"]
+        version = await run_blocking(index_version, vs)
+        fusion = _fusion(req)
+        answer_key = (normalize_question(req.question), req.top_k, req.temperature, settings.LLM_MODEL, version, fusion, flt)
+        cached = _ANSWERS.get(answer_key) if _ANSWERS is not None else None
+        stats["cache"]["answer"] = "hit" if cached is not None else ("miss" if _ANSWERS is not None else "disabled")
+        semantic_scope = (req.top_k, req.temperature, settings.LLM_MODEL, fusion, flt)
+        usage: Dict[str, Any] = {}
+        ttft_ms, n_chunks, parts = None, 0, []
+        try:
+            if cached is None and _SEMANTIC is not None:
+                cached = await run_blocking(_semantic_get, vs, req.question, version, semantic_scope, stats)
+            if cached is not None:
+                sources, answer_text, avg_sim = cached
+                prompt = ""
+                yield _sse("sources", {"context_sources": sources, "avg_similarity": round(avg_sim, 3)})
+                ttft_ms, n_chunks, parts = int((time.time() - t0) * 1000), 1, [answer_text]
+                yield _sse("token", {"text": answer_text})
+            else:
+                docs_scores = await run_blocking(retrieve_with_scores, vs, req.question, top_k=req.top_k, stats=stats, fusion=fusion,
+                                                 flt=flt)
+                contexts = [ds[0] for ds in docs_scores]
+                scores = [float(ds[1]) for ds in docs_scores] if docs_scores else []
+                avg_sim = sum(scores)/len(scores) if scores else 0.0
+                sources = _context_sources(contexts)
+                yield _sse("sources", {"context_sources": sources, "avg_similarity": round(avg_sim, 3)})
+
+                with timed(timings, "prompt_build"):
+                    prompt = build_prompt(contexts, req.question, scores, max_tokens=req.max_tokens)
+                t_gen = time.perf_counter()
+                async for text in astream_answer(prompt, temperature=req.temperature, max_tokens=req.max_tokens, usage=usage):
+                    if ttft_ms is None:
+                        ttft_ms = int((time.time() - t0) * 1000)
+                    n_chunks += 1
+                    parts.append(text)
+                    yield _sse("token", {"text": text})
+                timings["generation"] = round((time.perf_counter() - t_gen) * 1000, 2)
+                if _ANSWERS is not None:
+                    _ANSWERS.set(answer_key, (sources, "".join(parts), avg_sim))
+                if _SEMANTIC is not None:
+                    await run_blocking(_semantic_set, vs, req.question, version, semantic_scope, (sources, "".join(parts), avg_sim))
+        except Exception as e:
+            observe_request("/ask/stream", time.time() - t0, timings, stats["cache"], status="error")
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        observe_request("/ask/stream", time.time() - t0, timings, stats["cache"])
+
+        yield _sse("done", {"metadata": {
+            "model": settings.LLM_MODEL,
+            "retrieval_engine": "Chroma",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "ttft_ms": ttft_ms,
+            "latency_ms": int((time.time() - t0) * 1000),
+            "prompt_tokens": usage.get("prompt_tokens") or (estimate_tokens(prompt) if prompt else 0),
+            "completion_tokens": usage.get("completion_tokens") or n_chunks,
+            "top_k": req.top_k,
+            "provider": settings.PROVIDER,
+            "index_version": version,
+            "cache": stats["cache"],
+            "semantic_cache": stats.get("semantic"),
+            "rerank_ms": stats.get("rerank_ms"),
+            "timings_ms": timings,
+        }})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
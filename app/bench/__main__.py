@@ -0,0 +1,130 @@
+# app/bench/__main__.py
+"""
+Benchmark kualitas retrieval + latency.
+
+    python -m app.bench corpus --out bench_data --docs 200
+    python -m app.bench run --corpus bench_data --stack both --k 5 --json results.json
+    python -m app.bench compare baseline.json results.json
+    python -m app.bench chunking --corpus bench_data --repeat 20
+"""
+import os, sys, json, time, argparse, tempfile, platform
+from typing import Any, Dict, List
+
+def _print_run(r: Dict[str, Any]):
+    q, ing, lat = r["quality"], r["ingest"], r["latency_ms"]
+    recall = next(v for key, v in q.items() if key.startswith("recall@"))
+    print(f"== {r['stack']} {r['config']}")
+    print(f"   recall@{r['config']['k']}={recall:.3f}  mrr={q['mrr']:.3f}  queries={q['queries']}")
+    print(f"   ingest: {ing['chunks']} chunks in {ing['seconds']}s ({ing['chunks_per_s']} chunks/s)  "
+          f"peak RSS {r['peak_rss_mb']['after_queries']} MB")
+    for stage, s in lat.items():
+        print(f"   {stage:<14} p50={s['p50']:>9.3f}  p95={s['p95']:>9.3f}  p99={s['p99']:>9.3f} ms")
+
+def cmd_corpus(args):
+    from app.bench.corpus import generate_corpus
+    info = generate_corpus(args.out, n_docs=args.docs, facts_per_doc=args.facts, seed=args.seed)
+    print(f"Wrote {info['docs']} docs ({info['chars']} chars) and {info['queries']} queries to {args.out}")
+
+def cmd_run(args):
+    from app.bench.corpus import load_queries
+    queries = load_queries(args.queries or os.path.join(args.corpus, "queries.jsonl"), limit=args.limit)
+    docs_dir = os.path.join(args.corpus, "docs")
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    runs: List[Dict[str, Any]] = []
+    if args.stack in ("chroma", "both"):
+        from app.bench.runners import run_chroma
+        runs.append(run_chroma(docs_dir, queries, args.k, workdir, reranker=args.reranker))
+        _print_run(runs[-1])
+    if args.stack in ("faiss", "both"):
+        from app.bench.runners import run_faiss
+        runs.append(run_faiss(docs_dir, queries, args.k, workdir, index_type=args.index_type, embedder=args.embedder))
+        _print_run(runs[-1])
+    out = {"created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "corpus": args.corpus,
+           "python": sys.version.split()[0], "platform": platform.platform(), "runs": runs}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+        print(f"Saved {args.json}")
+
+def cmd_compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = {r["stack"]: r for r in json.load(f)["runs"]}
+    with open(args.new, encoding="utf-8") as f:
+        new = {r["stack"]: r for r in json.load(f)["runs"]}
+    for stack in [s for s in new if s in base]:
+        b, n = base[stack], new[stack]
+        print(f"== {stack}")
+        for key in n["quality"]:
+            if key != "queries":
+                print(f"   {key:<14} {b['quality'].get(key, 0):>9.4f} -> {n['quality'][key]:>9.4f}")
+        print(f"   {'chunks/s':<14} {b['ingest']['chunks_per_s']:>9} -> {n['ingest']['chunks_per_s']:>9}")
+        for stage in n["latency_ms"]:
+            if stage in b["latency_ms"]:
+                bp, np_ = b["latency_ms"][stage]["p95"], n["latency_ms"][stage]["p95"]
+                delta = (np_ - bp) / bp * 100 if bp else 0.0
+                print(f"   p95 {stage:<10} {bp:>9.3f} -> {np_:>9.3f} ms ({delta:+.1f}%)")
+
+def cmd_chunking(args):
+    # chunker linear (app/ingest/chunker.py) vs RecursiveCharacterTextSplitter pada teks korpus yang diulang
+    from app.ingest.chunker import split_text
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    docs_dir = os.path.join(args.corpus, "docs")
+    parts = []
+    for name in sorted(os.listdir(docs_dir)):
+        with open(os.path.join(docs_dir, name), encoding="utf-8") as f:
+            parts.append(f.read())
+    text = "\n\n".join(parts) * args.repeat
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.size, chunk_overlap=args.overlap, separators=["\n\n", "\n", " ", ""])
+    runs = {"linear": lambda: [c.text for c in split_text(text, args.size, args.overlap, unit="chars")],
+            "recursive": lambda: splitter.split_text(text)}
+    mb = len(text) / 1e6
+    print(f"== chunking {mb:.1f} MB, size={args.size} overlap={args.overlap}")
+    for name, fn in runs.items():
+        best, chunks = float("inf"), []
+        for _ in range(3):
+            t0 = time.perf_counter()
+            chunks = fn()
+            best = min(best, time.perf_counter() - t0)
+        print(f"   {name:<10} {best * 1000:>9.1f} ms  {mb / best:>7.1f} MB/s  {len(chunks)} chunks, "
+              f"avg {sum(map(len, chunks)) / max(1, len(chunks)):.0f} chars")
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m app.bench", description="RAG retrieval-quality & latency benchmark")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    c = sub.add_parser("corpus", help="buat korpus sintetis + query berlabel")
+    c.add_argument("--out", default="bench_data")
+    c.add_argument("--docs", type=int, default=100)
+    c.add_argument("--facts", type=int, default=8, help="fakta (= query) per dokumen")
+    c.add_argument("--seed", type=int, default=13)
+    c.set_defaults(fn=cmd_corpus)
+
+    r = sub.add_parser("run", help="jalankan benchmark")
+    r.add_argument("--corpus", default="bench_data")
+    r.add_argument("--queries", help="file JSONL query berlabel (default: <corpus>/queries.jsonl)")
+    r.add_argument("--limit", type=int, default=0, help="batasi jumlah query (0 = semua)")
+    r.add_argument("--stack", choices=["chroma", "faiss", "both"], default="both")
+    r.add_argument("--k", type=int, default=5)
+    r.add_argument("--reranker", choices=["fake", "cross-encoder"], default="fake")
+    r.add_argument("--embedder", choices=["fake", "st"], default="fake", help="embedder stack FAISS")
+    r.add_argument("--index-type", choices=["flat", "hnsw", "ivfpq"], default=None)
+    r.add_argument("--json", help="simpan hasil ke file JSON")
+    r.set_defaults(fn=cmd_run)
+
+    ch = sub.add_parser("chunking", help="kecepatan chunker linear vs RecursiveCharacterTextSplitter")
+    ch.add_argument("--corpus", default="bench_data")
+    ch.add_argument("--repeat", type=int, default=20, help="ulang teks korpus supaya dokumen besar")
+    ch.add_argument("--size", type=int, default=800)
+    ch.add_argument("--overlap", type=int, default=120)
+    ch.set_defaults(fn=cmd_chunking)
+
+    cp = sub.add_parser("compare", help="bandingkan dua file hasil")
+    cp.add_argument("base")
+    cp.add_argument("new")
+    cp.set_defaults(fn=cmd_compare)
+
+    args = ap.parse_args()
+    args.fn(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# app/bench/corpus.py
+# Korpus sintetis + query berlabel untuk benchmark (deterministik per seed).
+#
+# Format query set (JSONL, satu query per baris):
+#   {"id": "q00001", "query": "...", "relevant": [{"source": "doc_0001.txt", "contains": "..."}]}
+# Chunk dianggap relevan jika metadata `source` sama dan teks chunk memuat string `contains`,
+# jadi label tetap valid walau ukuran chunk / splitter berubah.
+import os, json, random
+from typing import Any, Dict, List
+
+_SYLLABLES = ["ka", "ri", "mo", "ta", "ne", "lu", "so", "vi", "da", "pe", "go", "ra", "mi", "zu", "be", "on", "el", "ar"]
+_FILLER = ("the report notes that the team reviewed the process and the results were shared "
+           "with every group during the quarterly meeting after several rounds of discussion").split()
+
+def _word(rng: random.Random, n: int = 3) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(n))
+
+def generate_corpus(out_dir: str, n_docs: int = 100, facts_per_doc: int = 8, filler_sentences: int = 6,
+                    seed: int = 13) -> Dict[str, Any]:
+    """
+    Tulis `n_docs` file .txt ke `out_dir/docs` dan query berlabel ke `out_dir/queries.jsonl`.
+    Tiap dokumen berisi beberapa "fakta" unik (entity, atribut, nilai) yang dikelilingi kalimat pengisi;
+    tiap fakta menghasilkan satu query yang jawabannya hanya ada di paragraf itu.
+    """
+    rng = random.Random(seed)
+    docs_dir = os.path.join(out_dir, "docs")
+    os.makedirs(docs_dir, exist_ok=True)
+    attributes = ["budget code", "launch city", "project lead", "server region", "license key", "partner firm"]
+    queries: List[Dict[str, Any]] = []
+    total_chars = 0
+    for d in range(n_docs):
+        name = f"doc_{d:04d}.txt"
+        topic = _word(rng, 2)
+        paras = []
+        for f in range(facts_per_doc):
+            entity = f"{_word(rng)} {_word(rng, 2)}"
+            attr = rng.choice(attributes)
+            value = f"{_word(rng, 4)}{rng.randint(10, 99)}"
+            filler = " ".join(" ".join(rng.sample(_FILLER, 8)) + "." for _ in range(filler_sentences))
+            paras.append(f"Section {f + 1} on {topic}. The {attr} of {entity} is {value}. {filler}")
+            queries.append({"id": f"q{len(queries) + 1:05d}", "query": f"What is the {attr} of {entity}?",
+                            "relevant": [{"source": name, "contains": value}]})
+        text = "\n\n".join(paras) + "\n"
+        total_chars += len(text)
+        with open(os.path.join(docs_dir, name), "w", encoding="utf-8") as fh:
+            fh.write(text)
+    rng.shuffle(queries)
+    save_queries(os.path.join(out_dir, "queries.jsonl"), queries)
+    return {"docs": n_docs, "queries": len(queries), "chars": total_chars, "docs_dir": docs_dir}
+
+def save_queries(path: str, queries: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as fh:
+        for q in queries:
+            fh.write(json.dumps(q, ensure_ascii=False) + "\n")
+
+def load_queries(path: str, limit: int = 0) -> List[Dict[str, Any]]:
+    out = []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                out.append(json.loads(line))
+                if limit and len(out) >= limit:
+                    break
+    return out
@@ -0,0 +1,137 @@
+# app/bench/runners.py
+# Runner benchmark untuk stack Chroma/hybrid (app.api) dan stack FAISS (app.server), memakai embedder lokal
+# dan LLM palsu supaya hasil bisa diulang tanpa API key.
+import os, time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from app.core.config import settings
+from app.core.fakes import FakeEmbeddings, FakeCrossEncoder, FakeStreamingLLM
+from app.core.metrics import timed
+from app.bench.scoring import first_relevant_rank, quality, latency_summary, peak_rss_mb
+
+def _ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 3)
+
+def _result(stack: str, config: Dict[str, Any], ingest: Dict[str, Any], ranks: List[Optional[int]], k: int,
+            samples: Dict[str, List[float]], rss_ingest: Optional[float]) -> Dict[str, Any]:
+    return {
+        "stack": stack,
+        "config": config,
+        "ingest": ingest,
+        "quality": {**quality(ranks, k), "queries": len(ranks)},
+        "latency_ms": latency_summary(samples),
+        "peak_rss_mb": {"after_ingest": rss_ingest, "after_queries": peak_rss_mb()},
+    }
+
+def run_chroma(docs_dir: str, queries: List[Dict[str, Any]], k: int, workdir: str, reranker: str = "fake") -> Dict[str, Any]:
+    """Ingest lewat app.ingest.indexer lalu query lewat retrieve_with_scores (MMR + BM25 + rerank) + LLM palsu."""
+    settings.DATA_DIR = docs_dir
+    settings.PERSIST_DIR = os.path.join(workdir, "chroma")
+    settings.EMBEDDINGS_PROVIDER = "fake"
+    settings.PROVIDER = "fake"
+    settings.EMBED_CACHE = False  # ukur embedding sungguhan, bukan cache dari run sebelumnya
+
+    from app.ingest.indexer import build_index_from_dir
+    from app.vectorstore.chroma_store import get_vectorstore
+    from app.rag.retriever import retrieve_with_scores
+    from app.rag.reranker import Reranker, set_reranker
+    from app.rag.prompt import build_prompt
+    from app.rag.generator import generate_answer
+    if reranker == "fake":
+        set_reranker(Reranker(model=FakeCrossEncoder(), batch_window_ms=0))
+
+    t0 = time.perf_counter()
+    stats = build_index_from_dir()
+    secs = time.perf_counter() - t0
+    ingest = {"docs": len(stats["files"]), "chunks": stats["total_chunks"], "seconds": round(secs, 3),
+              "chunks_per_s": round(stats["total_chunks"] / max(secs, 1e-9), 1)}
+    rss_ingest = peak_rss_mb()
+
+    vs = get_vectorstore()
+    samples: Dict[str, List[float]] = defaultdict(list)
+    ranks: List[Optional[int]] = []
+    for q in queries:
+        st: Dict[str, Any] = {}
+        t0 = time.perf_counter()
+        hits = retrieve_with_scores(vs, q["query"], top_k=k, stats=st)
+        timings = st.setdefault("timings_ms", {})
+        with timed(timings, "prompt_build"):
+            prompt = build_prompt([d for d, _ in hits], q["query"], [s for _, s in hits])
+        with timed(timings, "generation"):
+            generate_answer(prompt)
+        samples["total"].append(_ms(t0))
+        for stage, ms in timings.items():
+            samples[stage].append(ms)
+        ranks.append(first_relevant_rank([(d.page_content, d.metadata) for d, _ in hits], q["relevant"]))
+
+    config = {"k": k, "embedder": "fake", "reranker": reranker, "chunk_size": settings.CHUNK_SIZE,
+              "chunk_overlap": settings.CHUNK_OVERLAP}
+    return _result("chroma", config, ingest, ranks, k, samples, rss_ingest)
+
+class _FakeEncoder:
+    """Antarmuka encode() ala SentenceTransformer di atas FakeEmbeddings."""
+
+    def __init__(self, dim: int = 256):
+        self.emb = FakeEmbeddings(dim=dim)
+
+    def encode(self, texts, normalize_embeddings: bool = True, **kwargs):
+        return np.asarray(self.emb.embed_documents(list(texts)), dtype="float32")
+
+def run_faiss(docs_dir: str, queries: List[Dict[str, Any]], k: int, workdir: str, index_type: Optional[str] = None,
+              embedder: str = "fake", batch_size: int = 256) -> Dict[str, Any]:
+    """Ingest ala app/ingest.py (chunk_text → encode → index FAISS + chunk store) lalu query ala app/server.py."""
+    settings.EMBED_CACHE = False
+    from app.utils import load_documents, chunk_text, build_prompt
+    from app.utils import embedder as st_embedder
+    from app.faiss_index import build_index
+    from app.chunk_store import ChunkStore
+
+    model = _FakeEncoder() if embedder == "fake" else st_embedder()
+    names = sorted(n for n in os.listdir(docs_dir) if n.lower().endswith((".txt", ".md", ".pdf")))
+    ingest_stages: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    with timed(ingest_stages, "load_chunk"):
+        texts: List[str] = []
+        metas: List[Dict[str, Any]] = []
+        for name, raw in zip(names, load_documents([os.path.join(docs_dir, n) for n in names])):
+            for idx, ch in enumerate(chunk_text(raw)):
+                texts.append(ch)
+                metas.append({"source": name, "location": f"chunk {idx+1}"})
+    with timed(ingest_stages, "embedding"):
+        embs = np.vstack([np.asarray(model.encode(texts[i:i + batch_size], normalize_embeddings=True), dtype="float32")
+                          for i in range(0, len(texts), batch_size)])
+    with timed(ingest_stages, "index_build"):
+        index, info = build_index(embs, index_type)
+    store_dir = os.path.join(workdir, "faiss_chunks")
+    with timed(ingest_stages, "store_write"):
+        ChunkStore.write(store_dir, texts, metas)
+    secs = time.perf_counter() - t0
+    store = ChunkStore(store_dir)
+    ingest = {"docs": len(names), "chunks": len(texts), "seconds": round(secs, 3),
+              "chunks_per_s": round(len(texts) / max(secs, 1e-9), 1), "stages_ms": ingest_stages}
+    rss_ingest = peak_rss_mb()
+
+    llm = FakeStreamingLLM()
+    samples: Dict[str, List[float]] = defaultdict(list)
+    ranks: List[Optional[int]] = []
+    for q in queries:
+        timings: Dict[str, float] = {}
+        t0 = time.perf_counter()
+        with timed(timings, "embedding"):
+            q_emb = np.asarray(model.encode([q["query"]], normalize_embeddings=True), dtype="float32")
+        with timed(timings, "vector_search"):
+            _, I = index.search(q_emb, k)
+            hits = store.get(I[0])
+        with timed(timings, "prompt_build"):
+            prompt = build_prompt(q["query"], hits)
+        with timed(timings, "generation"):
+            llm.invoke(prompt)
+        samples["total"].append(_ms(t0))
+        for stage, ms in timings.items():
+            samples[stage].append(ms)
+        ranks.append(first_relevant_rank(hits, q["relevant"]))
+
+    config = {"k": k, "embedder": embedder, "index": info["factory"], "index_type": info["type"]}
+    return _result("faiss", config, ingest, ranks, k, samples, rss_ingest)
@@ -0,0 +1,46 @@
+# app/bench/scoring.py
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+def is_relevant(text: str, meta: Dict[str, Any], labels: Sequence[Dict[str, str]]) -> bool:
+    src = (meta or {}).get("source")
+    return any(src == lb["source"] and lb["contains"] in text for lb in labels)
+
+def first_relevant_rank(hits: Sequence[Tuple[str, Dict[str, Any]]], labels: Sequence[Dict[str, str]]) -> Optional[int]:
+    """Rank (1-based) chunk relevan pertama di hasil retrieval, None jika tidak ada."""
+    for rank, (text, meta) in enumerate(hits, 1):
+        if is_relevant(text, meta, labels):
+            return rank
+    return None
+
+def quality(ranks: List[Optional[int]], k: int) -> Dict[str, float]:
+    n = max(1, len(ranks))
+    return {
+        f"recall@{k}": round(sum(1 for r in ranks if r is not None and r <= k) / n, 4),
+        "mrr": round(sum(1.0 / r for r in ranks if r is not None) / n, 4),
+    }
+
+def latency_summary(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """{stage: [ms, ...]} → p50/p95/p99/mean per tahap."""
+    out = {}
+    for stage, xs in samples.items():
+        if not xs:
+            continue
+        a = np.asarray(xs, dtype=np.float64)
+        out[stage] = {"p50": round(float(np.percentile(a, 50)), 3), "p95": round(float(np.percentile(a, 95)), 3),
+                      "p99": round(float(np.percentile(a, 99)), 3), "mean": round(float(a.mean()), 3), "n": int(a.size)}
+    return out
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS proses ini sejak start (MB); None kalau platform tidak mendukung."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except Exception:
+            return None
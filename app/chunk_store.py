@@ -0,0 +1,358 @@
+"""
+Chunk store biner untuk stack FAISS, dibaca lewat memory-map (page cache dipakai bersama antar worker uvicorn).
+
+Layout direktori (storage/chunks/):
+    text.bin              blob UTF-8 semua chunk, berurutan sesuai id FAISS
+    text.off.npy          int64[n+1] offset byte chunk i = [off[i], off[i+1])
+    columns.json          kolom metadata -> encoding ("dict" | "int" | "float" | "json") + jumlah baris
+    dict:  meta.<col>.codes.npy int32[n] kode kamus per baris (-1 = tidak ada),
+           meta.<col>.vocab.bin nilai unik (JSON) + meta.<col>.vocab.off.npy sebagai offset
+    int/float: meta.<col>.num.npy float64[n] (NaN = tidak ada)
+    json:  meta.<col>.bin nilai JSON per baris + meta.<col>.off.npy (panjang 0 = tidak ada)
+
+Kamus hanya untuk kolom berkardinalitas rendah (source, type); kolom numerik (start_index, line_*, page)
+langsung jadi array, dan kolom string yang ternyata hampir unik per baris (location) dipindah ke json.
+Hanya baris top-k yang di-decode; tidak ada parsing di depan selain columns.json.
+"""
+import os, json, math, shutil, struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+# kolom string tetap pakai kamus sampai punya > DICT_MIN_VALUES nilai unik DAN lebih dari separuh barisnya unik
+DICT_MIN_VALUES = 256
+_MISSING = object()
+
+def _write_blob(path: Path, items: Sequence[bytes]):
+    off = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(path, "wb") as f:
+        for i, b in enumerate(items):
+            f.write(b)
+            off[i + 1] = off[i] + len(b)
+    np.save(str(path.with_suffix(".off.npy")), off)
+
+class _Blob:
+    def __init__(self, path: Path):
+        self.off = np.load(str(path.with_suffix(".off.npy")), mmap_mode="r")
+        size = os.path.getsize(path)
+        self.data = np.memmap(path, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.off) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.data[int(self.off[i]):int(self.off[i + 1])].tobytes()
+
+class _Array:
+    """Array fixed-width yang di-append per baris ke file mentah; header .npy ditulis saat finish()."""
+
+    def __init__(self, path: Path, code: str):
+        self.path, self.dtype = path, np.dtype(code)
+        self._pack = struct.Struct(code).pack
+        self._raw = path.with_name(path.name + ".raw")
+        self._f = open(self._raw, "wb")
+        self.n = 0
+
+    def append(self, x):
+        self._f.write(self._pack(x))
+        self.n += 1
+
+    def read(self) -> np.ndarray:
+        self._f.flush()
+        return np.memmap(self._raw, dtype=self.dtype, mode="r") if self.n else np.zeros(0, dtype=self.dtype)
+
+    def finish(self):
+        self._f.close()
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (self.n,)}
+        with open(self.path, "wb") as out, open(self._raw, "rb") as raw:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(raw, out)
+        self._raw.unlink()
+
+    def discard(self):
+        self._f.close()
+        self._raw.unlink(missing_ok=True)
+
+def _dumps(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False)
+
+class _DictColumn:
+    def __init__(self, d: Path, name: str):
+        self.d, self.name = d, name
+        self.codes = _Array(d / f"meta.{name}.codes.npy", "<i")
+        self.vocab: Dict[str, int] = {}
+
+    def accepts(self, v: Any) -> bool:
+        return True
+
+    def full(self, rows: int) -> bool:
+        return len(self.vocab) > DICT_MIN_VALUES and 2 * len(self.vocab) > rows
+
+    def add(self, v: Any):
+        self.codes.append(-1 if v is _MISSING else self.vocab.setdefault(_dumps(v), len(self.vocab)))
+
+    def values(self) -> Iterator[Any]:
+        vocab = [json.loads(k) for k in self.vocab]
+        for code in self.codes.read():
+            yield _MISSING if code < 0 else vocab[code]
+
+    def finish(self) -> str:
+        self.codes.finish()
+        _write_blob(self.d / f"meta.{self.name}.vocab.bin", [k.encode("utf-8") for k in self.vocab])
+        return "dict"
+
+    def discard(self):
+        self.codes.discard()
+
+class _NumColumn:
+    def __init__(self, d: Path, name: str):
+        self.values_ = _Array(d / f"meta.{name}.num.npy", "<d")
+        self.kind = "int"
+
+    def accepts(self, v: Any) -> bool:
+        # bool, NaN, dan int di luar presisi float64 tidak bisa dibedakan kembali saat dibaca
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return False
+        return abs(v) <= 2 ** 53 if isinstance(v, int) else not math.isnan(v)
+
+    def full(self, rows: int) -> bool:
+        return False
+
+    def add(self, v: Any):
+        if v is _MISSING:
+            self.values_.append(math.nan)
+            return
+        if isinstance(v, float):
+            self.kind = "float"
+        self.values_.append(float(v))
+
+    def values(self) -> Iterator[Any]:
+        cast = int if self.kind == "int" else float
+        for x in self.values_.read():
+            yield _MISSING if math.isnan(x) else cast(x)
+
+    def finish(self) -> str:
+        self.values_.finish()
+        return self.kind
+
+    def discard(self):
+        self.values_.discard()
+
+class _JsonColumn:
+    def __init__(self, d: Path, name: str):
+        self._f = open(d / f"meta.{name}.bin", "wb")
+        self.off = _Array(d / f"meta.{name}.off.npy", "<q")
+        self.off.append(0)
+        self._pos = 0
+
+    def accepts(self, v: Any) -> bool:
+        return True
+
+    def full(self, rows: int) -> bool:
+        return False
+
+    def add(self, v: Any):
+        if v is not _MISSING:
+            b = _dumps(v).encode("utf-8")
+            self._f.write(b)
+            self._pos += len(b)
+        self.off.append(self._pos)
+
+    def finish(self) -> str:
+        self._f.close()
+        self.off.finish()
+        return "json"
+
+    def discard(self):
+        self._f.close()
+        self.off.discard()
+
+class ChunkStoreWriter:
+    """
+    Tulis chunk satu per satu (ingest streaming): teks, offset, dan kolom metadata langsung di-append ke file
+    di direktori sementara, yang ditukar dengan `path` saat `close()`. Yang tinggal di RAM hanya kamus
+    kolom berkardinalitas rendah.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        self.tmp.mkdir(parents=True)
+        self._text = open(self.tmp / "text.bin", "wb")
+        self._off = _Array(self.tmp / "text.off.npy", "<q")
+        self._off.append(0)
+        self._pos = 0
+        self._cols: Dict[str, Any] = {}
+        self.rows = 0
+
+    def _column(self, c: str, v: Any):
+        col = self._cols.get(c)
+        if col is None:
+            col = _NumColumn(self.tmp, c)
+            if not col.accepts(v):
+                col.discard()
+                col = _DictColumn(self.tmp, c)
+            for _ in range(self.rows):
+                col.add(_MISSING)
+        elif not col.accepts(v) or col.full(self.rows):
+            # pindah ke json: nilai baris sebelumnya ditulis ulang dari file kolom lama
+            moved = _JsonColumn(self.tmp, c)
+            for old in col.values():
+                moved.add(old)
+            col.discard()
+            col = moved
+        self._cols[c] = col
+        return col
+
+    def add(self, text: str, meta: Dict[str, Any]):
+        b = text.encode("utf-8")
+        self._text.write(b)
+        self._pos += len(b)
+        self._off.append(self._pos)
+        for c, v in meta.items():
+            self._column(c, v).add(v)
+        self.rows += 1
+        for c, col in self._cols.items():
+            if c not in meta:
+                col.add(_MISSING)
+
+    def close(self):
+        self._text.close()
+        self._off.finish()
+        kinds = {c: col.finish() for c, col in self._cols.items()}
+        (self.tmp / "columns.json").write_text(json.dumps({"columns": kinds, "rows": self.rows}), encoding="utf-8")
+        old = self.path.with_name(self.path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if self.path.exists():
+            os.replace(self.path, old)
+        os.replace(self.tmp, self.path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def abort(self):
+        self._text.close()
+        self._off.discard()
+        for col in self._cols.values():
+            col.discard()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class ChunkStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        info = json.loads((self.path / "columns.json").read_text(encoding="utf-8"))
+        cols = info["columns"]
+        # store lama menyimpan daftar nama kolom saja: semuanya kamus
+        self.kinds: Dict[str, str] = cols if isinstance(cols, dict) else dict.fromkeys(cols, "dict")
+        self.columns: List[str] = list(self.kinds)
+        self._text = _Blob(self.path / "text.bin")
+        by_kind = lambda *kinds: [c for c, k in self.kinds.items() if k in kinds]
+        self._codes = {c: np.load(str(self.path / f"meta.{c}.codes.npy"), mmap_mode="r") for c in by_kind("dict")}
+        self._vocab = {c: _Blob(self.path / f"meta.{c}.vocab.bin") for c in by_kind("dict")}
+        self._num = {c: np.load(str(self.path / f"meta.{c}.num.npy"), mmap_mode="r") for c in by_kind("int", "float")}
+        self._json = {c: _Blob(self.path / f"meta.{c}.bin") for c in by_kind("json")}
+        self._by: Dict[str, Dict[Any, np.ndarray]] = {}
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (Path(path) / "columns.json").exists()
+
+    @staticmethod
+    def write(path: Path, texts: Sequence[str], metas: Sequence[Dict[str, Any]]):
+        """Tulis store baru ke direktori sementara lalu tukar dengan yang lama."""
+        with ChunkStoreWriter(path) as w:
+            for t, md in zip(texts, metas):
+                w.add(t, md)
+
+    @classmethod
+    def from_legacy(cls, path: Path, chunks_jsonl: Path, metadata_json: Path) -> "ChunkStore":
+        """Konversi sekali dari chunks.jsonl + metadata.json (format ingest lama)."""
+        texts = [json.loads(line)["text"] for line in Path(chunks_jsonl).read_text(encoding="utf-8").splitlines() if line.strip()]
+        metas = json.loads(Path(metadata_json).read_text(encoding="utf-8"))
+        cls.write(path, texts, metas)
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self._text)
+
+    def text(self, i: int) -> str:
+        return self._text[i].decode("utf-8")
+
+    def _value(self, c: str, i: int) -> Any:
+        kind = self.kinds[c]
+        if kind == "dict":
+            code = int(self._codes[c][i])
+            return json.loads(self._vocab[c][code]) if code >= 0 else _MISSING
+        if kind == "json":
+            raw = self._json[c][i]
+            return json.loads(raw) if raw else _MISSING
+        x = float(self._num[c][i])
+        if math.isnan(x):
+            return _MISSING
+        return int(x) if kind == "int" else x
+
+    def meta(self, i: int) -> Dict[str, Any]:
+        md: Dict[str, Any] = {}
+        for c in self.columns:
+            v = self._value(c, i)
+            if v is not _MISSING:
+                md[c] = v
+        return md
+
+    def ids_by(self, column: str) -> Dict[Any, np.ndarray]:
+        """Index id per nilai kolom (mis. source → id FAISS terurut), dihitung sekali per store."""
+        cached = self._by.get(column)
+        if cached is not None:
+            return cached
+        out: Dict[Any, np.ndarray] = {}
+        if column in self._codes:
+            codes = np.asarray(self._codes[column])
+            order = np.argsort(codes, kind="stable").astype(np.int64)
+            bounds = np.searchsorted(codes[order], np.arange(len(self._vocab[column]) + 1))
+            for code in range(len(self._vocab[column])):
+                out[json.loads(self._vocab[column][code])] = order[bounds[code]:bounds[code + 1]]
+        elif column in self.kinds:
+            groups: Dict[Any, List[int]] = {}
+            for i in range(len(self)):
+                v = self._value(column, i)
+                if v is not _MISSING:
+                    groups.setdefault(v, []).append(i)
+            out = {v: np.asarray(ids, dtype=np.int64) for v, ids in groups.items()}
+        self._by[column] = out
+        return out
+
+    def numeric_column(self, column: str) -> np.ndarray:
+        """Nilai numerik satu kolom untuk semua baris (float64, NaN = tidak ada)."""
+        if column in self._num:
+            return np.array(self._num[column], dtype=np.float64)
+        if column in self._codes:
+            vocab = self._vocab[column]
+            values = [json.loads(vocab[k]) for k in range(len(vocab))]
+            # kode -1 (tidak ada) mengambil elemen terakhir = NaN
+            table = np.array([v if isinstance(v, (int, float)) else np.nan for v in values] + [np.nan], dtype=np.float64)
+            return table[np.asarray(self._codes[column])]
+        out = np.full(len(self), np.nan)
+        if column in self._json:
+            for i in range(len(self)):
+                v = self._value(column, i)
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    out[i] = v
+        return out
+
+    def get(self, ids: Sequence[int]) -> List[Tuple[str, Dict[str, Any]]]:
+        """(text, metadata) untuk id FAISS yang valid saja, urutan dipertahankan."""
+        n = len(self)
+        return [(self.text(int(i)), self.meta(int(i))) for i in ids if 0 <= int(i) < n]
+
+    def iter_texts(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.text(i)
@@ -0,0 +1,47 @@
+# app/core/clients.py
+import threading
+from typing import Callable, List, Optional
+import httpx
+from app.core.config import settings
+
+# satu pool HTTP keep-alive per proses, dipakai bersama oleh semua client provider
+_SYNC: Optional[httpx.Client] = None
+_ASYNC: Optional[httpx.AsyncClient] = None
+_LOCK = threading.Lock()
+# cache client yang memegang referensi ke pool (LLM, vector store) → dikosongkan saat pool ditutup
+_ON_CLOSE: List[Callable[[], None]] = []
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=settings.HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=30.0)
+
+def sync_http() -> httpx.Client:
+    global _SYNC
+    with _LOCK:
+        if _SYNC is None:
+            _SYNC = httpx.Client(limits=_limits(), timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=10.0))
+    return _SYNC
+
+def async_http() -> httpx.AsyncClient:
+    global _ASYNC
+    with _LOCK:
+        if _ASYNC is None:
+            _ASYNC = httpx.AsyncClient(limits=_limits(), timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=10.0))
+    return _ASYNC
+
+def on_close(fn: Callable[[], None]) -> Callable[[], None]:
+    """Daftarkan reset cache yang memegang client pool; dipanggil aclose() supaya startup berikutnya membuat ulang."""
+    _ON_CLOSE.append(fn)
+    return fn
+
+async def aclose():
+    global _SYNC, _ASYNC
+    for fn in _ON_CLOSE:
+        fn()
+    if _ASYNC is not None:
+        await _ASYNC.aclose()
+        _ASYNC = None
+    if _SYNC is not None:
+        _SYNC.close()
+        _SYNC = None
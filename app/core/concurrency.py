@@ -0,0 +1,19 @@
+# app/core/concurrency.py
+import asyncio, functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from app.core.config import settings
+
+# executor terbatas untuk kerja blocking (retrieval, rerank, Chroma/FAISS) dari handler async,
+# supaya event loop tidak ikut terblokir dan thread tidak tumbuh tanpa batas
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+def executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=settings.BLOCKING_WORKERS, thread_name_prefix="blocking")
+    return _EXECUTOR
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(fn, *args, **kwargs))
@@ -11,6 +11,8 @@ class _Settings(BaseModel):
 
     # Embeddings & LLM
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    # "openai" / "gemini" / "fake" (lokal, untuk test & benchmark); default ikut PROVIDER
+    EMBEDDINGS_PROVIDER: str = os.getenv("EMBEDDINGS_PROVIDER", os.getenv("PROVIDER", "openai")).lower()
     LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
     # Paths
@@ -20,6 +22,82 @@ class _Settings(BaseModel):
     # Chunking
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "800"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "120"))
+    # satuan CHUNK_SIZE/CHUNK_OVERLAP: "chars" atau "tokens". Token dihitung dengan tokenizer embedder jika
+    # tersedia (SentenceTransformer di stack FAISS, tiktoken untuk model embedding OpenAI); selain itu
+    # cl100k_base sebagai pendekatan (lihat app/ingest/chunker.py)
+    CHUNK_UNIT: str = os.getenv("CHUNK_UNIT", "chars").lower()
+
+    # Loader paralel (process pool); 0 = sebanyak CPU, 1 = serial
+    LOADER_WORKERS: int = int(os.getenv("LOADER_WORKERS", "0"))
+
+    # Upsert embedding: batch in-flight paralel, ukuran batch per token & per item
+    EMBED_CONCURRENCY: int = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    EMBED_BATCH_TOKENS: int = int(os.getenv("EMBED_BATCH_TOKENS", "40000"))
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "166"))
+
+    # Upload streaming (/ingest/upload): ukuran potongan tulis, batas ukuran per file (0 = tanpa batas), riwayat job
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1 << 20)))
+    UPLOAD_MAX_MB: int = int(os.getenv("UPLOAD_MAX_MB", "1024"))
+    INGEST_JOB_HISTORY: int = int(os.getenv("INGEST_JOB_HISTORY", "100"))
+
+    # Cache embedding on-disk (PERSIST_DIR/emb_cache), dibatasi ukuran
+    EMBED_CACHE: bool = os.getenv("EMBED_CACHE", "true").lower() == "true"
+    EMBED_CACHE_MAX_MB: int = int(os.getenv("EMBED_CACHE_MAX_MB", "512"))
+
+    # Cache /ask: query embedding & retrieval (LRU), jawaban LLM (opsional, aktif jika TTL > 0)
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    RETRIEVAL_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "0"))
+    # cache jawaban semantik: pertanyaan dengan cosine >= threshold ke pertanyaan lama (scope + versi index sama)
+    # memakai jawaban + context_sources-nya; dibatasi ukuran (LRU) dan TTL detik
+    SEMANTIC_CACHE: bool = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+    SEMANTIC_CACHE_TTL: float = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    # filter metadata /ask → scope (where + chunk_id yang lolos) per versi index
+    FILTER_CACHE_SIZE: int = int(os.getenv("FILTER_CACHE_SIZE", "256"))
+
+    # Fusion hybrid vector + BM25 per chunk_id: "weighted" (skor dinormalisasi) atau "rrf"; cutoff sebelum rerank
+    FUSION_METHOD: str = os.getenv("FUSION_METHOD", "weighted").lower()
+    FUSION_VECTOR_WEIGHT: float = float(os.getenv("FUSION_VECTOR_WEIGHT", "0.5"))
+    FUSION_BM25_WEIGHT: float = float(os.getenv("FUSION_BM25_WEIGHT", "0.5"))
+    FUSION_RRF_K: int = int(os.getenv("FUSION_RRF_K", "60"))
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "8"))
+
+    # Context packing prompt: budget token context (dibatasi window model - max_tokens jawaban),
+    # CONTEXT_WINDOW 0 = dari tabel model di app/rag/packing.py
+    CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+    CONTEXT_WINDOW: int = int(os.getenv("CONTEXT_WINDOW", "0"))
+    CONTEXT_SAFETY_TOKENS: int = int(os.getenv("CONTEXT_SAFETY_TOKENS", "64"))
+
+    # Rerank CrossEncoder: warm-up saat startup, budget token passage, cache skor, micro-batching
+    RERANK_WARMUP: bool = os.getenv("RERANK_WARMUP", "true").lower() == "true"
+    RERANK_MAX_TOKENS: int = int(os.getenv("RERANK_MAX_TOKENS", "256"))
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+    RERANK_BATCH_WINDOW_MS: float = float(os.getenv("RERANK_BATCH_WINDOW_MS", "5"))
+    RERANK_MAX_BATCH: int = int(os.getenv("RERANK_MAX_BATCH", "64"))
+
+    # Backend model lokal (embedder all-MiniLM-L6-v2 stack FAISS, reranker CrossEncoder): "torch" atau "onnx"
+    # (graph hasil `python -m app.onnx_models export` di ONNX_MODEL_DIR, int8 dinamis jika ONNX_QUANTIZED);
+    # ONNX_THREADS 0 = default onnxruntime, ONNX_BATCH_SIZE = ukuran batch per bucket panjang token
+    EMBED_BACKEND: str = os.getenv("EMBED_BACKEND", "torch").lower()
+    RERANK_BACKEND: str = os.getenv("RERANK_BACKEND", "torch").lower()
+    ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", "./models/onnx")
+    ONNX_QUANTIZED: bool = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"
+    ONNX_THREADS: int = int(os.getenv("ONNX_THREADS", "0"))
+    ONNX_BATCH_SIZE: int = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+
+    # Serving async: thread pool untuk kerja blocking + pool koneksi HTTP ke provider
+    BLOCKING_WORKERS: int = int(os.getenv("BLOCKING_WORKERS", "8"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+    # /ask-batch: maksimum pertanyaan per request, retrieval dipotong per blok, panggilan LLM paralel
+    BATCH_MAX_QUESTIONS: int = int(os.getenv("BATCH_MAX_QUESTIONS", "5000"))
+    BATCH_RETRIEVAL_SIZE: int = int(os.getenv("BATCH_RETRIEVAL_SIZE", "256"))
+    BATCH_LLM_CONCURRENCY: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
 
 # >>> WAJIB: inisialisasi settings <<<
 settings = _Settings()
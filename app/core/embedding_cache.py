@@ -0,0 +1,231 @@
+# app/core/embedding_cache.py
+import os, re, glob, hashlib, threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.core.logger import logger
+
+def _key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+_MAGIC = b"embc-v2\x00"  # 8 byte magic + 8 byte generation = key record header (row 0)
+
+def _new_header() -> bytes:
+    return _MAGIC + os.urandom(8)
+
+class _FileLock:
+    """Lock antar-proses (flock / msvcrt) di file `<cache>.lock`; dipegang saat append & compaction."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+class EmbeddingCache:
+    """
+    Cache embedding on-disk per model: satu file record berukuran tetap
+    [16-byte blake2b(text) | float32 x dim], di-append dan dibaca lewat np.memmap.
+    Row 0 = header (magic + generation acak); generation berganti tiap compaction, jadi proses lain
+    tahu index hash → row-nya basi dan membangunnya ulang. Append dan compaction memegang file lock.
+    Kalau file melebihi `max_bytes`, dipadatkan dengan menyimpan row yang paling baru dipakai.
+    """
+
+    def __init__(self, model_key: str, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.path.join(settings.PERSIST_DIR, "emb_cache")
+        self.slug = re.sub(r"[^a-zA-Z0-9_.-]+", "_", model_key)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.EMBED_CACHE_MAX_MB * 1024 * 1024
+        self.dim: Optional[int] = None
+        self.path: Optional[str] = None
+        self._rows: Dict[bytes, int] = {}
+        self._used: Dict[int, int] = {}
+        self._tick = 0
+        self._mm: Optional[np.memmap] = None
+        self._n = 0
+        self._gen: Optional[bytes] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        found = sorted(glob.glob(os.path.join(self.root, f"{self.slug}.v2.d*.bin")))
+        if found:
+            self._open(int(found[-1].rsplit(".d", 1)[1][:-4]))
+
+    def _dtype(self) -> np.dtype:
+        return np.dtype([("key", "V16"), ("vec", "<f4", (self.dim,))])
+
+    def _open(self, dim: int):
+        self.dim = dim
+        self.path = os.path.join(self.root, f"{self.slug}.v2.d{dim}.bin")
+        self._rows, self._used, self._mm, self._n, self._gen = {}, {}, None, 0, None
+        self._refresh()
+
+    def _header(self) -> Optional[bytes]:
+        try:
+            with open(self.path, "rb") as f:
+                head = f.read(16)
+        except FileNotFoundError:
+            return None
+        return head if len(head) == 16 and head.startswith(_MAGIC) else None
+
+    def _refresh(self):
+        """Map ulang kalau file bertambah (proses lain ikut append) atau dipadatkan (generation berubah)."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        n = size // self._dtype().itemsize  # abaikan record terpotong di ekor
+        if n == self._n and self._mm is not None and self._header() == self._gen:
+            return
+        if n == 0 or self._header() is None:
+            self._rows, self._used, self._mm, self._n, self._gen = {}, {}, None, 0, None
+            return
+        mm = np.memmap(self.path, dtype=self._dtype(), mode="r", shape=(n,))
+        keys = mm["key"]
+        gen = bytes(keys[0])  # dibaca dari map yang sama, jadi konsisten walau file diganti di tengah jalan
+        if gen != self._gen:  # file dipadatkan proses lain → bangun ulang index
+            self._rows, self._used, self._n, self._gen = {}, {}, 1, gen
+        for row in range(self._n, n):
+            self._rows[bytes(keys[row])] = row
+        self._mm, self._n = mm, n
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            if self.dim is None:
+                self.misses += len(texts)
+                return [None] * len(texts)
+            keys = [_key(t) for t in texts]
+            if any(k not in self._rows for k in keys):
+                self._refresh()
+            out: List[Optional[np.ndarray]] = []
+            for k in keys:
+                row = self._rows.get(k)
+                if row is None:
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self.hits += 1
+                    self._tick += 1
+                    self._used[row] = self._tick
+                    out.append(np.array(self._mm["vec"][row]))
+            return out
+
+    def put_many(self, texts: Sequence[str], vectors) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock:
+            if self.dim is None:
+                os.makedirs(self.root, exist_ok=True)
+                self._open(int(vectors.shape[1]))
+            recs = np.empty(len(texts), dtype=self._dtype())
+            recs["key"] = [_key(t) for t in texts]
+            recs["vec"] = vectors
+            with _FileLock(self.path + ".lock"):
+                data = recs.tobytes()
+                if self._header() is None:  # file baru (atau format lama): mulai dengan header
+                    head = np.zeros(1, dtype=self._dtype())
+                    head["key"] = [_new_header()]
+                    with open(self.path, "wb") as f:
+                        f.write(head.tobytes() + data)
+                else:
+                    with open(self.path, "ab") as f:
+                        f.write(data)
+                self._refresh()
+                if self.max_bytes and self._n * self._dtype().itemsize > self.max_bytes:
+                    self._evict()
+
+    def _evict(self):
+        # dipanggil dengan file lock dipegang. Simpan ~80% budget, prioritas row yang paling baru dipakai
+        # (row baru > row lama); header baru dengan generation baru
+        keep_n = max(1, int(self.max_bytes * 0.8) // self._dtype().itemsize - 1)
+        order = sorted(range(1, self._n), key=lambda r: (self._used.get(r, 0), r), reverse=True)[:keep_n]
+        order.sort()
+        kept = np.empty(len(order) + 1, dtype=self._dtype())
+        kept["key"][0], kept["vec"][0] = _new_header(), 0
+        kept[1:] = self._mm[order]
+        tmp = self.path + ".tmp"
+        kept.tofile(tmp)
+        self._mm = None
+        os.replace(tmp, self.path)
+        logger.info(f"[emb-cache] {self.slug}: evicted {self._n - 1 - len(order)} rows, kept {len(order)}")
+        self._open(self.dim)
+
+class CachedEmbeddings(Embeddings):
+    """Wrapper LangChain Embeddings dengan EmbeddingCache (query & dokumen dipisah)."""
+
+    def __init__(self, base: Embeddings, model_key: str):
+        self.base = base
+        self.doc_cache = EmbeddingCache(f"{model_key}.doc")
+        self.query_cache = EmbeddingCache(f"{model_key}.query")
+
+    def __getattr__(self, name):
+        return getattr(self.base, name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.doc_cache.get_many(texts)
+        miss = [i for i, v in enumerate(cached) if v is None]
+        if miss:
+            fresh = self.base.embed_documents([texts[i] for i in miss])
+            self.doc_cache.put_many([texts[i] for i in miss], fresh)
+            for i, v in zip(miss, fresh):
+                cached[i] = v
+        return [list(map(float, v)) for v in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        v = self.query_cache.get_many([text])[0]
+        if v is None:
+            v = self.base.embed_query(text)
+            self.query_cache.put_many([text], [v])
+        return list(map(float, v))
+
+class CachedSentenceTransformer:
+    """Wrapper SentenceTransformer.encode dengan EmbeddingCache; atribut lain diteruskan ke model."""
+
+    def __init__(self, model, model_key: str):
+        self.model = model
+        self.model_key = model_key
+        self._caches: Dict[bool, EmbeddingCache] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _cache(self, normalize: bool) -> EmbeddingCache:
+        if normalize not in self._caches:
+            self._caches[normalize] = EmbeddingCache(f"{self.model_key}.{'norm' if normalize else 'raw'}")
+        return self._caches[normalize]
+
+    def encode(self, sentences, normalize_embeddings: bool = False, **kwargs):
+        if kwargs.get("convert_to_tensor") or kwargs.get("output_value", "sentence_embedding") != "sentence_embedding":
+            return self.model.encode(sentences, normalize_embeddings=normalize_embeddings, **kwargs)
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        cache = self._cache(normalize_embeddings)
+        cached = cache.get_many(texts)
+        miss = [i for i, v in enumerate(cached) if v is None]
+        if miss:
+            fresh = np.asarray(self.model.encode([texts[i] for i in miss], normalize_embeddings=normalize_embeddings, **kwargs), dtype=np.float32)
+            cache.put_many([texts[i] for i in miss], fresh)
+            for i, v in zip(miss, fresh):
+                cached[i] = v
+        out = np.stack(cached) if cached else np.zeros((0, cache.dim or 0), dtype=np.float32)
+        return out[0] if single else out
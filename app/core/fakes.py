@@ -0,0 +1,92 @@
+# app/core/fakes.py
+# Provider lokal tanpa API key, untuk test/benchmark (EMBEDDINGS_PROVIDER=fake).
+import time, hashlib, threading
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+class FakeEmbeddings(Embeddings):
+    """
+    Embedding deterministik berbasis hashing kata (bag-of-words), dinormalisasi L2.
+    Teks yang berbagi kata punya cosine > 0, jadi hasil retrieval tetap masuk akal.
+    `latency_s` mensimulasikan round-trip API; `rate_limit_every` memicu 429 tiap N panggilan.
+    """
+
+    def __init__(self, dim: int = 256, latency_s: float = 0.0, rate_limit_every: int = 0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _vec(self, text: str) -> List[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for tok in (text or "").lower().split():
+            h = int.from_bytes(hashlib.md5(tok.encode("utf-8")).digest()[:8], "little")
+            v[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        n = float(np.linalg.norm(v))
+        return (v / n if n else v).tolist()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self.rate_limit_every and n % self.rate_limit_every == 0:
+            raise FakeRateLimitError("429: rate limit (fake)")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call()
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call()
+        return self._vec(text)
+
+class FakeCrossEncoder:
+    """Pengganti CrossEncoder: skor = jumlah kata query yang muncul di passage (tanpa model/download)."""
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs):
+        out = []
+        for q, p in pairs:
+            words = set((p or "").lower().split())
+            out.append(float(sum(1 for w in (q or "").lower().split() if w in words)))
+        return np.array(out, dtype=np.float32)
+
+class FakeStreamingLLM:
+    """
+    LLM lokal untuk test streaming: menjawab dengan mengutip awal bagian "Context:" dari prompt,
+    token demi token (per kata), dengan jeda `delay_s` antar token.
+    """
+
+    def __init__(self, delay_s: float = 0.0, max_words: int = 40):
+        self.delay_s = delay_s
+        self.max_words = max_words
+
+    def _words(self, prompt: str) -> List[str]:
+        ctx = prompt.split("Context:", 1)[-1]
+        words = ctx.split()[: self.max_words] or ["I", "don't", "know."]
+        return ["Based", "on", "the", "context:"] + words
+
+    def stream(self, prompt: str):
+        for i, w in enumerate(self._words(prompt)):
+            if self.delay_s:
+                time.sleep(self.delay_s)
+            yield w if i == 0 else " " + w
+
+    def invoke(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+    async def astream(self, prompt: str):
+        import asyncio
+        for i, w in enumerate(self._words(prompt)):
+            if self.delay_s:
+                await asyncio.sleep(self.delay_s)
+            yield w if i == 0 else " " + w
+
+    async def ainvoke(self, prompt: str) -> str:
+        return "".join([t async for t in self.astream(prompt)])
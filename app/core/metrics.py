@@ -0,0 +1,104 @@
+# app/core/metrics.py
+# Histogram/counter minimal dengan output format teks Prometheus (tanpa dependency prometheus_client).
+import time, threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# bucket latency (detik): 1 ms .. 60 s, cukup rapat di area p99 retrieval & LLM
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = ['%s="%s"' % (n, v) for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Histogram:
+    """Histogram kumulatif per kombinasi label (bucket, _sum, _count)."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # [count per bucket..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        with self._lock:
+            s = self._series.get(labelvalues)
+            if s is None:
+                s = self._series[labelvalues] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for lv, s in sorted(series.items()):
+            for b, c in zip(self.buckets + ("+Inf",), s):
+                le = 'le="%s"' % b
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, lv, le)} {int(c)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, lv)} {s[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, lv)} {int(s[-2])}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for lv, v in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, lv)} {v:g}")
+        return lines
+
+REQUEST_SECONDS = Histogram("rag_request_duration_seconds", "Latency end-to-end per request.", ("endpoint",))
+STAGE_SECONDS = Histogram("rag_stage_duration_seconds", "Latency per tahap pipeline RAG.", ("endpoint", "stage"))
+REQUESTS = Counter("rag_requests_total", "Jumlah request per endpoint dan status.", ("endpoint", "status"))
+CACHE = Counter("rag_cache_lookups_total", "Lookup cache per jenis cache dan hasil (hit/miss).", ("cache", "result"))
+SHARD_SECONDS = Histogram("rag_shard_search_seconds", "Latency search per shard FAISS (termasuk IPC/HTTP).", ("shard", "mode"))
+
+_REGISTRY = [REQUEST_SECONDS, STAGE_SECONDS, REQUESTS, CACHE, SHARD_SECONDS]
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str) -> Iterator[None]:
+    """Tambahkan durasi blok (ms) ke timings[stage]; timings=None berarti tidak diukur."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + (time.perf_counter() - t0) * 1000, 2)
+
+def observe_request(endpoint: str, seconds: float, timings: Optional[Dict[str, float]] = None,
+                    cache: Optional[Dict[str, str]] = None, status: str = "ok"):
+    REQUESTS.inc(endpoint, status)
+    REQUEST_SECONDS.observe(seconds, endpoint)
+    for stage, ms in (timings or {}).items():
+        STAGE_SECONDS.observe(ms / 1000, endpoint, stage)
+    for name, result in (cache or {}).items():
+        if result in ("hit", "miss"):
+            CACHE.inc(name, result)
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
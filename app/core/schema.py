@@ -1,11 +1,35 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, Dict, Literal
+
+class FusionOptions(BaseModel):
+    # None = pakai default dari .env (FUSION_*, RERANK_CANDIDATES)
+    method: Optional[Literal["weighted", "rrf"]] = None
+    vector_weight: Optional[float] = Field(None, ge=0)
+    bm25_weight: Optional[float] = Field(None, ge=0)
+    rerank_candidates: Optional[int] = Field(None, ge=1)
+
+class FilterOptions(BaseModel):
+    # scope pertanyaan; dipush ke where Chroma / ID-selector FAISS (lihat app/rag/filters.py)
+    sources: Optional[List[str]] = None      # nama file persis, mis. ["handbook.pdf"]
+    file_types: Optional[List[str]] = None   # ekstensi, mis. ["pdf", "md"]
+    page_from: Optional[int] = Field(None, ge=0)  # penomoran sama dengan context_sources
+    page_to: Optional[int] = Field(None, ge=0)
 
 class QuestionRequest(BaseModel):
     question: str = Field(..., min_length=1)
     top_k: int = 5
     temperature: float = 0.2
     max_tokens: int = 512
+    fusion: Optional[FusionOptions] = None
+    filter: Optional[FilterOptions] = None
+
+class AskBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+    top_k: int = 5
+    temperature: float = 0.2
+    max_tokens: int = 512
+    fusion: Optional[FusionOptions] = None
+    filter: Optional[FilterOptions] = None  # berlaku untuk semua pertanyaan
 
 class AskResponse(BaseModel):
     question: str
@@ -34,6 +58,17 @@ class IngestJsonResponse(BaseModel):
     vector_store: str
     total_chunks: int
 
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str
+    files: List[Dict[str, Any]]
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    seconds: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
 class SourcesResponse(BaseModel):
     documents: List[Dict[str, Any]]
     vector_store: str
@@ -44,3 +79,5 @@ class HealthResponse(BaseModel):
     vector_index_ready: bool
     provider: str
     model: str
+    index_version: Optional[str] = None
+    semantic_cache: Optional[Dict[str, Any]] = None  # ukuran, hit rate, eviction cache jawaban semantik
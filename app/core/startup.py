@@ -0,0 +1,64 @@
+# app/core/startup.py
+# Catatan waktu startup per fase (import, load model, load index, warm-up) + status readiness untuk GET /ready.
+# Dengan launcher preload (python -m app.serve) fase load dijalankan parent sebelum fork; worker mewarisi
+# catatan itu dan hanya menambah fase warm-up miliknya sendiri.
+import os, time, threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from app.core.logger import logger
+
+class Startup:
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self.preloaded = False
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = round(self.phases.get(name, 0.0) + seconds * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def forked(self):
+        """Dipanggil di worker setelah fork: fase parent tetap tercatat, readiness mulai dari nol."""
+        self.pid = os.getpid()
+        self.preloaded = True
+        self.ready = False
+
+    def mark_ready(self):
+        self.ready = True
+        self.error = None  # mis. index baru tersedia lewat /reload setelah warm-up gagal
+        breakdown = ", ".join(f"{k}={v:.0f}ms" for k, v in self.phases.items())
+        logger.info(f"[startup] pid {self.pid} ready{' (preloaded)' if self.preloaded else ''}: {breakdown}")
+
+    def fail(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+        logger.error(f"[startup] pid {self.pid} warm-up failed: {self.error}")
+
+    def status(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "pid": self.pid, "preloaded": self.preloaded, "error": self.error,
+                "phases_ms": dict(self.phases), "total_ms": round(sum(self.phases.values()), 1)}
+
+STARTUP = Startup()
+
+def warm_up_in_background(fn, name: str = "startup-warmup") -> threading.Thread:
+    """Jalankan `fn` (load + warm-up) di thread: server sudah menerima koneksi, /ready 503 sampai selesai."""
+    def run():
+        try:
+            fn()
+        except Exception as e:
+            STARTUP.fail(e)
+            return
+        STARTUP.mark_ready()
+    t = threading.Thread(target=run, name=name, daemon=True)
+    t.start()
+    return t
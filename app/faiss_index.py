@@ -0,0 +1,227 @@
+"""
+Index FAISS yang bisa dipilih lewat env FAISS_INDEX_TYPE: flat (exact), hnsw, atau ivfpq (codebook di-train).
+Tipe + parameter disimpan di storage/index_info.json supaya server.py memuat & men-tune index yang sama.
+
+Laporan recall vs latency terhadap baseline flat:
+    python -m app.faiss_index report [--k 10] [--queries queries.txt] [--sample 200] [--json out.json] [--storage dir]
+"""
+import os, json, time, math, argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import faiss
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+def default_params(kind: str) -> Dict[str, Any]:
+    if kind == "hnsw":
+        return {"M": _env_int("FAISS_HNSW_M", 32), "efConstruction": _env_int("FAISS_HNSW_EF_CONSTRUCTION", 200),
+                "efSearch": _env_int("FAISS_EF_SEARCH", 64)}
+    if kind == "ivfpq":
+        return {"nlist": _env_int("FAISS_IVF_NLIST", 0), "pq_m": _env_int("FAISS_PQ_M", 16),
+                "nbits": _env_int("FAISS_PQ_NBITS", 8), "nprobe": _env_int("FAISS_NPROBE", 16)}
+    return {}
+
+def _pq_m(dim: int, m: int) -> int:
+    # jumlah sub-quantizer harus membagi dimensi
+    m = max(1, min(m, dim))
+    while dim % m:
+        m -= 1
+    return m
+
+def build_index(embs: np.ndarray, kind: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """Bangun index inner-product (vektor sudah dinormalisasi) + info untuk index_info.json."""
+    kind = (kind or os.getenv("FAISS_INDEX_TYPE", "flat")).lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unsupported FAISS_INDEX_TYPE: {kind}. Use one of {', '.join(INDEX_TYPES)}.")
+    embs = np.ascontiguousarray(embs, dtype="float32")
+    n, dim = embs.shape
+    p = {**default_params(kind), **(params or {})}
+
+    if kind == "ivfpq":
+        # k-means butuh ~39 titik per centroid → nlist otomatis = min(4*sqrt(n), n/39)
+        p["nlist"] = p["nlist"] or max(1, min(int(4 * math.sqrt(n)), n // 39))
+        p["pq_m"] = _pq_m(dim, p["pq_m"])
+        need = max(p["nlist"], 2 ** p["nbits"])  # codebook PQ butuh >= 2^nbits titik training
+        if n < need:
+            print(f"[FAISS] {n} vektor terlalu sedikit untuk IVF{p['nlist']},PQ{p['pq_m']}x{p['nbits']} (butuh >= {need}); pakai flat.")
+            kind, p = "flat", {}
+
+    if kind == "flat":
+        factory = "Flat"
+    elif kind == "hnsw":
+        factory = f"HNSW{p['M']},Flat"
+    else:
+        factory = f"IVF{p['nlist']},PQ{p['pq_m']}x{p['nbits']}"
+
+    t0 = time.perf_counter()
+    index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+    if kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = p["efConstruction"]
+    if not index.is_trained:
+        index.train(embs)
+    index.add(embs)
+    info = {"type": kind, "factory": factory, "metric": "inner_product", "dim": dim, "ntotal": int(index.ntotal),
+            "params": p, "build_seconds": round(time.perf_counter() - t0, 3)}
+    tune_index(index, info)
+    return index, info
+
+def tune_index(index: faiss.Index, info: Dict[str, Any], ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+    """Set parameter search (efSearch untuk HNSW, nprobe untuk IVF); default dari info, bisa di-override env/argumen."""
+    ps = faiss.ParameterSpace()
+    if info.get("type") == "hnsw":
+        ef = ef_search or _env_int("FAISS_EF_SEARCH", info["params"].get("efSearch", 64))
+        ps.set_index_parameter(index, "efSearch", ef)
+    elif info.get("type") == "ivfpq":
+        npb = nprobe or _env_int("FAISS_NPROBE", info["params"].get("nprobe", 16))
+        ps.set_index_parameter(index, "nprobe", min(npb, info["params"]["nlist"]))
+
+class IdScope:
+    """
+    ID-selector bitmap untuk search yang di-scope (filter metadata). Bitmap + selector disimpan di objek ini
+    karena SearchParameters FAISS hanya memegang pointer ke keduanya.
+    """
+
+    def __init__(self, index: faiss.Index, info: Dict[str, Any], ids: np.ndarray):
+        self.ids = ids
+        mask = np.zeros(int(index.ntotal), dtype=bool)
+        mask[ids] = True
+        self.bits = np.packbits(mask, bitorder="little")
+        self.selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(self.bits))
+        # efSearch/nprobe disalin: SearchParameters* menimpa tuning index selama search ini
+        kind = info.get("type")
+        if kind == "hnsw":
+            self.params = faiss.SearchParametersHNSW(sel=self.selector, efSearch=faiss.downcast_index(index).hnsw.efSearch)
+        elif kind == "ivfpq":
+            self.params = faiss.SearchParametersIVF(sel=self.selector, nprobe=faiss.extract_index_ivf(index).nprobe)
+        else:
+            self.params = faiss.SearchParameters(sel=self.selector)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return index.search(queries, k, params=self.params)
+
+def info_path_for(index_path: Path) -> Path:
+    return Path(index_path).with_name("index_info.json")
+
+def save_index(index: faiss.Index, info: Dict[str, Any], index_path: Path):
+    faiss.write_index(index, str(index_path))
+    info_path_for(index_path).write_text(json.dumps(info, indent=2), encoding="utf-8")
+
+def load_index(index_path: Path) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """Muat index + info; index lama tanpa index_info.json dianggap flat."""
+    index = faiss.read_index(str(index_path))
+    ip = info_path_for(index_path)
+    info = json.loads(ip.read_text(encoding="utf-8")) if ip.exists() else \
+        {"type": "flat", "factory": "Flat", "dim": index.d, "ntotal": int(index.ntotal), "params": {}}
+    tune_index(index, info)
+    return index, info
+
+# ---------- laporan recall vs latency ----------
+
+def _search_timed(index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, List[float]]:
+    ids, lat = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, I = index.search(q[None, :], k)
+        lat.append((time.perf_counter() - t0) * 1000)
+        ids.append(I[0])
+    return np.stack(ids), lat
+
+def _recall(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / max(1, sum(int((t >= 0).sum()) for t in truth))
+
+def _row(name: str, setting: str, truth: np.ndarray, found: np.ndarray, lat: List[float]) -> Dict[str, Any]:
+    return {"index": name, "setting": setting, "recall": round(_recall(truth, found), 4),
+            "p50_ms": round(float(np.percentile(lat, 50)), 3), "p95_ms": round(float(np.percentile(lat, 95)), 3),
+            "mean_ms": round(float(np.mean(lat)), 3)}
+
+def recall_report(embs: np.ndarray, queries: np.ndarray, k: int = 10,
+                  ef_values: Sequence[int] = (16, 32, 64, 128, 256),
+                  nprobe_values: Sequence[int] = (1, 4, 8, 16, 32, 64)) -> List[Dict[str, Any]]:
+    """Recall@k tiap tipe index/parameter search terhadap hasil exact (flat)."""
+    flat, _ = build_index(embs, "flat")
+    truth, lat = _search_timed(flat, queries, k)
+    rows = [_row("flat", "exact", truth, truth, lat)]
+
+    hnsw, info = build_index(embs, "hnsw")
+    for ef in ef_values:
+        tune_index(hnsw, info, ef_search=ef)
+        found, lat = _search_timed(hnsw, queries, k)
+        rows.append(_row("hnsw", f"efSearch={ef}", truth, found, lat))
+
+    ivf, info = build_index(embs, "ivfpq")
+    if info["type"] == "ivfpq":
+        for npb in nprobe_values:
+            if npb > info["params"]["nlist"]:
+                break
+            tune_index(ivf, info, nprobe=npb)
+            found, lat = _search_timed(ivf, queries, k)
+            rows.append(_row("ivfpq", f"nprobe={npb}", truth, found, lat))
+    return rows
+
+STORAGE_DIR = Path(__file__).resolve().parents[1] / "storage"
+
+def chunk_dirs(storage_dir: Path) -> List[Path]:
+    """
+    Chunk store versi aktif, di-resolve seperti SnapshotManager._target(): storage/CURRENT → versions/<v>/chunks
+    (atau shards/<NN>/chunks untuk index ter-shard); tanpa CURRENT → layout lama storage/chunks.
+    """
+    from .snapshots import current_version, versions_dir
+    from .shards import is_sharded
+    version = current_version(storage_dir)
+    if version is None:
+        return [Path(storage_dir) / "chunks"]
+    path = versions_dir(storage_dir) / version
+    if is_sharded(path):
+        return sorted(d / "chunks" for d in (path / "shards").iterdir())
+    return [path / "chunks"]
+
+def _report(args):
+    from .utils import embedder
+    from .chunk_store import ChunkStore
+    dirs = [d for d in chunk_dirs(Path(args.storage)) if ChunkStore.exists(d)]
+    if not dirs:
+        raise SystemExit("Chunk store missing. Run: python -m app.ingest")
+    texts = [t for d in dirs for t in ChunkStore(d).iter_texts()]
+    model = embedder()
+    # embedding chunk diambil dari cache on-disk hasil ingest, jadi tidak dihitung ulang
+    embs = np.asarray(model.encode(texts, normalize_embeddings=True), dtype="float32")
+    if args.queries:
+        qtexts = [q.strip() for q in Path(args.queries).read_text(encoding="utf-8").splitlines() if q.strip()]
+    else:
+        rng = np.random.default_rng(0)
+        pick = rng.choice(len(texts), size=min(args.sample, len(texts)), replace=False)
+        qtexts = [" ".join(texts[i].split()[:12]) for i in pick]
+    queries = np.asarray(model.encode(qtexts, normalize_embeddings=True), dtype="float32")
+
+    rows = recall_report(embs, queries, k=args.k)
+    print(f"{len(texts)} vectors, {len(qtexts)} queries, recall@{args.k} vs flat")
+    print(f"{'index':<8}{'setting':<16}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in rows:
+        print(f"{r['index']:<8}{r['setting']:<16}{r['recall']:>8.3f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+
+def main():
+    ap = argparse.ArgumentParser(description="FAISS index tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("report", help="recall vs latency terhadap baseline flat")
+    rp.add_argument("--k", type=int, default=10)
+    rp.add_argument("--queries", help="file teks, satu query per baris (default: sampel awal chunk)")
+    rp.add_argument("--sample", type=int, default=200)
+    rp.add_argument("--json", help="simpan hasil sebagai JSON")
+    rp.add_argument("--storage", default=str(STORAGE_DIR), help="direktori storage hasil ingest")
+    args = ap.parse_args()
+    if args.cmd == "report":
+        _report(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,115 @@
-import os, json
+import os, json, shutil
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterator, List, Tuple
 import numpy as np
-import faiss
 
-from .utils import load_document, chunk_text, embedder, save_metadata
+from .utils import load_document, iter_pdf_pages, chunk_spans, chunk_pages, clean_text, embedder
+from .chunk_store import ChunkStoreWriter
+from .ingest.parallel import iter_files_ordered
+from .ingest.pipeline import batched, prefetch
+from .faiss_index import build_index, save_index
+from .snapshots import new_version_dir, publish, gc_versions
+from .shards import ShardedWriter
 
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 STORAGE_DIR = Path(__file__).resolve().parents[1] / "storage"
 STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
-INDEX_PATH = STORAGE_DIR / "index.faiss"
-META_PATH  = STORAGE_DIR / "metadata.json"
-CHUNKS_PATH = STORAGE_DIR / "chunks.jsonl"
+# tiap ingest menulis snapshot baru storage/versions/<version>/ lalu memindah storage/CURRENT
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))
+# chunk per panggilan encode (dan per batch yang ditahan di memori)
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+# INDEX_SHARDS > 1: chunk dibagi ke N shard (index + chunk store sendiri), per hash chunk atau per source
+INDEX_SHARDS = int(os.getenv("INDEX_SHARDS", "1"))
+INDEX_SHARD_BY = os.getenv("INDEX_SHARD_BY", "hash").lower()
+
+def _clean_spans(chunks) -> Iterator[Tuple[str, Dict]]:
+    # offset karakter + rentang baris (+ halaman untuk PDF) terhadap teks hasil parse
+    for c in chunks:
+        cleaned = clean_text(c.text)
+        if cleaned:
+            yield cleaned, c.metadata()
+
+def iter_chunks(files: List[Path], tokenizer=None) -> Iterator[Tuple[str, Dict]]:
+    """
+    (chunk, metadata) secara streaming. PDF dibaca per halaman; chunk boleh melewati batas halaman
+    (metadata `page`/`page_end`). File lain di-parse paralel di process pool lalu di-chunk sesuai urutan
+    `files`, jadi urutan row FAISS + chunk store sama antar run. `tokenizer` = tokenizer embedder, untuk CHUNK_UNIT=tokens.
+    """
+    others = [str(f) for f in files if f.suffix.lower() != ".pdf"]
+    for r in iter_files_ordered(load_document, others):
+        name = Path(r.path).name
+        if r.error:
+            print(f"Skipping {name}: {r.error}")
+            continue
+        if not (r.value or "").strip():
+            print(f"Skipping (empty or unsupported): {name}")
+            continue
+        for idx, (ch, span) in enumerate(_clean_spans(chunk_spans(r.value, tokenizer=tokenizer))):
+            yield ch, {"source": name, "location": f"chunk {idx+1}", **span}
+    for f in (f for f in files if f.suffix.lower() == ".pdf"):
+        n = 0
+        try:
+            for ch, span in _clean_spans(chunk_pages(iter_pdf_pages(f), tokenizer=tokenizer)):
+                n += 1
+                yield ch, {"source": f.name, "location": f"chunk {n}", **span}
+        except Exception as e:
+            # error per file seperti cabang non-PDF: file berikutnya tetap di-ingest;
+            # halaman yang sudah terbaca sebelum error tetap masuk index
+            print(f"Skipping rest of {f.name} after {n} chunks: {type(e).__name__}: {e}")
+            continue
+        if n == 0:
+            print(f"Skipping (empty or unsupported): {f.name}")
+
+def _build_sharded(model, files: List[Path], version_dir: Path, shards: int, by: str):
+    """Seperti _build_version, tapi chunk + embedding langsung dirutekan ke shard-nya (lihat app/shards.py)."""
+    with ShardedWriter(version_dir, shards, by) as writer:
+        chunks = iter_chunks(files, tokenizer=getattr(model, "tokenizer", None))
+        for batch in prefetch(batched(chunks, BATCH_SIZE), depth=2):
+            embs = np.asarray(model.encode([t for t, _ in batch], normalize_embeddings=True), dtype="float32")
+            writer.add([t for t, _ in batch], [m for _, m in batch], embs)
+            print(f"Embedded {sum(writer.rows)} chunks...")
+
+    if not sum(writer.rows):
+        shutil.rmtree(version_dir, ignore_errors=True)
+        return None
+    manifest = writer.finish()
+    print(f"{manifest['ntotal']} chunks in {shards} shards by {by}: {[s['ntotal'] for s in manifest['shards']]}")
+    return publish(STORAGE_DIR, version_dir)
+
+def _build_version(model, files: List[Path], version_dir: Path):
+    """Embed + index `files` ke `version_dir` lalu publish; None jika tidak ada chunk."""
+    if INDEX_SHARDS > 1:
+        return _build_sharded(model, files, version_dir, INDEX_SHARDS, INDEX_SHARD_BY)
+    emb_path = version_dir / "embeddings.f32"
+
+    # halaman → chunk → batch embedding; parsing batch berikutnya jalan di thread prefetch selagi batch
+    # sekarang di-encode. Teks langsung ke chunk store, embedding ke file sementara, jadi memori puncak
+    # tidak bergantung panjang dokumen (selain index FAISS itu sendiri).
+    rows, dim = 0, None
+    with ChunkStoreWriter(version_dir / "chunks") as store, open(emb_path, "wb") as emb_file:
+        chunks = iter_chunks(files, tokenizer=getattr(model, "tokenizer", None))
+        for batch in prefetch(batched(chunks, BATCH_SIZE), depth=2):
+            embs = np.asarray(model.encode([t for t, _ in batch], normalize_embeddings=True), dtype="float32")
+            emb_file.write(embs.tobytes())
+            for text, meta in batch:
+                store.add(text, meta)
+            rows, dim = rows + len(batch), embs.shape[1]
+            print(f"Embedded {rows} chunks...")
+
+    if not rows:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        return None
+
+    # tipe index dari FAISS_INDEX_TYPE (flat/hnsw/ivfpq); dicatat di index_info.json untuk server
+    embs = np.memmap(emb_path, dtype="float32", mode="r", shape=(rows, dim))
+    index, info = build_index(embs)
+    print(f"Built {info['factory']} index ({info['ntotal']} vectors) in {info['build_seconds']}s")
+    del embs
+    emb_path.unlink()
+
+    save_index(index, info, version_dir / "index.faiss")
+    return publish(STORAGE_DIR, version_dir)
 
 def main():
     print(f"[INGEST] Reading from {DATA_DIR} ...")
@@ -24,38 +121,20 @@ def main():
         return
 
     model = embedder()
-    texts: List[str] = []
-    metas: List[Dict] = []
-
-    for f in files:
-        raw = load_document(f)
-        if not raw.strip():
-            print(f"Skipping (empty or unsupported): {f.name}")
-            continue
-        chunks = chunk_text(raw)
-        for idx, ch in enumerate(chunks):
-            texts.append(ch)
-            metas.append({"source": f.name, "location": f"chunk {idx+1}"})
-
-    if not texts:
+    version_dir = new_version_dir(STORAGE_DIR)
+    try:
+        version = _build_version(model, sorted(files), version_dir)
+    except BaseException:
+        # jangan tinggalkan embeddings.f32 / chunk store setengah jadi di versions/<v>.tmp
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    if version is None:
         print("No chunks produced.")
         return
-
-    # --- write chunks.jsonl so server can read chunk texts ---
-    with CHUNKS_PATH.open("w", encoding="utf-8") as out:
-        for t in texts:
-            out.write(json.dumps({"text": t}, ensure_ascii=False) + "\n")
-    print(f"Wrote {CHUNKS_PATH}")
-
-    print(f"Embedding {len(texts)} chunks...")
-    embs = model.encode(texts, normalize_embeddings=True)
-    dim = embs.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(np.array(embs, dtype="float32"))
-
-    faiss.write_index(index, str(INDEX_PATH))
-    save_metadata(META_PATH, metas)
-    print(f"Saved index to {INDEX_PATH} and metadata to {META_PATH}")
+    print(f"Published index version {version} (server picks it up via /reload or polling)")
+    removed = gc_versions(STORAGE_DIR, keep=KEEP_VERSIONS)
+    if removed:
+        print(f"Removed old versions: {', '.join(removed)}")
 
 if __name__ == "__main__":
     main()
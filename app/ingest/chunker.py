@@ -0,0 +1,187 @@
+# app/ingest/chunker.py
+"""
+Chunker bersama untuk stack Chroma (indexer) dan stack FAISS (utils.chunk_text).
+
+Satu pass linear: tiap chunk hanya mencari batas terbaik (paragraf > baris > kalimat > spasi) di paruh akhir
+jendela ukurannya dengan str.rfind, dan nomor baris dihitung bertahap dari posisi chunk sebelumnya. Tiap chunk
+membawa offset karakter persis ke teks asli (text[start:end] == chunk.text), rentang baris, rentang halaman,
+dan jumlah token. Ukuran bisa dalam karakter atau token: tokenizer embedder jika diberikan (offset
+HF fast tokenizer, mis. SentenceTransformer.tokenizer), selain itu tiktoken untuk EMBEDDING_MODEL (persis untuk
+model embedding OpenAI; model lain memakai cl100k_base sebagai pendekatan), fallback ~4 karakter/token.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+class Chunk:
+    __slots__ = ("text", "start", "end", "line_start", "line_end", "page_start", "page_end", "tokens")
+
+    def __init__(self, text: str, start: int, end: int, line_start: int, line_end: int,
+                 page_start: Optional[int], page_end: Optional[int], tokens: int):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.line_start = line_start
+        self.line_end = line_end
+        self.page_start = page_start
+        self.page_end = page_end
+        self.tokens = tokens
+
+    def metadata(self) -> dict:
+        md = {"start_index": self.start, "end_index": self.end, "line_start": self.line_start, "line_end": self.line_end}
+        if self.page_start is not None:
+            md["page"] = self.page_start
+            if self.page_end != self.page_start:
+                md["page_end"] = self.page_end
+        return md
+
+    def __repr__(self) -> str:
+        return f"Chunk({self.start}:{self.end}, lines {self.line_start}-{self.line_end}, {self.tokens} tok)"
+
+class _Units:
+    """Konversi ukuran karakter/token ↔ posisi karakter."""
+
+    def __init__(self, text: str, unit: str, model: Optional[str], tokenizer=None):
+        self.n = len(text)
+        self.offs: Optional[List[int]] = None
+        if unit == "tokens":
+            if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+                # tokenizer embedder sendiri (HF fast): offset awal tiap token ke teks asli
+                spans = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                                  verbose=False)["offset_mapping"]
+                offs = [a for a, b in spans if b > a]
+                self.offs = offs if not offs or offs[0] == 0 else [0] + offs  # whitespace di depan = 1 unit
+            else:
+                from app.rag.packing import _encoding
+                enc = _encoding(model or settings.EMBEDDING_MODEL)
+                if enc is not None:
+                    decoded, offs = enc.decode_with_offsets(enc.encode(text, disallowed_special=()))
+                    self.offs = offs if decoded == text else None
+            if self.offs is None:
+                self.offs = list(range(0, self.n, 4))  # sama dengan estimate_tokens
+
+    def forward(self, s: int, size: int) -> int:
+        """Posisi karakter setelah `size` unit mulai dari `s`."""
+        if self.offs is None:
+            return min(self.n, s + size)
+        j = bisect_right(self.offs, s) - 1 + size
+        return self.offs[j] if j < len(self.offs) else self.n
+
+    def back(self, e: int, size: int) -> int:
+        if self.offs is None:
+            return max(0, e - size)
+        return self.offs[max(0, bisect_right(self.offs, e) - 1 - size)] if self.offs else 0
+
+    def count(self, s: int, e: int) -> int:
+        if self.offs is None:
+            return (e - s) // 4 + 1
+        return max(1, bisect_left(self.offs, e) - bisect_left(self.offs, s))
+
+def split_text(text: str, size: Optional[int] = None, overlap: Optional[int] = None, unit: Optional[str] = None,
+               page_starts: Optional[Sequence[int]] = None, first_page: int = 1, first_line: int = 1,
+               model: Optional[str] = None, tokenizer=None) -> List[Chunk]:
+    """
+    Potong `text` menjadi chunk ≤ `size` unit (CHUNK_SIZE / CHUNK_UNIT) dengan overlap ≈ `overlap` unit,
+    dipotong di batas struktural terbaik yang mengisi ≥ 50% jendela (tanpa overlap jika batasnya paragraf).
+    `page_starts` = offset karakter awal tiap halaman berurutan mulai `first_page` (untuk rentang halaman);
+    `first_line` = nomor baris karakter pertama `text` (dipakai split_pages untuk teks lanjutan).
+    """
+    size = size or settings.CHUNK_SIZE
+    overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+    overlap = max(0, min(overlap, size // 2))
+    units = _Units(text, (unit or settings.CHUNK_UNIT).lower(), model, tokenizer)
+    n = len(text)
+    count_nl, rfind, find = text.count, text.rfind, text.find
+    chars = units.offs is None
+
+    def page(pos: int) -> Optional[int]:
+        return None if page_starts is None else bisect_right(page_starts, pos) - 1 + first_page
+
+    out: List[Chunk] = []
+    s = 0
+    pos, line = 0, first_line  # nomor baris dihitung bertahap dari posisi terakhir (str.count), total linear
+    while True:
+        while s < n and text[s].isspace():
+            s += 1
+        if s >= n:
+            break
+        lim = min(n, s + size) if chars else units.forward(s, size)
+        para = False
+        if lim >= n:
+            end = nxt = n
+        else:
+            # hanya paruh akhir jendela chunk ini yang dicari (rfind di C)
+            floor = s + (lim - s) // 2
+            i = rfind("\n\n", floor, lim)
+            if i > floor:
+                end, nxt, para = i, i + 2, True
+            else:
+                i = rfind("\n", floor, lim)
+                if i > floor:
+                    end, nxt = i, i + 1
+                else:
+                    i = max(rfind(". ", floor, lim), rfind("? ", floor, lim), rfind("! ", floor, lim))
+                    if i > floor:
+                        end, nxt = i + 1, i + 2
+                    else:
+                        i = rfind(" ", floor, lim)
+                        end = nxt = i if i > floor else lim
+                        if i > floor:
+                            nxt = i + 1
+        e = end
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        line = line + count_nl("\n", pos, s) if s >= pos else line - count_nl("\n", s, pos)
+        line_end = line + count_nl("\n", s, e - 1)
+        pos = s
+        out.append(Chunk(text[s:e], s, e, line, line_end, page(s), page(e - 1),
+                         (e - s) // 4 + 1 if chars else units.count(s, e)))
+        if end >= n:
+            break
+        if overlap and not para:
+            # chunk yang berakhir di batas paragraf tidak perlu overlap (paragraf berikutnya mulai utuh);
+            # selain itu mundur `overlap` unit lalu maju ke awal kata berikutnya, supaya overlap tidak memotong kata
+            o = max(0, end - overlap) if chars else units.back(end, overlap)
+            j, k = find(" ", o, end), find("\n", o, end)
+            back = (min(j, k) if j != -1 and k != -1 else max(j, k)) + 1 if (j != -1 or k != -1) else o
+            s = back if s < back < end else (o if s < o < end else nxt)
+        else:
+            s = nxt
+    return out
+
+def _shift(c: Chunk, base: int) -> Chunk:
+    return Chunk(c.text, c.start + base, c.end + base, c.line_start, c.line_end, c.page_start, c.page_end, c.tokens)
+
+def split_pages(pages: Iterable[Tuple[int, str]], size: Optional[int] = None, overlap: Optional[int] = None,
+                unit: Optional[str] = None, model: Optional[str] = None, tokenizer=None) -> Iterator[Chunk]:
+    """
+    Chunk dokumen per halaman secara streaming, tapi chunk boleh melewati batas halaman (overlap tetap jalan):
+    chunk terakhir tiap halaman ditahan lalu dipotong ulang bersama halaman berikutnya. Memori = satu halaman
+    + satu chunk. Offset, nomor baris, dan halaman (page/page_end) relatif ke "\n".join(teks halaman), jadi
+    nomor baris PDF berlanjut antar halaman (tidak mulai dari 1 per halaman).
+    `pages` = (nomor halaman, teks) berurutan dan berurutan nomornya.
+    """
+    carry, starts, first_page = "", [0], 1  # sisa chunk terakhir + awal halaman di dalamnya
+    base, line = 0, 1                        # offset dokumen & nomor baris karakter pertama `carry`
+    next_base, next_line = 0, 1              # offset dokumen & nomor baris awal halaman berikutnya
+    for page, text in pages:
+        if carry:
+            joined, page_starts = carry + "\n" + text, starts + [len(carry) + 1]
+        else:
+            joined, page_starts, first_page, base, line = text, [0], page, next_base, next_line
+        next_base += len(text) + 1
+        next_line += text.count("\n") + 1
+        chunks = split_text(joined, size, overlap, unit, page_starts, first_page, line, model, tokenizer)
+        if not chunks:
+            carry = ""
+            continue
+        last = chunks[-1]
+        for c in chunks[:-1]:
+            yield _shift(c, base)
+        # chunk terakhir mungkin bersambung ke halaman berikutnya → tahan
+        carry = joined[last.start:]
+        starts = [0] + [p - last.start for p in page_starts if p > last.start]
+        first_page, base, line = last.page_start, base + last.start, last.line_start
+    if carry:
+        for c in split_text(carry, size, overlap, unit, starts, first_page, line, model, tokenizer):
+            yield _shift(c, base)
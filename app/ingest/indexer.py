@@ -1,83 +1,232 @@
 # app/ingest/indexer.py
-from typing import Dict, Any, List
+import os, threading
+from itertools import chain, groupby
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from app.core.config import settings
 from app.core.logger import logger
-from app.ingest.loader import load_documents_from_dir, load_documents_from_payload
-from app.ingest.cleaner import clean_documents
+from app.ingest.loader import iter_documents, list_data_files, save_payload_files
+from app.ingest.manifest import IngestManifest, file_sha256, chunk_id
+from app.ingest.cleaner import normalize_text
+from app.ingest.chunker import split_text, split_pages
 from app.vectorstore.chroma_store import new_vectorstore
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
+from app.ingest.upsert import UpsertScheduler
+from app.ingest.pipeline import batched
+from app.rag.lexical_index import get_bm25_index
+from langchain_core.documents import Document
 
 def _split_docs(docs: List[Document]) -> List[Document]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP,
-        separators=["\n\n", "\n", " ", ""],
-    )
-    chunks = splitter.split_documents(docs)
-    # simulasi line range jika tersedia
-    for c in chunks:
-        md = c.metadata
-        if "line_start" in md and md["line_start"] is not None and md.get("line_end") is None:
-            ln = max(1, len(c.page_content.splitlines()))
-            md["line_end"] = md["line_start"] + ln - 1
+    # chunker linear bersama (app/ingest/chunker.py): dipotong dari teks mentah supaya offset + nomor baris
+    # menunjuk ke file asli, baru tiap chunk dinormalisasi
+    chunks: List[Document] = []
+    for d in docs:
+        for c in split_text(d.page_content or ""):
+            text = normalize_text(c.text)
+            if text:
+                chunks.append(Document(page_content=text, metadata={**d.metadata, **c.metadata()}))
     return chunks
 
-def _collect_stats(chunks: List[Document]):
-    files = {}
-    for c in chunks:
-        src = c.metadata.get("source", "unknown")
-        files[src] = files.get(src, 0) + 1
-    return [{"filename": k, "chunks": v} for k, v in files.items()]
+def _split_source(docs: Iterator[Document]) -> Iterator[Document]:
+    """
+    Chunk semua dokumen dari satu file. Halaman PDF (metadata `page`) di-chunk bersambung lewat split_pages:
+    chunk boleh melewati batas halaman (page/page_end), nomor baris berlanjut antar halaman.
+    """
+    first = next(docs)
+    if "page" not in first.metadata:
+        yield from _split_docs(list(chain([first], docs)))
+        return
+    base = {k: v for k, v in first.metadata.items() if k not in ("page", "page_label")}
+    pages = ((d.metadata.get("page", 0), d.page_content or "") for d in chain([first], docs))
+    for c in split_pages(pages):
+        text = normalize_text(c.text)
+        if text:
+            yield Document(page_content=text, metadata={**base, **c.metadata()})
+
+def _metadata(d: Document) -> Dict[str, Any]:
+    return {k: v for k, v in d.metadata.items() if v is not None}
 
-def _add_in_batches(vs, docs: List[Document], batch_size: int = 100):
-    total = len(docs)
-    if total == 0:
+def _delete_chunks(vs, ids: List[str]):
+    if not ids:
         return
+    vs.delete(ids=ids)
+    get_bm25_index(vs).remove(ids)
+
+def _add_stream(vs, chunks: Iterable[Tuple[Document, str]], batch_size: int = 100) -> Dict[str, Any]:
+    """Embed + upsert (chunk, id) dari iterator; scheduler menarik chunk baru hanya saat ada slot batch."""
+    bm25 = get_bm25_index(vs)
+
+    def write(batch_ids, texts, metas, vectors):
+        # embedding sudah dihitung paralel oleh scheduler; write ke Chroma tetap berurutan
+        vs._collection.upsert(ids=batch_ids, embeddings=vectors, documents=texts, metadatas=metas)
+        bm25.add(batch_ids, texts)
+
     # safety: jaga-jaga kalau ada yang set batch_size > 166
-    batch_size = min(batch_size, 166)
-    for i in range(0, total, batch_size):
-        batch = docs[i:i + batch_size]
-        vs.add_documents(batch)
-        logger.info(f"[indexer] upserted {min(i+batch_size, total)}/{total}")
+    scheduler = UpsertScheduler(vs.embeddings, write, max_items=min(batch_size, 166))
+    items = ((cid, d.page_content, _metadata(d)) for d, cid in chunks)
+    stats = scheduler.run_stream(items)
+    if stats["chunks"]:
+        logger.info(f"[indexer] upserted {stats['chunks']} chunks in {stats['batches']} batches, "
+                    f"{stats['chunks_per_s']} chunks/s, {stats['retries']} retries")
+    return stats
+
+def _iter_chunks(names: List[str], by_source: Dict[str, List[str]], errors: Dict[str, str]) -> Iterator[Tuple[Document, str]]:
+    """
+    Halaman → split → clean → (chunk, id) secara streaming; id per file dicatat di `by_source`,
+    file yang gagal di-load dicatat di `errors`.
+    """
+    seen = set()
+    for _, docs in groupby(iter_documents(names, errors=errors), key=lambda d: d.metadata.get("source", "unknown")):
+        for c in _split_source(docs):
+            cid = chunk_id(c.metadata.get("source", "unknown"), c.page_content)
+            if cid in seen:
+                continue
+            seen.add(cid)
+            c.metadata["chunk_id"] = cid
+            by_source.setdefault(c.metadata.get("source", "unknown"), []).append(cid)
+            yield c, cid
+
+def _relocate(vs, metas: Dict[str, Dict[str, Any]]):
+    """Ganti metadata chunk yang sudah ada tanpa embed ulang (embedding + dokumen lama ditulis balik)."""
+    # upsert, bukan update: update Chroma me-merge metadata, jadi key yang hilang (mis. page_end) akan tertinggal
+    got = vs._collection.get(ids=list(metas), include=["embeddings", "documents"])
+    vs._collection.upsert(ids=got["ids"], embeddings=got["embeddings"], documents=got["documents"],
+                          metadatas=[metas[i] for i in got["ids"]])
+    # teks sama, jadi BM25 tidak berubah; versinya tetap dinaikkan supaya cache retrieval/jawaban lama tidak dipakai
+    get_bm25_index(vs).touch()
+
+def _skip_existing(vs, chunks: Iterable[Tuple[Document, str]], counts: Dict[str, int], block: int = 256) -> Iterator[Tuple[Document, str]]:
+    """
+    Skip chunk yang sudah ada di koleksi (konten sama → ID sama); dicek per blok supaya tetap streaming.
+    ID hanya bergantung pada teks, jadi chunk yang bergeser karena edit di atasnya tetap di-skip tapi
+    lokasinya (start_index, line_*, page) diperbarui supaya sitasi menunjuk ke posisi baru.
+    """
+    for group in batched(chunks, block):
+        got = vs._collection.get(ids=[cid for _, cid in group], include=["metadatas"])
+        existing = dict(zip(got["ids"], got["metadatas"]))
+        moved: Dict[str, Dict[str, Any]] = {}
+        for c, cid in group:
+            if cid not in existing:
+                counts["fresh"] += 1
+                yield c, cid
+            elif existing[cid] != _metadata(c):
+                moved[cid] = _metadata(c)
+        if moved:
+            _relocate(vs, moved)
+            counts["relocated"] += len(moved)
+
+# /ingest-json (run_blocking) dan job upload bisa jalan bersamaan; keduanya load → ubah → simpan manifest
+# dan koleksi yang sama, jadi indexing dalam satu proses diserialkan
+_INDEX_LOCK = threading.Lock()
+
+def _index_files(vs, names: List[str], prune_missing: bool = False, known_hashes: Optional[Dict[str, str]] = None,
+                 require_chunks: bool = False) -> Dict[str, Any]:
+    with _INDEX_LOCK:
+        return _index_files_locked(vs, names, prune_missing, known_hashes, require_chunks)
+
+def _index_files_locked(vs, names: List[str], prune_missing: bool, known_hashes: Optional[Dict[str, str]],
+                        require_chunks: bool) -> Dict[str, Any]:
+    """
+    Ingest inkremental: hanya file baru/berubah (sha256 + parameter chunking) yang di-load,
+    chunk basi dari file yang berubah dihapus, chunk yang sudah ada tidak di-embed ulang.
+    File yang gagal di-load atau tidak menghasilkan chunk berstatus "error": chunk lamanya dan entri
+    manifest-nya dibiarkan, chunk parsial dari percobaan ini dibuang.
+    `known_hashes`: sha256 yang sudah dihitung saat upload streaming (file tidak dibaca ulang).
+    `require_chunks`: ValueError (sebelum manifest disimpan) jika tidak ada file berubah yang menghasilkan chunk.
+    """
+    manifest = IngestManifest.for_collection(vs._collection.name)
+    report: Dict[str, Dict[str, Any]] = {}
+    hashes: Dict[str, str] = {}
+    for name in names:
+        h = (known_hashes or {}).get(name) or file_sha256(os.path.join(settings.DATA_DIR, name))
+        if manifest.is_unchanged(name, h):
+            report[name] = {"filename": name, "status": "unchanged", "chunks": len(manifest.chunk_ids(name))}
+        else:
+            hashes[name] = h
+            report[name] = {"filename": name, "status": "changed" if name in manifest.files else "new", "chunks": 0}
+
+    # file berubah di-stream halaman → chunk → batch embedding; memori tidak tumbuh dengan panjang dokumen
+    by_source: Dict[str, List[str]] = {n: [] for n in hashes}
+    errors: Dict[str, str] = {}
+    counts = {"fresh": 0, "relocated": 0}
+    if hashes:
+        _add_stream(vs, _skip_existing(vs, _iter_chunks(list(hashes), by_source, errors), counts), batch_size=100)
+    for name in hashes:
+        if name not in errors and not by_source[name]:
+            errors[name] = "no chunks produced (empty or unreadable, e.g. scanned PDF without OCR)"
+
+    # file gagal: buang chunk parsial yang belum tercatat di manifest, versi lama tetap utuh di index
+    partial: List[str] = []
+    for name in errors:
+        old = set(manifest.chunk_ids(name))
+        partial.extend(i for i in by_source.pop(name, []) if i not in old)
+        hashes.pop(name, None)
+        report[name].update(status="error", error=errors[name], chunks=len(old))
+    if require_chunks and (errors or hashes) and not any(by_source.values()):
+        _delete_chunks(vs, partial)
+        get_bm25_index(vs).save()
+        detail = "; ".join(f"{n}: {e}" for n, e in errors.items())
+        raise ValueError(f"Uploaded files produced 0 chunks. Ensure files have extractable text or use OCR. ({detail})")
+
+    # hapus chunk basi (setelah chunk baru masuk): milik file yang berubah tapi tidak muncul lagi / file yang sudah hilang
+    stale: List[str] = list(partial)
+    for name, new_ids in by_source.items():
+        keep = set(new_ids)
+        stale.extend(i for i in manifest.chunk_ids(name) if i not in keep)
+    removed = [n for n in manifest.files if n not in names] if prune_missing else []
+    for name in removed:
+        stale.extend(manifest.chunk_ids(name))
+    _delete_chunks(vs, stale)
+    get_bm25_index(vs).save()
+
+    for name, h in hashes.items():
+        manifest.set(name, h, by_source[name])
+        report[name]["chunks"] = len(by_source[name])
+    for name in removed:
+        manifest.remove(name)
+    manifest.save()
+
+    logger.info(f"[indexer] files changed={len(hashes)} failed={len(errors)} "
+                f"unchanged={len(names) - len(hashes) - len(errors)} removed={len(removed)}; chunks added={counts['fresh']} "
+                f"relocated={counts['relocated']} deleted={len(stale)}")
+    return {
+        "files": [report[n] for n in names],
+        "added_chunks": counts["fresh"],
+        "deleted_chunks": len(stale),
+        "total_chunks": vs._collection.count(),
+    }
 
 def build_index_from_dir() -> Dict[str, Any]:
-    docs = load_documents_from_dir()
-    if not docs:
+    names = list_data_files()
+    if not names:
         raise ValueError("No documents found in ./data. Add PDF/TXT/MD/PNG first or use /ingest-json.")
-    docs = clean_documents(docs)
-    chunks = _split_docs(docs)
-    if not chunks:
-        raise ValueError("No chunks could be created. Files may be empty or unreadable (e.g., scanned PDFs without OCR).")
 
     vs = new_vectorstore()  # Chroma auto-persist
-
-    _add_in_batches(vs, chunks, batch_size=100)
-
-    logger.info(f"Indexed chunks: {len(chunks)}")
-    return {"files": _collect_stats(chunks), "total_chunks": len(chunks)}
+    stats = _index_files(vs, names, prune_missing=True)
+    if stats["total_chunks"] == 0:
+        raise ValueError("No chunks could be created. Files may be empty or unreadable (e.g., scanned PDFs without OCR).")
+    return stats
 
 def build_index_from_payload(payload) -> Dict[str, Any]:
-    docs, saved = load_documents_from_payload(payload.files)
+    saved = save_payload_files([f.model_dump() for f in payload.files])
     # override chunk params jika dikirim
     if payload.options and payload.options.chunk_size:
         settings.CHUNK_SIZE = payload.options.chunk_size  # type: ignore
     if payload.options and payload.options.chunk_overlap:
         settings.CHUNK_OVERLAP = payload.options.chunk_overlap  # type: ignore
 
-    docs = clean_documents(docs)
-    chunks = _split_docs(docs)
-    if not chunks:
-        raise ValueError("Uploaded files produced 0 chunks. Ensure files have extractable text or use OCR.")
-
     vs = new_vectorstore()
+    stats = _index_files(vs, [s["filename"] for s in saved], require_chunks=True)
+    for info, f in zip(saved, stats["files"]):
+        info.update({k: v for k, v in f.items() if k != "filename"})
+    return {**stats, "files": saved}
 
-    _add_in_batches(vs, chunks, batch_size=100)
-
-    logger.info(f"Indexed chunks: {len(chunks)}")
-    return {"files": saved, "total_chunks": len(chunks)}
+def build_index_from_files(files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Index file yang sudah ada di data dir (hasil upload streaming): [{filename, sha256}, ...]"""
+    names = [f["filename"] for f in files]
+    vs = new_vectorstore()
+    return _index_files(vs, names, known_hashes={f["filename"]: f["sha256"] for f in files if f.get("sha256")},
+                        require_chunks=True)
 
 # CLI
 if __name__ == "__main__":
     out = build_index_from_dir()
-    print(f"Indexed: {out['total_chunks']} chunks")
+    print(f"Indexed: {out['added_chunks']} new chunks ({out['total_chunks']} total)")
@@ -0,0 +1,86 @@
+# app/ingest/jobs.py
+import time, uuid, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.logger import logger
+
+class IngestJob:
+    """Status satu job ingest background: queued → running → done | error."""
+
+    def __init__(self, files: List[Dict[str, Any]]):
+        self.id = uuid.uuid4().hex[:16]
+        self.files = files
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "files": self.files,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "seconds": round(self.finished - self.started, 3) if self.started and self.finished else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class IngestJobs:
+    """
+    Antrian job ingest dengan satu worker: job dijalankan berurutan, HTTP request cukup menunggu upload selesai.
+    Penulisan manifest + koleksi Chroma diserialkan lock di indexer (juga terhadap /ingest-json yang
+    tidak lewat antrian ini). Riwayat job dibatasi INGEST_JOB_HISTORY.
+    """
+
+    def __init__(self, history: Optional[int] = None):
+        self.history = history or settings.INGEST_JOB_HISTORY
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-job")
+
+    def submit(self, files: List[Dict[str, Any]], fn: Callable[[], Dict[str, Any]]) -> IngestJob:
+        job = IngestJob(files)
+        with self._lock:
+            self._jobs[job.id] = job
+            # buang job lama yang sudah selesai jika riwayat penuh
+            for old in [j for j in self._jobs.values() if j.status in ("done", "error")]:
+                if len(self._jobs) <= self.history:
+                    break
+                del self._jobs[old.id]
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: IngestJob, fn: Callable[[], Dict[str, Any]]):
+        job.status, job.started = "running", time.time()
+        try:
+            job.result = fn()
+            job.status = "done"
+        except Exception as e:
+            job.error, job.status = str(e), "error"
+            logger.error(f"[ingest-job] {job.id} failed: {e}")
+        finally:
+            job.finished = time.time()
+        logger.info(f"[ingest-job] {job.id} {job.status} in {job.finished - job.started:.2f}s")
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+_JOBS: Optional[IngestJobs] = None
+
+def get_jobs() -> IngestJobs:
+    global _JOBS
+    if _JOBS is None:
+        _JOBS = IngestJobs()
+    return _JOBS
@@ -1,23 +1,28 @@
 import os, io, base64
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Iterator, Tuple, Optional
 from app.core.config import settings
 from app.core.logger import logger
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.schema import Document
-from markdown import markdown
-from bs4 import BeautifulSoup
-from PIL import Image
-import pytesseract
+from langchain_core.documents import Document
+from app.ingest.parallel import iter_files_ordered, record_error, LoadError
 
 def _ensure_data_dir():
     os.makedirs(settings.DATA_DIR, exist_ok=True)
 
-def _save_base64(filename: str, b64: str) -> str:
+def _save_base64(filename: str, b64: str, block: int = 4 << 20) -> str:
     _ensure_data_dir()
-    raw = base64.b64decode(b64)
     path = os.path.join(settings.DATA_DIR, filename)
+    # decode per blok supaya hasil decode tidak ada utuh di memori; file besar sebaiknya lewat
+    # PUT /ingest/upload/{filename}. Whitespace (base64 ber-baris/MIME, di posisi mana pun) dibuang per blok,
+    # sisa yang bukan kelipatan 4 karakter dibawa ke blok berikutnya.
+    carry = ""
     with open(path, "wb") as f:
-        f.write(raw)
+        for i in range(0, len(b64), block):
+            part = carry + "".join(b64[i:i + block].split())
+            cut = len(part) - len(part) % 4
+            f.write(base64.b64decode(part[:cut]))
+            carry = part[cut:]
+        if carry:
+            f.write(base64.b64decode(carry))  # panjang tidak valid → binascii.Error (padding)
     return path
 
 def _save_text(filename: str, text: str) -> str:
@@ -29,49 +34,92 @@ def _save_text(filename: str, text: str) -> str:
 
 def _md_to_text(md_str: str) -> str:
     # Render markdown → HTML → plain text untuk buang markup
+    from markdown import markdown
+    from bs4 import BeautifulSoup
     html = markdown(md_str)
     soup = BeautifulSoup(html, "html.parser")
     return soup.get_text("\n")
 
-def load_documents_from_dir() -> List[Document]:
-    """Load semua file dari data dir (pdf/txt/md/png)"""
+SUPPORTED_EXTS = (".pdf", ".txt", ".md", ".png")
+
+def list_data_files() -> List[str]:
+    """Nama file yang didukung di data dir (terurut, supaya deterministik)"""
+    _ensure_data_dir()
+    return sorted(
+        n for n in os.listdir(settings.DATA_DIR)
+        if os.path.isfile(os.path.join(settings.DATA_DIR, n)) and n.lower().endswith(SUPPORTED_EXTS)
+    )
+
+def _load_file(path: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """Parse/OCR satu file → [(text, metadata)]; jalan di worker process (lihat app.ingest.parallel)"""
+    # loader/OCR diimport di sini (worker), bukan saat API start: uploads.py hanya butuh SUPPORTED_EXTS
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+    name = os.path.basename(path)
+    low = name.lower()
+    if low.endswith(".pdf"):
+        return [(d.page_content, d.metadata) for d in PyPDFLoader(path).load()]
+    if low.endswith(".txt"):
+        return [(d.page_content, d.metadata) for d in TextLoader(path, encoding="utf-8").load()]
+    if low.endswith(".md"):
+        with open(path, "r", encoding="utf-8") as f:
+            return [(_md_to_text(f.read()), {"source": name})]
+    if low.endswith(".png"):
+        from PIL import Image
+        import pytesseract
+        img = Image.open(path)
+        return [(pytesseract.image_to_string(img), {"source": name})]
+    return []
+
+def _document(text: str, metadata: Dict[str, Any]) -> Document:
+    meta = dict(metadata) if metadata else {}
+    # source selalu nama file (PyPDFLoader/TextLoader mengisi path lengkap) supaya cocok dengan manifest
+    meta["source"] = os.path.basename(meta.get("source") or meta.get("file_path", "unknown"))
+    return Document(page_content=text, metadata=meta)
+
+def _data_paths(names: Optional[List[str]]) -> List[str]:
     _ensure_data_dir()
-    docs: List[Document] = []
-    for name in os.listdir(settings.DATA_DIR):
+    paths: List[str] = []
+    for name in (sorted(os.listdir(settings.DATA_DIR)) if names is None else names):
         path = os.path.join(settings.DATA_DIR, name)
         if not os.path.isfile(path):
             continue
-        if name.lower().endswith(".pdf"):
-            docs.extend(PyPDFLoader(path).load())
-        elif name.lower().endswith(".txt"):
-            docs.extend(TextLoader(path, encoding="utf-8").load())
-        elif name.lower().endswith(".md"):
-            with open(path, "r", encoding="utf-8") as f:
-                txt = _md_to_text(f.read())
-            docs.append(Document(page_content=txt, metadata={"source": name}))
-        elif name.lower().endswith(".png"):
-            try:
-                img = Image.open(path)
-                txt = pytesseract.image_to_string(img)
-                docs.append(Document(page_content=txt, metadata={"source": name}))
-            except Exception as e:
-                logger.warning(f"OCR gagal untuk {name}: {e}")
+        if name.lower().endswith(SUPPORTED_EXTS):
+            paths.append(path)
         else:
             logger.info(f"Skip unsupported: {name}")
-    # Tambahkan numbering line untuk txt/md/png
-    enhanced = []
-    for d in docs:
-        meta = dict(d.metadata) if d.metadata else {}
-        meta.setdefault("source", meta.get("source") or os.path.basename(meta.get("file_path", "unknown")))
-        if "page" not in meta and meta.get("source", "").lower().endswith((".txt", ".md", ".png")):
-            # simulasikan line range saat chunking (di indexer)
-            meta.setdefault("line_start", 1)
-            meta.setdefault("line_end", None)
-        enhanced.append(Document(page_content=d.page_content, metadata=meta))
-    return enhanced
+    return paths
+
+def iter_documents(names: Optional[List[str]] = None, workers: Optional[int] = None,
+                   errors: Optional[Dict[str, str]] = None) -> Iterator[Document]:
+    """
+    Load file dari data dir (pdf/txt/md/png), atau hanya `names` jika diberikan, secara streaming.
+    PDF dibaca per halaman (PyPDFLoader.lazy_load) di proses ini, jadi hanya satu halaman yang ada di memori;
+    file lain (txt/md/png, OCR) tetap paralel di process pool, di-yield sesuai urutan input. File yang gagal (termasuk PDF yang gagal di tengah, setelah sebagian
+    halaman ter-yield) dicatat ke `errors`; tanpa `errors` → LoadError.
+    """
+    paths = _data_paths(names)
+    pdfs = [p for p in paths if p.lower().endswith(".pdf")]
+    others = [p for p in paths if not p.lower().endswith(".pdf")]
+    for r in iter_files_ordered(_load_file, others, workers):
+        if r.error:
+            # iter_files_ordered sudah me-log kegagalannya
+            if errors is None:
+                raise LoadError({os.path.basename(r.path): r.error})
+            errors[os.path.basename(r.path)] = r.error
+            continue
+        for t, m in r.value:
+            yield _document(t, m)
+    if pdfs:
+        from langchain_community.document_loaders import PyPDFLoader
+    for path in pdfs:
+        try:
+            for page in PyPDFLoader(path).lazy_load():
+                yield _document(page.page_content, page.metadata)
+        except Exception as e:
+            record_error(errors, path, f"{type(e).__name__}: {e}")
 
-def load_documents_from_payload(files_payload: List[Dict[str, Any]]) -> Tuple[List[Document], List[Dict[str, Any]]]:
-    """Simpan file dari payload (base64/text), lalu load menjadi Documents"""
+def save_payload_files(files_payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Simpan file dari payload (base64/text) ke data dir"""
     saved_info: List[Dict[str, Any]] = []
     for f in files_payload:
         fn = f["filename"]
@@ -83,7 +131,4 @@ def load_documents_from_payload(files_payload: List[Dict[str, Any]]) -> Tuple[Li
         else:
             raise ValueError(f"{fn}: butuh base64 atau text.")
         saved_info.append({"filename": fn, "mime": mime})
-
-    # Setelah tersimpan → load dari folder
-    docs = load_documents_from_dir()
-    return docs, saved_info
+    return saved_info
@@ -0,0 +1,61 @@
+# app/ingest/manifest.py
+import os, json, hashlib
+from typing import Dict, Any, List, Optional
+from app.core.config import settings
+
+def file_sha256(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for buf in iter(lambda: f.read(block), b""):
+            h.update(buf)
+    return h.hexdigest()
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_id(source: str, text: str) -> str:
+    """ID deterministik: konten chunk yang sama dari file yang sama → ID yang sama."""
+    return hashlib.sha256(f"{source}\x00{chunk_hash(text)}".encode("utf-8")).hexdigest()[:32]
+
+CHUNKER_VERSION = "linear-v2"  # naikkan jika algoritma app/ingest/chunker.py berubah
+
+def chunking_signature() -> str:
+    # kalau parameter chunking berubah, file harus di-chunk ulang walau isinya sama
+    return f"{settings.CHUNK_SIZE}:{settings.CHUNK_OVERLAP}:{settings.CHUNK_UNIT}:{CHUNKER_VERSION}"
+
+class IngestManifest:
+    """
+    Manifest ingestion per koleksi: filename → {sha256, chunking, chunk_ids}.
+    Dipakai untuk skip file yang tidak berubah dan menghapus chunk basi dari file yang berubah.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    @classmethod
+    def for_collection(cls, collection_name: str) -> "IngestManifest":
+        return cls(os.path.join(settings.PERSIST_DIR, f"ingest_manifest_{collection_name}.json"))
+
+    def is_unchanged(self, filename: str, sha256: str) -> bool:
+        entry = self.files.get(filename)
+        return bool(entry) and entry.get("sha256") == sha256 and entry.get("chunking") == chunking_signature()
+
+    def chunk_ids(self, filename: str) -> List[str]:
+        return list((self.files.get(filename) or {}).get("chunk_ids", []))
+
+    def set(self, filename: str, sha256: str, chunk_ids: List[str]):
+        self.files[filename] = {"sha256": sha256, "chunking": chunking_signature(), "chunk_ids": chunk_ids}
+
+    def remove(self, filename: str) -> Optional[Dict[str, Any]]:
+        return self.files.pop(filename, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
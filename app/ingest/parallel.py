@@ -0,0 +1,113 @@
+# app/ingest/parallel.py
+import os, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from app.core.config import settings
+from app.core.logger import logger
+
+class LoadError(RuntimeError):
+    """Satu atau lebih file gagal di-parse/OCR; `errors` = {filename: pesan error}."""
+
+    def __init__(self, errors: Dict[str, str]):
+        self.errors = dict(errors)
+        super().__init__("; ".join(f"{name}: {err}" for name, err in self.errors.items()))
+
+def record_error(errors: Optional[Dict[str, str]], path: str, error: str):
+    """Log kegagalan file lalu catat ke `errors` (jika diberikan); tanpa `errors` → LoadError."""
+    name = os.path.basename(path)
+    logger.warning(f"[loader] gagal {name}: {error}")
+    if errors is None:
+        raise LoadError({name: error})
+    errors[name] = error
+
+class FileResult:
+    """Hasil load satu file: posisi di input, nilai (atau error), dan waktu proses."""
+    __slots__ = ("index", "path", "value", "elapsed_ms", "error")
+
+    def __init__(self, index: int, path: str, value: Any, elapsed_ms: float, error: Optional[str]):
+        self.index = index
+        self.path = path
+        self.value = value
+        self.elapsed_ms = elapsed_ms
+        self.error = error
+
+def _run_timed(fn: Callable[[str], Any], index: int, path: str) -> FileResult:
+    # top-level supaya bisa di-pickle ke worker process
+    t0 = time.perf_counter()
+    try:
+        value, error = fn(path), None
+    except Exception as e:
+        value, error = None, f"{type(e).__name__}: {e}"
+    return FileResult(index, path, value, (time.perf_counter() - t0) * 1000, error)
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    n = settings.LOADER_WORKERS if workers is None else workers
+    return max(1, n if n > 0 else (os.cpu_count() or 1))
+
+def iter_files(fn: Callable[[str], Any], paths: Sequence[str], workers: Optional[int] = None) -> Iterator[FileResult]:
+    """
+    Parse/OCR file secara paralel di process pool; hasil di-yield begitu selesai (urutan selesai).
+    `fn` harus fungsi top-level (picklable). Dengan 1 worker jalan inline tanpa pool.
+    """
+    n = min(resolve_workers(workers), len(paths))
+    if n <= 1:
+        for i, p in enumerate(paths):
+            yield _run_timed(fn, i, p)
+        return
+    with ProcessPoolExecutor(max_workers=n) as pool:
+        futs = [pool.submit(_run_timed, fn, i, p) for i, p in enumerate(paths)]
+        for fut in as_completed(futs):
+            yield fut.result()
+
+def _log_result(r: FileResult):
+    name = os.path.basename(r.path)
+    if r.error:
+        logger.warning(f"[loader] gagal {name} ({r.elapsed_ms:.0f} ms): {r.error}")
+    else:
+        logger.info(f"[loader] {name} selesai dalam {r.elapsed_ms:.0f} ms")
+
+def iter_files_ordered(fn: Callable[[str], Any], paths: Sequence[str], workers: Optional[int] = None,
+                       window: Optional[int] = None) -> Iterator[FileResult]:
+    """
+    Seperti iter_files, tapi di-yield sesuai urutan input (urutan chunk/row index deterministik antar run)
+    + log timing/failure per file. Paling banyak `window` file (default 2x worker) diproses di depan file
+    yang sedang ditunggu, jadi hasil yang menunggu giliran di memori tetap terbatas.
+    """
+    n = min(resolve_workers(workers), len(paths))
+    if n <= 1:
+        for i, p in enumerate(paths):
+            r = _run_timed(fn, i, p)
+            _log_result(r)
+            yield r
+        return
+    window = max(1, window or 2 * n)
+    todo = iter(enumerate(paths))
+    with ProcessPoolExecutor(max_workers=n) as pool:
+        pending: deque = deque()
+
+        def submit():
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append(pool.submit(_run_timed, fn, *nxt))
+
+        for _ in range(window):
+            submit()
+        while pending:
+            r = pending.popleft().result()
+            submit()  # slot yang baru selesai langsung diisi file berikutnya
+            _log_result(r)
+            yield r
+
+def map_files(fn: Callable[[str], Any], paths: Sequence[str], workers: Optional[int] = None) -> List[FileResult]:
+    """Seperti iter_files, tapi dikumpulkan dan diurutkan sesuai input (deterministik) + log timing/failure."""
+    t0 = time.perf_counter()
+    results: List[FileResult] = []
+    for r in iter_files(fn, paths, workers):
+        _log_result(r)
+        results.append(r)
+    results.sort(key=lambda r: r.index)
+    failed = sum(1 for r in results if r.error)
+    logger.info(f"[loader] {len(results)} file ({failed} gagal) dalam {(time.perf_counter() - t0) * 1000:.0f} ms "
+                f"dengan {min(resolve_workers(workers), max(1, len(paths)))} worker")
+    return results
@@ -0,0 +1,60 @@
+# app/ingest/pipeline.py
+# Helper pipeline generator halaman → chunk → batch embedding. Tiap tahap menarik dari tahap sebelumnya
+# hanya saat butuh (back-pressure), jadi memori puncak bergantung ukuran batch, bukan panjang dokumen.
+import queue, threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+_DONE = object()
+
+def batched(items: Iterable[T], max_items: int, max_tokens: Optional[int] = None,
+            size_fn: Optional[Callable[[T], int]] = None) -> Iterator[List[T]]:
+    """Kelompokkan `items` per `max_items` (dan per budget token jika `size_fn` diberikan)."""
+    batch: List[T] = []
+    used = 0
+    for item in items:
+        t = size_fn(item) if size_fn else 0
+        if batch and (len(batch) >= max_items or (max_tokens and used + t > max_tokens)):
+            yield batch
+            batch, used = [], 0
+        batch.append(item)
+        used += t
+    if batch:
+        yield batch
+
+def prefetch(items: Iterable[T], depth: int = 2) -> Iterator[T]:
+    """
+    Jalankan `items` di thread terpisah, maksimal `depth` elemen di depan konsumen (queue terbatas =
+    back-pressure). Dipakai supaya parsing halaman berikutnya jalan selagi batch sekarang di-embed.
+    """
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                while not stop.is_set():
+                    try:
+                        q.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            q.put(_DONE)
+        except BaseException as e:
+            q.put(e)
+
+    t = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # konsumen berhenti lebih awal (error / break): hentikan producer
+        stop.set()
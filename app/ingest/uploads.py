@@ -0,0 +1,84 @@
+# app/ingest/uploads.py
+# Upload streaming: byte ditulis ke DATA_DIR per potongan terbatas, sha256 dihitung sambil jalan,
+# jadi file besar tidak pernah utuh di memori (beda dengan IngestFile.base64).
+# Catatan: hanya PUT /ingest/upload/{filename} (body mentah) yang benar-benar di-stream langsung ke DATA_DIR.
+# Body multipart (POST /ingest/upload) lebih dulu di-spool Starlette ke SpooledTemporaryFile sebelum handler
+# jalan, jadi byte-nya ditulis dua kali; UploadSizeLimit menolaknya di depan lewat Content-Length.
+import os, uuid, hashlib
+from typing import AsyncIterator, Dict, Any
+from app.core.config import settings
+from app.core.concurrency import run_blocking
+from app.ingest.loader import SUPPORTED_EXTS
+
+class UploadError(ValueError):
+    """Upload ditolak (nama/ekstensi tidak valid, melebihi batas ukuran)."""
+
+def safe_filename(filename: str) -> str:
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if not name or name.startswith("."):
+        raise UploadError(f"Invalid filename: {filename!r}")
+    if not name.lower().endswith(SUPPORTED_EXTS):
+        raise UploadError(f"{name}: unsupported type, expected one of {', '.join(SUPPORTED_EXTS)}")
+    return name
+
+async def save_stream(filename: str, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """
+    Tulis `chunks` ke DATA_DIR/<filename> lewat file sementara (rename atomik di akhir, jadi ingest
+    yang sedang jalan tidak pernah membaca file setengah jadi). Return {filename, bytes, sha256}.
+    """
+    name = safe_filename(filename)
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+    path = os.path.join(settings.DATA_DIR, name)
+    tmp = os.path.join(settings.DATA_DIR, f".{name}.{uuid.uuid4().hex[:8]}.part")
+    limit = settings.UPLOAD_MAX_MB * 1024 * 1024
+    h = hashlib.sha256()
+    size = 0
+    f = open(tmp, "wb")
+    try:
+        async for buf in chunks:
+            if not buf:
+                continue
+            size += len(buf)
+            if limit and size > limit:
+                raise UploadError(f"{name}: exceeds UPLOAD_MAX_MB={settings.UPLOAD_MAX_MB}")
+            h.update(buf)
+            await run_blocking(f.write, buf)
+        f.close()
+        os.replace(tmp, path)
+    except BaseException:
+        f.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return {"filename": name, "bytes": size, "sha256": h.hexdigest()}
+
+class UploadSizeLimit:
+    """
+    ASGI middleware: tolak request ke `prefix` yang Content-Length-nya melebihi UPLOAD_MAX_MB (413) sebelum
+    body dibaca/di-spool. Untuk multipart batas berlaku ke seluruh body; body tanpa Content-Length (chunked)
+    tetap dibatasi per file di save_stream.
+    """
+
+    def __init__(self, app, prefix: str = "/ingest/upload"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        limit = settings.UPLOAD_MAX_MB * 1024 * 1024
+        if limit and scope["type"] == "http" and scope["path"].startswith(self.prefix):
+            length = dict(scope["headers"]).get(b"content-length")
+            if length is not None and length.isdigit() and int(length) > limit:
+                from starlette.responses import JSONResponse
+                detail = f"Request body {int(length)} bytes exceeds UPLOAD_MAX_MB={settings.UPLOAD_MAX_MB}"
+                await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+async def iter_upload(upload, chunk_bytes: int = 0) -> AsyncIterator[bytes]:
+    """UploadFile (multipart) → potongan byte berukuran UPLOAD_CHUNK_BYTES."""
+    size = chunk_bytes or settings.UPLOAD_CHUNK_BYTES
+    while True:
+        buf = await upload.read(size)
+        if not buf:
+            break
+        yield buf
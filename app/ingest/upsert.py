@@ -0,0 +1,133 @@
+# app/ingest/upsert.py
+import time, random, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.core.logger import logger
+
+def estimate_tokens(text: str) -> int:
+    # kira-kira 4 karakter per token (cukup untuk sizing batch)
+    return len(text) // 4 + 1
+
+_RATE_LIMIT_TYPES = ("RateLimitError", "TooManyRequests", "ResourceExhausted")  # openai / google-api-core
+
+def is_rate_limit(e: Exception) -> bool:
+    # hanya status code / tipe exception; isi pesan (id, URL, jumlah) tidak dipakai
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status is None and isinstance(getattr(e, "code", None), int):
+        status = e.code
+    return status == 429 or any(t in type(e).__name__ for t in _RATE_LIMIT_TYPES)
+
+def _retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class UpsertScheduler:
+    """
+    Embedding paralel (maks `concurrency` batch in-flight) + write ke vector store tetap berurutan.
+    Batch dibentuk dari budget token; budget diperkecil saat kena 429 lalu pulih pelan-pelan.
+
+    write_fn(ids, texts, metadatas, vectors) dipanggil di thread pemanggil, sesuai urutan input.
+    """
+
+    def __init__(self, embeddings, write_fn: Callable[[List[str], List[str], List[Dict[str, Any]], List[List[float]]], None],
+                 concurrency: Optional[int] = None, max_tokens: Optional[int] = None, max_items: Optional[int] = None,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.embeddings = embeddings
+        self.write_fn = write_fn
+        self.concurrency = max(1, concurrency or settings.EMBED_CONCURRENCY)
+        self.max_tokens = max_tokens or settings.EMBED_BATCH_TOKENS
+        self.max_items = max_items or settings.EMBED_BATCH_SIZE
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._budget = self.max_tokens
+        self._lock = threading.Lock()
+        self.retries = 0
+
+    def _on_rate_limit(self):
+        with self._lock:
+            self.retries += 1
+            self._budget = max(self.max_tokens // 16, self._budget // 2)
+
+    def _on_success(self):
+        with self._lock:
+            self._budget = min(self.max_tokens, int(self._budget * 1.25) + 1)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+                self._on_success()
+                return vectors
+            except Exception as e:
+                if not is_rate_limit(e) or attempt >= self.max_retries:
+                    raise
+                self._on_rate_limit()
+                delay = _retry_after(e) or min(self.max_delay, self.base_delay * (2 ** attempt))
+                delay *= 0.5 + random.random() / 2  # jitter
+                logger.warning(f"[upsert] 429 dari embeddings API, retry {attempt + 1}/{self.max_retries} dalam {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _next_batch(self, items: Iterator[Tuple[str, str, Dict[str, Any]]], carry: list) -> list:
+        """Ambil batch berikutnya dari iterator berdasarkan budget token saat ini (`carry` = item sisa)."""
+        with self._lock:
+            budget = self._budget
+        batch, used = [], 0
+        while len(batch) < self.max_items:
+            item = carry.pop() if carry else next(items, None)
+            if item is None:
+                break
+            t = estimate_tokens(item[1])
+            if batch and used + t > budget:
+                carry.append(item)
+                break
+            batch.append(item)
+            used += t
+        return batch
+
+    def run(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self.run_stream(zip(ids, texts, metadatas), total=len(texts))
+
+    def run_stream(self, items: Iterable[Tuple[str, str, Dict[str, Any]]], total: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Seperti `run`, tapi menarik (id, text, metadata) dari iterator hanya saat window in-flight punya ruang,
+        jadi generator hulu (halaman → chunk) ikut tertahan: paling banyak `concurrency` + 1 batch di memori.
+        """
+        t0 = time.perf_counter()
+        it, carry = iter(items), []
+        done, batches, exhausted = 0, 0, False
+        pending: deque = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as pool:
+            while True:
+                # isi window in-flight sampai `concurrency` batch
+                while not exhausted and len(pending) < self.concurrency:
+                    batch = self._next_batch(it, carry)
+                    if not batch:
+                        exhausted = True
+                        break
+                    pending.append((batch, pool.submit(self._embed, [b[1] for b in batch])))
+                if not pending:
+                    break
+                batch, fut = pending.popleft()
+                vectors = fut.result()
+                self.write_fn([b[0] for b in batch], [b[1] for b in batch], [b[2] for b in batch], vectors)
+                done += len(batch)
+                batches += 1
+                elapsed = time.perf_counter() - t0
+                logger.info(f"[upsert] {done}/{total if total is not None else '?'} chunks, "
+                            f"{done / max(elapsed, 1e-9):.1f} chunks/s, {len(pending)} batch in-flight")
+        elapsed = time.perf_counter() - t0
+        return {
+            "chunks": done,
+            "batches": batches,
+            "retries": self.retries,
+            "seconds": round(elapsed, 3),
+            "chunks_per_s": round(done / max(elapsed, 1e-9), 1),
+        }
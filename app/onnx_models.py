@@ -0,0 +1,376 @@
+"""
+Backend ONNX Runtime untuk model lokal: embedder SentenceTransformer (all-MiniLM-L6-v2) dan reranker CrossEncoder.
+Graph diekspor sekali dari model PyTorch lalu dikuantisasi int8 dinamis (bobot MatMul int8, aktivasi tetap float);
+inferensi memakai onnxruntime + tokenizer `tokenizers` (Rust), jadi torch tidak perlu dimuat saat serving.
+Dipilih lewat env EMBED_BACKEND / RERANK_BACKEND = torch | onnx (lihat app/core/config.py).
+
+Ekspor (butuh torch, sentence-transformers, onnx) lalu cek parity + throughput terhadap PyTorch:
+    python -m app.onnx_models export [--kind embedder|reranker|both] [--no-quantize]
+    python -m app.onnx_models compare [--texts file.txt] [--sample 256] [--json out.json]
+"""
+import os, json, time, argparse, threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+EMBEDDER = "all-MiniLM-L6-v2"
+RERANKER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+CONFIG_FILE = "onnx_config.json"
+
+# batas parity ONNX (int8) vs PyTorch; dipakai `compare` dan tests/test_onnx_models.py
+TOLERANCE = {"min_cosine": 0.95, "mean_cosine": 0.99, "mean_spearman": 0.9, "top1_agreement": 0.8}
+
+def model_dir_for(model_name: str, root: Optional[str] = None) -> Path:
+    return Path(root or settings.ONNX_MODEL_DIR) / model_name.replace("/", "__")
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> List[np.ndarray]:
+    """Index input diurutkan menurut panjang token lalu dipotong per batch: padding tiap batch minimal."""
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), max(1, batch_size))]
+
+class FastTokenizer:
+    """
+    Subset API tokenizer HF di atas `tokenizers.Tokenizer` (tanpa truncation): encode/decode untuk
+    Reranker._truncate dan offset_mapping untuk chunker CHUNK_UNIT=tokens.
+    """
+    is_fast = True
+
+    def __init__(self, tok):
+        self._tok = tok
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        return self._tok.encode(text, add_special_tokens=add_special_tokens).ids
+
+    def decode(self, ids: Sequence[int], skip_special_tokens: bool = True) -> str:
+        return self._tok.decode(list(ids), skip_special_tokens=skip_special_tokens)
+
+    def __call__(self, text: str, add_special_tokens: bool = True, return_offsets_mapping: bool = False, **kwargs) -> Dict[str, Any]:
+        enc = self._tok.encode(text, add_special_tokens=add_special_tokens)
+        out: Dict[str, Any] = {"input_ids": enc.ids, "attention_mask": enc.attention_mask}
+        if return_offsets_mapping:
+            out["offset_mapping"] = enc.offsets
+        return out
+
+class OnnxSession:
+    """
+    InferenceSession dengan jumlah thread dari ONNX_THREADS (intra-op; inter-op 1). Byte model dibaca sekali
+    (ikut dibagi saat preload/fork), session dibuat per proses karena thread pool onnxruntime tidak aman di-fork.
+    """
+
+    def __init__(self, path: Path, threads: Optional[int] = None):
+        self.path = Path(path)
+        self.threads = settings.ONNX_THREADS if threads is None else threads
+        self.model_bytes = self.path.read_bytes()
+        self._sess = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _session(self):
+        if self._sess is None or self._pid != os.getpid():
+            with self._lock:
+                if self._sess is None or self._pid != os.getpid():
+                    import onnxruntime as ort
+                    so = ort.SessionOptions()
+                    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+                    so.inter_op_num_threads = 1
+                    if self.threads > 0:
+                        so.intra_op_num_threads = self.threads
+                    self._sess = ort.InferenceSession(self.model_bytes, so, providers=["CPUExecutionProvider"])
+                    self._pid = os.getpid()
+        return self._sess
+
+    @property
+    def input_names(self) -> List[str]:
+        return [i.name for i in self._session().get_inputs()]
+
+    def run(self, feeds: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        sess = self._session()
+        names = {i.name for i in sess.get_inputs()}
+        return sess.run(None, {k: v for k, v in feeds.items() if k in names})
+
+class _OnnxModel:
+    def __init__(self, session, tokenizer_file: Path, config: Dict[str, Any], batch_size: Optional[int] = None):
+        from tokenizers import Tokenizer
+        self.session = session
+        self.config = config
+        self.batch_size = batch_size or settings.ONNX_BATCH_SIZE
+        self.pad_id = int(config.get("pad_id", 0))
+        self.quantized = False
+        self._tok = Tokenizer.from_file(str(tokenizer_file))
+        self._tok.no_padding()
+        self._tok.enable_truncation(int(config.get("max_length", 512)))
+        raw = Tokenizer.from_file(str(tokenizer_file))
+        raw.no_padding()
+        raw.no_truncation()
+        self.tokenizer = FastTokenizer(raw)
+
+    @classmethod
+    def load(cls, model_name: str, root: Optional[str] = None, quantized: Optional[bool] = None,
+             threads: Optional[int] = None, batch_size: Optional[int] = None):
+        path = model_dir_for(model_name, root)
+        if not (path / CONFIG_FILE).exists():
+            kind = "reranker" if cls is OnnxCrossEncoder else "embedder"
+            raise RuntimeError(f"ONNX model for {model_name} not found in {path}. "
+                               f"Run: python -m app.onnx_models export --kind {kind}")
+        config = json.loads((path / CONFIG_FILE).read_text(encoding="utf-8"))
+        quantized = settings.ONNX_QUANTIZED if quantized is None else quantized
+        files = config["files"]
+        model = cls(OnnxSession(path / (files["int8"] if quantized and "int8" in files else files["fp32"]), threads),
+                    path / "tokenizer.json", config, batch_size)
+        model.quantized = bool(quantized and "int8" in files)
+        return model
+
+    def _batches(self, encodings, batch_size: Optional[int]):
+        """(index asli, feeds) per bucket panjang; tiap batch di-pad ke panjang terpanjang di batch itu saja."""
+        for idx in length_buckets([len(e.ids) for e in encodings], batch_size or self.batch_size):
+            batch = [encodings[i] for i in idx]
+            width = max(len(e.ids) for e in batch)
+            ids = np.full((len(batch), width), self.pad_id, dtype=np.int64)
+            mask = np.zeros((len(batch), width), dtype=np.int64)
+            types = np.zeros((len(batch), width), dtype=np.int64)
+            for r, e in enumerate(batch):
+                n = len(e.ids)
+                ids[r, :n] = e.ids
+                mask[r, :n] = e.attention_mask
+                types[r, :n] = e.type_ids
+            yield idx, {"input_ids": ids, "attention_mask": mask, "token_type_ids": types}
+
+class OnnxEmbedder(_OnnxModel):
+    """Pengganti SentenceTransformer.encode: pooling (mean/cls/max) + normalisasi sesuai pipeline model aslinya."""
+
+    def encode(self, sentences, batch_size: Optional[int] = None, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out: Optional[np.ndarray] = None
+        for idx, feeds in self._batches(self._tok.encode_batch(texts), batch_size):
+            emb = self._pool(self.session.run(feeds)[0], feeds["attention_mask"])
+            if out is None:
+                out = np.zeros((len(texts), emb.shape[1]), dtype=np.float32)
+            out[idx] = emb
+        if out is None:
+            out = np.zeros((0, int(self.config.get("dim", 0))), dtype=np.float32)
+        if normalize_embeddings or self.config.get("normalize"):
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        mode = self.config.get("pooling", "mean")
+        if mode == "cls":
+            return hidden[:, 0]
+        m = mask[:, :, None].astype(np.float32)
+        if mode == "max":
+            return np.where(m > 0, hidden, -1e9).max(axis=1)
+        return (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self.config.get("dim")
+
+class OnnxCrossEncoder(_OnnxModel):
+    """Pengganti CrossEncoder.predict: logit → sigmoid untuk model 1 label (default CrossEncoder)."""
+
+    def predict(self, pairs, batch_size: Optional[int] = None, **kwargs) -> np.ndarray:
+        single = len(pairs) == 2 and isinstance(pairs[0], str)
+        items = [tuple(pairs)] if single else [tuple(p) for p in pairs]
+        out = np.zeros(len(items), dtype=np.float32) if self.config.get("num_labels", 1) == 1 else None
+        for idx, feeds in self._batches(self._tok.encode_batch(items), batch_size):
+            logits = self.session.run(feeds)[0]
+            if out is None:
+                out = np.zeros((len(items), logits.shape[1]), dtype=np.float32)
+            out[idx] = logits[:, 0] if out.ndim == 1 else logits
+        if out is None:
+            out = np.zeros(0, dtype=np.float32)
+        if self.config.get("activation") == "sigmoid":
+            out = 1 / (1 + np.exp(-out))
+        return out[0] if single else out
+
+# ---------- ekspor ----------
+
+def export(model_name: str, kind: str, root: Optional[str] = None, quantize: bool = True, opset: int = 14) -> Path:
+    """Ekspor model PyTorch ke ONNX (+ int8 dinamis) beserta tokenizer.json dan onnx_config.json."""
+    import torch
+    target = model_dir_for(model_name, root)
+    target.mkdir(parents=True, exist_ok=True)
+    if kind == "embedder":
+        from sentence_transformers import SentenceTransformer
+        st = SentenceTransformer(model_name, device="cpu")
+        hf, tok = st[0].auto_model, st.tokenizer
+        pooling = st[1].get_pooling_mode_str() if len(st) > 1 else "mean"
+        if pooling not in ("mean", "cls", "max"):
+            raise ValueError(f"Unsupported pooling for ONNX export: {pooling}")
+        config: Dict[str, Any] = {"pooling": pooling, "max_length": st.max_seq_length,
+                                  "normalize": any(type(m).__name__ == "Normalize" for m in st),
+                                  "dim": st.get_sentence_embedding_dimension()}
+        output, pair = "last_hidden_state", None
+    elif kind == "reranker":
+        from sentence_transformers import CrossEncoder
+        ce = CrossEncoder(model_name, device="cpu")
+        hf, tok = ce.model, ce.tokenizer
+        labels = hf.config.num_labels
+        config = {"num_labels": labels, "activation": "sigmoid" if labels == 1 else "identity",
+                  "max_length": min(ce.max_length or tok.model_max_length, 512)}
+        output, pair = "logits", ["warm up passage"]
+    else:
+        raise ValueError(f"Unknown kind: {kind}. Use embedder or reranker.")
+    if not tok.is_fast:
+        raise ValueError(f"{model_name} has no fast tokenizer (tokenizer.json)")
+
+    hf.eval()
+    dummy = tok(["warm up"], pair, return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+
+    class _Graph(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.hf = hf
+
+        def forward(self, *inputs):
+            return self.hf(**dict(zip(names, inputs)), return_dict=False)[0]
+
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes[output] = {0: "batch", 1: "seq"} if kind == "embedder" else {0: "batch"}
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(_Graph(), tuple(dummy[n] for n in names), str(target / "model.onnx"), input_names=names,
+                          output_names=[output], dynamic_axes=axes, opset_version=opset, do_constant_folding=True)
+    files = {"fp32": "model.onnx"}
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(target / "model.onnx"), str(target / "model.int8.onnx"), weight_type=QuantType.QInt8)
+        files["int8"] = "model.int8.onnx"
+    tok.save_pretrained(str(target))
+    config.update({"kind": kind, "model": model_name, "pad_id": tok.pad_token_id or 0, "inputs": names,
+                   "files": files, "opset": opset, "export_seconds": round(time.perf_counter() - t0, 3)})
+    (target / CONFIG_FILE).write_text(json.dumps(config, indent=2), encoding="utf-8")
+    return target
+
+# ---------- parity & throughput ----------
+
+def embedding_parity(ref: np.ndarray, cand: np.ndarray) -> Dict[str, float]:
+    """Cosine per teks antara embedding referensi (PyTorch) dan kandidat (ONNX)."""
+    ref, cand = np.asarray(ref, dtype=np.float64), np.asarray(cand, dtype=np.float64)
+    cos = (ref * cand).sum(axis=1) / np.maximum(np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1), 1e-12)
+    return {"min_cosine": round(float(cos.min()), 5), "mean_cosine": round(float(cos.mean()), 5)}
+
+def _ranks(x: np.ndarray) -> np.ndarray:
+    return np.argsort(np.argsort(x)).astype(np.float64)
+
+def ranking_parity(ref: Sequence[Sequence[float]], cand: Sequence[Sequence[float]]) -> Dict[str, float]:
+    """Kesamaan urutan rerank per query: korelasi Spearman, top-1 yang sama, selisih skor maksimum."""
+    rho, top1, diff = [], [], 0.0
+    for r, c in zip(ref, cand):
+        r, c = np.asarray(r, dtype=np.float64), np.asarray(c, dtype=np.float64)
+        diff = max(diff, float(np.abs(r - c).max()))
+        top1.append(float(np.argmax(r) == np.argmax(c)))
+        rr, rc = _ranks(r), _ranks(c)
+        rho.append(1.0 if len(r) < 2 else float(np.corrcoef(rr, rc)[0, 1]))
+    return {"mean_spearman": round(float(np.mean(rho)), 4), "top1_agreement": round(float(np.mean(top1)), 4),
+            "max_abs_diff": round(diff, 5)}
+
+def within_tolerance(report: Dict[str, float]) -> bool:
+    return all(report[k] >= v for k, v in TOLERANCE.items() if k in report)
+
+def throughput(fn: Callable[[Sequence], Any], items: Sequence, repeat: int = 3) -> float:
+    """Item per detik (median dari `repeat` putaran, setelah satu putaran warm-up)."""
+    fn(items[:8])
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(items)
+        runs.append(time.perf_counter() - t0)
+    return round(len(items) / max(float(np.median(runs)), 1e-9), 1)
+
+def rerank_jobs(texts: Sequence[str], queries: int = 32, per_query: int = 16, seed: int = 0) -> List[Tuple[str, List[str]]]:
+    """Query = 12 kata awal sebuah chunk, dipasangkan dengan chunk itu + chunk acak lain."""
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for i in rng.choice(len(texts), size=min(queries, len(texts)), replace=False):
+        others = [texts[j] for j in rng.choice(len(texts), size=min(per_query, len(texts)), replace=False) if j != i]
+        jobs.append((" ".join(texts[i].split()[:12]), [texts[i]] + others[:per_query - 1]))
+    return jobs
+
+def compare(texts: Sequence[str], kinds: Sequence[str], root: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Parity + throughput ONNX vs PyTorch untuk embedder dan/atau reranker di atas `texts`."""
+    report: Dict[str, Dict[str, Any]] = {}
+    if "embedder" in kinds:
+        from sentence_transformers import SentenceTransformer
+        ref_model, onnx_model = SentenceTransformer(EMBEDDER, device="cpu"), OnnxEmbedder.load(EMBEDDER, root)
+        ref = ref_model.encode(list(texts), normalize_embeddings=True)
+        cand = onnx_model.encode(list(texts), normalize_embeddings=True)
+        row = embedding_parity(ref, cand)
+        row["torch_per_s"] = throughput(lambda xs: ref_model.encode(list(xs), batch_size=32), texts)
+        row["onnx_per_s"] = throughput(lambda xs: onnx_model.encode(list(xs)), texts)
+        report["embedder"] = row
+    if "reranker" in kinds:
+        from sentence_transformers import CrossEncoder
+        ref_model, onnx_model = CrossEncoder(RERANKER, device="cpu"), OnnxCrossEncoder.load(RERANKER, root)
+        jobs = rerank_jobs(texts)
+        pairs = [(q, p) for q, ps in jobs for p in ps]
+        ref, cand, pos = [], [], 0
+        ref_all, cand_all = ref_model.predict(pairs, batch_size=32), onnx_model.predict(pairs)
+        for _, ps in jobs:
+            ref.append(ref_all[pos:pos + len(ps)])
+            cand.append(cand_all[pos:pos + len(ps)])
+            pos += len(ps)
+        row = ranking_parity(ref, cand)
+        row["torch_per_s"] = throughput(lambda xs: ref_model.predict(list(xs), batch_size=32), pairs)
+        row["onnx_per_s"] = throughput(lambda xs: onnx_model.predict(list(xs)), pairs)
+        report["reranker"] = row
+    for row in report.values():
+        row["speedup"] = round(row["onnx_per_s"] / max(row["torch_per_s"], 1e-9), 2)
+        row["ok"] = within_tolerance(row)
+    return report
+
+def _texts(args) -> List[str]:
+    if args.texts:
+        texts = [t.strip() for t in Path(args.texts).read_text(encoding="utf-8").splitlines() if t.strip()]
+    else:
+        from .chunk_store import ChunkStore
+        chunks_dir = Path(__file__).resolve().parents[1] / "storage" / "chunks"
+        if not ChunkStore.exists(chunks_dir):
+            raise SystemExit("Chunk store missing. Run: python -m app.ingest, or pass --texts")
+        texts = list(ChunkStore(chunks_dir).iter_texts())
+    rng = np.random.default_rng(0)
+    pick = rng.choice(len(texts), size=min(args.sample, len(texts)), replace=False)
+    return [texts[i] for i in sorted(pick)]
+
+def main():
+    ap = argparse.ArgumentParser(description="ONNX Runtime backend tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ep = sub.add_parser("export", help="ekspor embedder/reranker PyTorch ke ONNX (+ int8 dinamis)")
+    ep.add_argument("--kind", choices=("embedder", "reranker", "both"), default="both")
+    ep.add_argument("--out", help=f"direktori model (default ONNX_MODEL_DIR={settings.ONNX_MODEL_DIR})")
+    ep.add_argument("--no-quantize", action="store_true")
+    ep.add_argument("--opset", type=int, default=14)
+    cp = sub.add_parser("compare", help="parity + throughput ONNX vs PyTorch")
+    cp.add_argument("--kind", choices=("embedder", "reranker", "both"), default="both")
+    cp.add_argument("--out", help="direktori model ONNX (default ONNX_MODEL_DIR)")
+    cp.add_argument("--texts", help="file teks, satu passage per baris (default: sampel chunk store)")
+    cp.add_argument("--sample", type=int, default=256)
+    cp.add_argument("--json", help="simpan hasil sebagai JSON")
+    args = ap.parse_args()
+    kinds = ("embedder", "reranker") if args.kind == "both" else (args.kind,)
+
+    if args.cmd == "export":
+        for kind in kinds:
+            path = export(EMBEDDER if kind == "embedder" else RERANKER, kind, args.out, not args.no_quantize, args.opset)
+            sizes = ", ".join(f"{p.name}={p.stat().st_size / 1e6:.1f}MB" for p in sorted(path.glob("*.onnx")))
+            print(f"{kind}: {path} ({sizes})")
+        return
+
+    report = compare(_texts(args), kinds, args.out)
+    print(f"threads={settings.ONNX_THREADS or 'auto'} quantized={settings.ONNX_QUANTIZED}")
+    for kind, row in report.items():
+        parity = ", ".join(f"{k}={v}" for k, v in row.items() if k not in ("torch_per_s", "onnx_per_s", "speedup", "ok"))
+        print(f"{kind:<9} torch {row['torch_per_s']:>8.1f}/s  onnx {row['onnx_per_s']:>8.1f}/s  "
+              f"x{row['speedup']:<5} {parity}  {'OK' if row['ok'] else 'OUT OF TOLERANCE'}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if not all(row["ok"] for row in report.values()):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# app/rag/cache.py
+import time, threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+_MISSING = object()
+
+def normalize_question(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+class LRUCache:
+    """LRU thread-safe dengan TTL opsional (detik); ttl=None/0 berarti tidak kedaluwarsa."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and self.ttl and time.monotonic() - item[0] > self.ttl:
+                del self._data[key]
+                item = _MISSING
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+RETIRED_VERSIONS = 64  # versi lama yang diingat; jauh lebih banyak dari snapshot yang masih dipegang request
+
+class _Versions:
+    """
+    Versi index yang hanya maju. Versi yang belum pernah terlihat dianggap lebih baru (versi Chroma
+    "koleksi@n" dan versi FAISS berbasis waktu sama-sama tidak pernah dipakai ulang); versi yang sudah
+    diganti tidak bisa kembali jadi aktif, jadi request lama yang selesai setelah swap tidak membalik versi.
+    """
+
+    def __init__(self):
+        self.current: Optional[str] = None
+        self._retired: "OrderedDict[str, None]" = OrderedDict()
+
+    def check(self, version: str) -> str:
+        """"current", "new" (jadi versi aktif; cache harus dikosongkan) atau "retired" (lewati cache)."""
+        if version == self.current:
+            return "current"
+        if version in self._retired:
+            return "retired"
+        if self.current is not None:
+            self._retired[self.current] = None
+            while len(self._retired) > RETIRED_VERSIONS:
+                self._retired.popitem(last=False)
+        self.current = version
+        return "new"
+
+class VersionedCache(LRUCache):
+    """LRU yang dikosongkan saat index pindah ke versi baru (dicek tiap akses)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        super().__init__(maxsize, ttl)
+        self._versions = _Versions()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._versions.current
+
+    def check_version(self, version: str) -> bool:
+        """
+        False jika `version` sudah diganti versi yang lebih baru: request itu tidak boleh get/set
+        (hasilnya dari index lama), tapi juga tidak mengosongkan cache versi aktif.
+        """
+        # bandingkan + kosongkan + catat versi dalam satu critical section (request paralel saat reindex)
+        with self._lock:
+            state = self._versions.check(version)
+            if state == "new":
+                self._data.clear()
+            return state != "retired"
+
+class SemanticHit(NamedTuple):
+    value: Any
+    similarity: float
+    question: str  # pertanyaan asli yang jawabannya dipakai ulang
+
+class SemanticCache:
+    """
+    Cache jawaban untuk pertanyaan yang mirip, bukan hanya sama persis. Embedding pertanyaan lama disimpan di
+    matriks kecil (maxsize x dim, inner product vektor ternormalisasi; cukup untuk ribuan entry tanpa index ANN).
+    Entry hanya cocok dengan `scope` yang sama (top_k, model, filter, ...) dan versi index yang sama.
+    Versi baru → cache dikosongkan; versi yang sudah diganti melewati cache. Ukuran dibatasi `maxsize` (slot LRU dipakai ulang) dan `ttl` detik.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, threshold: float = 0.92):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.threshold = threshold
+        self._versions = _Versions()
+        self.hits = self.misses = self.evictions = self.expired = 0
+        self._sim_sum = 0.0
+        self._vecs: Optional[np.ndarray] = None
+        self._scope = np.full(max(0, maxsize), -1, dtype=np.int64)  # id scope per slot; -1 = kosong
+        self._born = np.zeros(max(0, maxsize))
+        self._used = np.zeros(max(0, maxsize))  # waktu akses terakhir (LRU)
+        self._values: List[Any] = [None] * max(0, maxsize)
+        self._questions: List[str] = [""] * max(0, maxsize)
+        self._scope_ids: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(emb) -> np.ndarray:
+        v = np.asarray(emb, dtype=np.float32).reshape(-1)
+        n = float(np.linalg.norm(v))
+        return v / n if n else v
+
+    def _clear(self):
+        self._scope[:] = -1
+        self._values = [None] * self.maxsize
+        self._questions = [""] * self.maxsize
+        self._scope_ids.clear()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._versions.current
+
+    def _check_version(self, version: Optional[str]) -> bool:
+        """False untuk versi index yang sudah diganti (lewati cache tanpa mengosongkannya)."""
+        if version is None:
+            return True
+        state = self._versions.check(version)
+        if state == "new":
+            self._clear()
+        return state != "retired"
+
+    def _live(self, now: float) -> np.ndarray:
+        mask = self._scope >= 0
+        if self.ttl:
+            mask &= now - self._born <= self.ttl
+        return mask
+
+    def _best(self, q: np.ndarray, sid: Optional[int], now: float) -> Tuple[int, float]:
+        """Slot paling mirip di scope `sid` (-1 jika tidak ada entry hidup)."""
+        if sid is None or self._vecs is None or len(q) != self._vecs.shape[1]:
+            return -1, 0.0
+        slots = np.flatnonzero(self._live(now) & (self._scope == sid))
+        if not len(slots):
+            return -1, 0.0
+        sims = self._vecs[slots] @ q
+        j = int(np.argmax(sims))
+        return int(slots[j]), float(sims[j])
+
+    def get(self, emb, scope: Hashable, version: Optional[str] = None) -> Optional[SemanticHit]:
+        if self.maxsize <= 0:
+            return None
+        q = self._unit(emb)
+        now = time.monotonic()
+        with self._lock:
+            if not self._check_version(version):
+                self.misses += 1
+                return None
+            slot, sim = self._best(q, self._scope_ids.get(scope), now)
+            if slot < 0 or sim < self.threshold:
+                self.misses += 1
+                return None
+            self._used[slot] = now
+            self.hits += 1
+            self._sim_sum += sim
+            return SemanticHit(self._values[slot], sim, self._questions[slot])
+
+    def set(self, emb, scope: Hashable, value: Any, question: str = "", version: Optional[str] = None):
+        if self.maxsize <= 0:
+            return
+        q = self._unit(emb)
+        now = time.monotonic()
+        with self._lock:
+            if not self._check_version(version):
+                return  # jawaban dari versi index lama (swap terjadi selama request)
+            if self._vecs is None or self._vecs.shape[1] != len(q):
+                self._vecs = np.zeros((self.maxsize, len(q)), dtype=np.float32)
+                self._clear()
+            if len(self._scope_ids) > 4 * self.maxsize:
+                # id scope yang tidak lagi dipakai slot mana pun dibuang
+                live = {int(i) for i in self._scope[self._scope >= 0]}
+                self._scope_ids = {k: i for k, i in self._scope_ids.items() if i in live}
+            sid = self._scope_ids.setdefault(scope, max(self._scope_ids.values(), default=-1) + 1)
+            # pertanyaan (hampir) sama di scope yang sama menimpa entry-nya, bukan menambah duplikat
+            slot, sim = self._best(q, sid, now)
+            if slot < 0 or sim < self.threshold:
+                live = self._live(now)
+                free = np.flatnonzero(~live)
+                if len(free):
+                    slot = int(free[0])
+                    if self._scope[slot] >= 0:
+                        self.expired += 1
+                else:
+                    slot = int(np.argmin(self._used))
+                    self.evictions += 1
+            self._vecs[slot] = q
+            self._scope[slot] = sid
+            self._born[slot] = self._used[slot] = now
+            self._values[slot] = value
+            self._questions[slot] = question
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._live(time.monotonic()).sum())
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"size": len(self), "maxsize": self.maxsize, "threshold": self.threshold, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "mean_hit_similarity": round(self._sim_sum / self.hits, 4) if self.hits else None,
+                "evictions": self.evictions, "expired": self.expired, "version": self.version}
@@ -0,0 +1,84 @@
+# app/rag/filters.py
+"""
+Filter metadata untuk pertanyaan yang di-scope (source, tipe file, rentang halaman).
+
+Filter dipush ke bawah, bukan dipakai setelah retrieval:
+- Chroma: klausa `where` untuk vector search (MMR) + himpunan chunk_id untuk kandidat BM25
+- FAISS: id yang lolos dihitung dari index id per source di chunk store, lalu jadi ID-selector bitmap
+Nomor halaman mengikuti metadata `page` masing-masing stack (sama dengan yang tampil di context_sources).
+"""
+import os
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+def file_type(source: str) -> str:
+    return os.path.splitext(source or "")[1].lower().lstrip(".")
+
+class SearchFilter(NamedTuple):
+    """Scope pertanyaan; hashable supaya bisa jadi bagian key cache retrieval/jawaban."""
+    sources: Tuple[str, ...] = ()       # nama file persis
+    file_types: Tuple[str, ...] = ()    # ekstensi tanpa titik, huruf kecil
+    page_from: Optional[int] = None     # chunk yang menyentuh rentang [page_from, page_to] (inklusif)
+    page_to: Optional[int] = None
+
+    @classmethod
+    def resolve(cls, sources: Optional[Iterable[str]] = None, file_types: Optional[Iterable[str]] = None,
+                page_from: Optional[int] = None, page_to: Optional[int] = None) -> Optional["SearchFilter"]:
+        """Normalisasi field request; None jika tidak ada yang diisi (= tanpa filter)."""
+        flt = cls(
+            sources=tuple(sorted(set(sources or ()))),
+            file_types=tuple(sorted({t.lower().lstrip(".") for t in file_types or ()})),
+            page_from=page_from,
+            page_to=page_to,
+        )
+        if page_from is not None and page_to is not None and page_from > page_to:
+            raise ValueError(f"page_from ({page_from}) > page_to ({page_to})")
+        return None if flt == cls() else flt
+
+    @property
+    def scopes_sources(self) -> bool:
+        return bool(self.sources or self.file_types)
+
+    @property
+    def scopes_pages(self) -> bool:
+        return self.page_from is not None or self.page_to is not None
+
+    def allows_source(self, source: str) -> bool:
+        if self.sources and source not in self.sources:
+            return False
+        return not self.file_types or file_type(source) in self.file_types
+
+def chroma_where(flt: SearchFilter, known_sources: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Klausa `where` Chroma untuk filter. `known_sources` (mis. dari manifest ingest) dibutuhkan untuk
+    `file_types`, karena `where` tidak bisa mencocokkan akhiran string. None = tidak ada source yang cocok.
+    """
+    clauses: List[Dict[str, Any]] = []
+    if flt.scopes_sources:
+        allowed = [s for s in known_sources or () if flt.allows_source(s)] if flt.file_types else list(flt.sources)
+        if not allowed:
+            return None
+        clauses.append({"source": {"$in": allowed}})
+    if flt.page_to is not None:
+        clauses.append({"page": {"$lte": flt.page_to}})
+    if flt.page_from is not None:
+        # chunk yang melewati batas halaman menyimpan `page_end`
+        clauses.append({"$or": [{"page": {"$gte": flt.page_from}}, {"page_end": {"$gte": flt.page_from}}]})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def store_ids(store, flt: SearchFilter) -> np.ndarray:
+    """Id FAISS (int64, terurut) yang lolos filter, dari index id per source + kolom halaman chunk store."""
+    ids: Optional[np.ndarray] = None
+    if flt.scopes_sources:
+        parts = [v for s, v in store.ids_by("source").items() if flt.allows_source(s)]
+        ids = np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+    if flt.scopes_pages:
+        page = store.numeric_column("page")
+        end = np.fmax(page, store.numeric_column("page_end"))  # fmax: page_end kosong → page
+        mask = ~np.isnan(page)
+        if flt.page_to is not None:
+            mask &= page <= flt.page_to
+        if flt.page_from is not None:
+            mask &= end >= flt.page_from
+        ids = np.flatnonzero(mask).astype(np.int64) if ids is None else ids[mask[ids]]
+    return ids if ids is not None else np.arange(len(store), dtype=np.int64)
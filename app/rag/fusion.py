@@ -0,0 +1,64 @@
+# app/rag/fusion.py
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+
+class FusionParams(NamedTuple):
+    """Parameter fusion hybrid; field None diisi dari settings (lihat `resolve`)."""
+    method: str = "weighted"        # "weighted" (skor ternormalisasi) | "rrf" (reciprocal rank fusion)
+    vector_weight: float = 0.5
+    bm25_weight: float = 0.5
+    rrf_k: int = 60
+    rerank_candidates: int = 8      # cutoff kandidat sebelum CrossEncoder
+
+    @classmethod
+    def resolve(cls, method: Optional[str] = None, vector_weight: Optional[float] = None, bm25_weight: Optional[float] = None,
+                rerank_candidates: Optional[int] = None) -> "FusionParams":
+        method = (method or settings.FUSION_METHOD).lower()
+        if method not in ("weighted", "rrf"):
+            raise ValueError(f"Unsupported fusion method: {method}. Use weighted or rrf.")
+        return cls(
+            method=method,
+            vector_weight=settings.FUSION_VECTOR_WEIGHT if vector_weight is None else float(vector_weight),
+            bm25_weight=settings.FUSION_BM25_WEIGHT if bm25_weight is None else float(bm25_weight),
+            rrf_k=settings.FUSION_RRF_K,
+            rerank_candidates=settings.RERANK_CANDIDATES if rerank_candidates is None else int(rerank_candidates),
+        )
+
+def _minmax(x: np.ndarray) -> np.ndarray:
+    """Normalisasi 0..1 atas entri yang ada (bukan NaN); entri yang hilang jadi 0."""
+    out = np.zeros_like(x)
+    mask = ~np.isnan(x)
+    if mask.any():
+        lo, hi = x[mask].min(), x[mask].max()
+        out[mask] = (x[mask] - lo) / (hi - lo) if hi > lo else 1.0
+    return out
+
+def fuse(vector: Sequence[Tuple[str, float]], lexical: Sequence[Tuple[str, float]], params: FusionParams) -> List[Tuple[str, float]]:
+    """
+    Gabungkan dua daftar (chunk_id, skor) yang masing-masing sudah terurut menurun.
+    Kandidat di-key dengan chunk_id; hasil terurut menurun menurut skor gabungan.
+    """
+    pos: Dict[str, int] = {}
+    for cid, _ in list(vector) + list(lexical):
+        pos.setdefault(cid, len(pos))
+    if not pos:
+        return []
+    ids = list(pos)
+    n = len(ids)
+    v_idx = np.fromiter((pos[c] for c, _ in vector), dtype=np.int64, count=len(vector))
+    l_idx = np.fromiter((pos[c] for c, _ in lexical), dtype=np.int64, count=len(lexical))
+
+    if params.method == "rrf":
+        fused = np.zeros(n)
+        np.add.at(fused, v_idx, params.vector_weight / (params.rrf_k + 1 + np.arange(len(v_idx))))
+        np.add.at(fused, l_idx, params.bm25_weight / (params.rrf_k + 1 + np.arange(len(l_idx))))
+    else:
+        v = np.full(n, np.nan)
+        l = np.full(n, np.nan)
+        v[v_idx] = np.fromiter((s for _, s in vector), dtype=np.float64, count=len(vector))
+        l[l_idx] = np.fromiter((s for _, s in lexical), dtype=np.float64, count=len(lexical))
+        fused = params.vector_weight * _minmax(v) + params.bm25_weight * _minmax(l)
+
+    order = np.argsort(-fused, kind="stable")
+    return [(ids[i], float(fused[i])) for i in order]
@@ -1,17 +1,72 @@
 from app.core.config import settings
-from typing import Optional
+from typing import Optional, Iterator, AsyncIterator, Dict, Any, Tuple
+import threading
+from app.core.clients import on_close
 
-def generate_answer(prompt: str, temperature: float = 0.2, max_tokens: int = 512) -> str:
-    provider = settings.PROVIDER
+# client LLM dibuat sekali per kombinasi parameter lalu dipakai ulang (koneksi HTTP di-pool)
+_LLMS: Dict[Tuple, Any] = {}
+_LOCK = threading.Lock()
+
+@on_close
+def _reset_llms():
+    # ChatOpenAI memegang http_client pool; setelah pool ditutup dibuat ulang di request berikutnya
+    with _LOCK:
+        _LLMS.clear()
+
+def _build_llm(provider: str, temperature: float, max_tokens: int, streaming: bool):
     if provider == "gemini":
         from langchain_google_genai import ChatGoogleGenerativeAI
-        llm = ChatGoogleGenerativeAI(model=settings.LLM_MODEL, temperature=temperature, convert_system_message_to_human=True)
-        out = llm.invoke(prompt)
-        return out.content if hasattr(out, "content") else str(out)
+        return ChatGoogleGenerativeAI(model=settings.LLM_MODEL, temperature=temperature, convert_system_message_to_human=True)
     elif provider == "openai":
         from langchain_openai import ChatOpenAI
-        llm = ChatOpenAI(model=settings.LLM_MODEL, temperature=temperature, max_tokens=max_tokens)
-        out = llm.invoke(prompt)
-        return out.content if hasattr(out, "content") else str(out)
+        from app.core.clients import sync_http, async_http
+        return ChatOpenAI(model=settings.LLM_MODEL, temperature=temperature, max_tokens=max_tokens, stream_usage=streaming,
+                          http_client=sync_http(), http_async_client=async_http())
+    elif provider == "fake":
+        from app.core.fakes import FakeStreamingLLM
+        return FakeStreamingLLM()
     else:
         raise ValueError(f"Unsupported provider: {provider}. Use gemini or openai.")
+
+def _llm(temperature: float, max_tokens: int, streaming: bool = False):
+    key = (settings.PROVIDER, settings.LLM_MODEL, temperature, max_tokens, streaming)
+    llm = _LLMS.get(key)
+    if llm is None:
+        with _LOCK:
+            llm = _LLMS.get(key)
+            if llm is None:
+                llm = _LLMS[key] = _build_llm(settings.PROVIDER, temperature, max_tokens, streaming)
+    return llm
+
+def _text(out) -> str:
+    return out.content if hasattr(out, "content") else str(out)
+
+def _usage(chunk, usage: Optional[Dict[str, Any]]):
+    if usage is not None and getattr(chunk, "usage_metadata", None):
+        um = chunk.usage_metadata
+        usage["prompt_tokens"] = um.get("input_tokens")
+        usage["completion_tokens"] = um.get("output_tokens")
+
+def generate_answer(prompt: str, temperature: float = 0.2, max_tokens: int = 512) -> str:
+    return _text(_llm(temperature, max_tokens).invoke(prompt))
+
+async def agenerate_answer(prompt: str, temperature: float = 0.2, max_tokens: int = 512) -> str:
+    return _text(await _llm(temperature, max_tokens).ainvoke(prompt))
+
+def stream_answer(prompt: str, temperature: float = 0.2, max_tokens: int = 512,
+                  usage: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Yield potongan teks jawaban begitu datang dari provider; `usage` diisi token count jika provider mengirimnya."""
+    for chunk in _llm(temperature, max_tokens, streaming=True).stream(prompt):
+        _usage(chunk, usage)
+        text = _text(chunk)
+        if text:
+            yield text
+
+async def astream_answer(prompt: str, temperature: float = 0.2, max_tokens: int = 512,
+                         usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Versi async dari stream_answer (tidak memblokir event loop)."""
+    async for chunk in _llm(temperature, max_tokens, streaming=True).astream(prompt):
+        _usage(chunk, usage)
+        text = _text(chunk)
+        if text:
+            yield text
@@ -0,0 +1,223 @@
+# app/rag/lexical_index.py
+import os, json, gzip, math, threading
+from typing import Collection, Dict, List, Optional, Tuple, Iterable
+from app.core.config import settings
+from app.core.logger import logger
+
+# parameter BM25Okapi (sama dengan default rank_bm25)
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+def _tokenize(text: str) -> List[str]:
+    return (text or "").split()
+
+class BM25Index:
+    """
+    Inverted index BM25 (postings + panjang dokumen) yang dipersist di samping koleksi Chroma.
+    Slot internal adalah int; slot yang dihapus jadi None dan dipadatkan saat save().
+    Daftar term per dokumen (tidak dipersist, dibangun ulang saat load) membuat remove() hanya menyentuh
+    postings milik dokumen itu. save() tidak menulis apa pun jika index tidak berubah sejak save/load terakhir.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self._mtime: Optional[float] = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.ids: List[Optional[str]] = []
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._terms: List[Optional[Tuple[str, ...]]] = []  # term unik per slot, untuk remove()
+        self._slot: Dict[str, int] = {}
+        self._dirty = False
+        self._total_len = 0
+        self._avg_idf: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    # ---------- update ----------
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        with self._lock:
+            ids, texts = list(ids), list(texts)
+            self.remove([i for i in ids if i in self._slot])
+            for doc_id, text in zip(ids, texts):
+                slot = len(self.ids)
+                toks = _tokenize(text)
+                self.ids.append(doc_id)
+                self.doc_len.append(len(toks))
+                self._slot[doc_id] = slot
+                self._total_len += len(toks)
+                tf: Dict[str, int] = {}
+                for t in toks:
+                    tf[t] = tf.get(t, 0) + 1
+                for t, c in tf.items():
+                    self.postings.setdefault(t, {})[slot] = c
+                self._terms.append(tuple(tf))
+            self._avg_idf = None
+            self._dirty = self._dirty or bool(ids)
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            slots = {self._slot.pop(i) for i in ids if i in self._slot}
+            if not slots:
+                return
+            for s in slots:
+                self.ids[s] = None
+                self._total_len -= self.doc_len[s]
+                self.doc_len[s] = 0
+                for t in self._terms[s]:
+                    plist = self.postings[t]
+                    del plist[s]
+                    if not plist:
+                        del self.postings[t]
+                self._terms[s] = None
+            self._avg_idf = None
+            self._dirty = True
+
+    def touch(self):
+        """Naikkan versi pada save() berikutnya walau postings sama (mis. metadata chunk diperbarui)."""
+        with self._lock:
+            self._dirty = True
+
+    # ---------- scoring ----------
+    def _idf(self, df: int, n: int) -> float:
+        return math.log(n - df + 0.5) - math.log(df + 0.5)
+
+    def _average_idf(self, n: int) -> float:
+        # dipakai sebagai lantai idf (epsilon) seperti BM25Okapi; di-cache sampai index berubah
+        if self._avg_idf is None:
+            total = sum(self._idf(len(p), n) for p in self.postings.values())
+            self._avg_idf = total / max(1, len(self.postings))
+        return self._avg_idf
+
+    def top_n(self, query: str, n: int, allowed: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Skor BM25 hanya lewat postings dari term query → [(chunk_id, score)] terurut.
+        `allowed`: hanya chunk_id ini yang diskor (filter metadata); statistik idf tetap dari seluruh koleksi.
+        """
+        with self._lock:
+            N = len(self._slot)
+            if N == 0 or n <= 0:
+                return []
+            slots = None
+            if allowed is not None:
+                slots = {self._slot[i] for i in allowed if i in self._slot}
+                if not slots:
+                    return []
+            avgdl = self._total_len / N
+            eps = EPSILON * self._average_idf(N)
+            scores: Dict[int, float] = {}
+            for t in _tokenize(query):
+                plist = self.postings.get(t)
+                if not plist:
+                    continue
+                idf = self._idf(len(plist), N)
+                if idf < 0:
+                    idf = eps
+                if slots is None:
+                    entries = plist.items()
+                elif len(slots) < len(plist):
+                    # scope kecil: cek slot yang diizinkan, bukan seluruh postings term
+                    entries = [(s, plist[s]) for s in slots if s in plist]
+                else:
+                    entries = [(s, tf) for s, tf in plist.items() if s in slots]
+                for s, tf in entries:
+                    denom = tf + K1 * (1 - B + B * self.doc_len[s] / avgdl)
+                    scores[s] = scores.get(s, 0.0) + idf * tf * (K1 + 1) / denom
+            best = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:n]
+            return [(self.ids[s], sc) for s, sc in best]
+
+    # ---------- persistence ----------
+    def save(self):
+        """Tulis index terpadatkan secara atomik (tmp + os.replace); no-op jika tidak ada perubahan."""
+        with self._lock:
+            if not self._dirty and os.path.exists(self.path):
+                return
+            live = [s for s, i in enumerate(self.ids) if i is not None]
+            remap = {s: k for k, s in enumerate(live)}
+            self.ids = [self.ids[s] for s in live]
+            self.doc_len = [self.doc_len[s] for s in live]
+            self._terms = [self._terms[s] for s in live]
+            self.postings = {t: {remap[s]: c for s, c in p.items()} for t, p in self.postings.items()}
+            self._slot = {i: k for k, i in enumerate(self.ids)}
+            self.version += 1
+            data = {
+                "version": self.version,
+                "ids": self.ids,
+                "doc_len": self.doc_len,
+                # postings ringkas: term -> [slot, tf, slot, tf, ...]
+                "postings": {t: [x for s_tf in sorted(p.items()) for x in s_tf] for t, p in self.postings.items()},
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            self._mtime = os.path.getmtime(self.path)
+            self._dirty = False
+
+    def load(self) -> "BM25Index":
+        with self._lock:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            self.version = int(data.get("version", 0))
+            self.ids = data["ids"]
+            self.doc_len = data["doc_len"]
+            self.postings = {t: dict(zip(flat[0::2], flat[1::2])) for t, flat in data["postings"].items()}
+            terms: List[List[str]] = [[] for _ in self.ids]
+            for t, plist in self.postings.items():
+                for s in plist:
+                    terms[s].append(t)
+            self._terms = [tuple(ts) for ts in terms]
+            self._slot = {i: k for k, i in enumerate(self.ids)}
+            self._dirty = False
+            self._total_len = sum(self.doc_len)
+            self._avg_idf = None
+            self._mtime = os.path.getmtime(self.path)
+            return self
+
+    def is_stale(self) -> bool:
+        """True jika file di disk ditulis proses lain (mis. CLI indexer) setelah kita load."""
+        try:
+            return os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return False
+
+    def rebuild_from_collection(self, coll, batch_size: int = 1000):
+        with self._lock:
+            self._reset()
+            total = coll.count()
+            for off in range(0, total, batch_size):
+                raw = coll.get(include=["documents"], limit=batch_size, offset=off)
+                self.add(raw["ids"], [t or "" for t in raw["documents"]])
+            self.save()
+            logger.info(f"[bm25] rebuilt lexical index: {len(self)} chunks")
+
+# ---------- satu instance per proses per koleksi ----------
+_INDEXES: Dict[str, BM25Index] = {}
+_INDEXES_LOCK = threading.Lock()
+
+def index_path(collection_name: str) -> str:
+    return os.path.join(settings.PERSIST_DIR, f"bm25_{collection_name}.json.gz")
+
+def get_bm25_index(vs) -> BM25Index:
+    """Load sekali per proses; build dari koleksi jika belum ada; reload jika file berubah."""
+    coll = vs._collection
+    path = index_path(coll.name)
+    with _INDEXES_LOCK:
+        idx = _INDEXES.get(path)
+        if idx is None:
+            idx = BM25Index(path)
+            if os.path.exists(path):
+                idx.load()
+            _INDEXES[path] = idx
+            if not os.path.exists(path) or len(idx) != coll.count():
+                idx.rebuild_from_collection(coll)
+        elif idx.is_stale():
+            idx.load()
+    return idx
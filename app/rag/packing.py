@@ -0,0 +1,178 @@
+# app/rag/packing.py
+# Context packer: hitung token dengan tokenizer model target, gabungkan chunk bertetangga/overlap dari sumber
+# yang sama (buang duplikasi CHUNK_OVERLAP), lalu isi budget token menurut urutan skor.
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+# context window (token) per prefix nama model; CONTEXT_WINDOW di .env menimpa tabel ini
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000, "gpt-4.1": 1000000, "gpt-4-turbo": 128000, "gpt-4": 8192, "gpt-3.5-turbo": 16385,
+    "o1": 200000, "o3": 200000, "o4": 200000, "gemini": 1000000, "llama3.1": 128000, "llama3": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+MIN_OVERLAP_CHARS = 16   # overlap lebih pendek dari ini tidak dianggap sambungan chunk
+MIN_TAIL_TOKENS = 48     # sisa budget minimum untuk memotong passage terakhir (di bawah ini dilewati)
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """Encoder tiktoken untuk model; None jika tiktoken tidak ada / file BPE tidak bisa diambil (offline)."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass  # model non-OpenAI (ollama, gemini, fake): pakai BPE umum sebagai pendekatan
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    enc = _encoding(model or settings.LLM_MODEL)
+    if enc is None:
+        return len(text) // 4 + 1  # sama dengan estimate_tokens di ingest
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    enc = _encoding(model or settings.LLM_MODEL)
+    if enc is None:
+        return text[: max(0, max_tokens - 1) * 4]
+    ids = enc.encode(text, disallowed_special=())
+    return text if len(ids) <= max_tokens else enc.decode(ids[:max_tokens])
+
+def context_window(model: Optional[str] = None) -> int:
+    if settings.CONTEXT_WINDOW > 0:
+        return settings.CONTEXT_WINDOW
+    name = (model or settings.LLM_MODEL).lower()
+    best = max((p for p in CONTEXT_WINDOWS if name.startswith(p)), key=len, default=None)
+    return CONTEXT_WINDOWS[best] if best else DEFAULT_CONTEXT_WINDOW
+
+def context_budget(model: Optional[str] = None, max_tokens: int = 512, reserved: int = 0) -> int:
+    """
+    Budget token untuk context: CONTEXT_MAX_TOKENS, dibatasi sisa window setelah jawaban (`max_tokens`)
+    dan bagian prompt lain (`reserved`: instruksi + pertanyaan).
+    """
+    room = context_window(model) - max_tokens - reserved - settings.CONTEXT_SAFETY_TOKENS
+    return max(0, min(settings.CONTEXT_MAX_TOKENS, room))
+
+def _chunk_range(meta: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Nomor chunk dari metadata FAISS (`location`: "chunk 3" / "chunks 3–5")."""
+    m = re.fullmatch(r"chunks? (\d+)(?:[–-](\d+))?", str(meta.get("location") or ""))
+    return (int(m.group(1)), int(m.group(2) or m.group(1))) if m else None
+
+def _suffix_prefix(a: str, b: str) -> int:
+    """Panjang overlap terpanjang: akhir `a` == awal `b` (0 jika < MIN_OVERLAP_CHARS)."""
+    head = b[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return 0
+    pos = a.find(head, max(0, len(a) - len(b)))
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(head, pos + 1)
+    return 0
+
+def _join(a: str, b: str) -> Optional[str]:
+    """`a` lalu `b` tanpa duplikasi overlap; None jika keduanya tidak bersambung."""
+    if len(b) >= MIN_OVERLAP_CHARS and b in a:
+        return a
+    if len(a) >= MIN_OVERLAP_CHARS and a in b:
+        return b
+    k = _suffix_prefix(a, b)
+    return a + b[k:] if k else None
+
+def _merge_meta(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    meta = dict(first)
+    pages = [p for p in (first.get("page"), first.get("page_end"), second.get("page"), second.get("page_end")) if p is not None]
+    if pages:
+        meta["page"], meta["page_end"] = min(pages), max(pages)
+    lines = [x for x in (first.get("line_start"), second.get("line_start")) if x is not None]
+    ends = [x for x in (first.get("line_end"), second.get("line_end")) if x is not None]
+    if lines:
+        meta["line_start"] = min(lines)
+    if ends:
+        meta["line_end"] = max(ends)
+    a, b = _chunk_range(first), _chunk_range(second)
+    if a and b:
+        lo, hi = min(a[0], b[0]), max(a[1], b[1])
+        meta["location"] = f"chunk {lo}" if lo == hi else f"chunks {lo}–{hi}"
+    return meta
+
+class Passage:
+    """Satu atau lebih chunk bersambung dari sumber yang sama; skor = skor chunk terbaik."""
+
+    def __init__(self, text: str, meta: Dict[str, Any], score: float):
+        self.text = text
+        self.meta = dict(meta or {})
+        self.score = score
+
+    @property
+    def source(self) -> Any:
+        return self.meta.get("source", "unknown")
+
+    def absorb(self, other: "Passage") -> bool:
+        """Gabungkan `other` jika overlap / bersebelahan; urutan teks ikut posisi di dokumen."""
+        if other.source != self.source:
+            return False
+        a, b = _chunk_range(self.meta), _chunk_range(other.meta)
+        text = _join(self.text, other.text)
+        if text is not None:
+            meta = _merge_meta(self.meta, other.meta)
+        else:
+            text = _join(other.text, self.text)
+            if text is not None:
+                meta = _merge_meta(other.meta, self.meta)
+            elif a and b and b[0] == a[1] + 1:
+                text, meta = self.text + "\n" + other.text, _merge_meta(self.meta, other.meta)
+            elif a and b and a[0] == b[1] + 1:
+                text, meta = other.text + "\n" + self.text, _merge_meta(other.meta, self.meta)
+            else:
+                return False
+        self.text, self.meta, self.score = text, meta, max(self.score, other.score)
+        return True
+
+def merge_passages(items: Sequence[Tuple[str, Dict[str, Any], float]]) -> List[Passage]:
+    """(text, meta, score) → passage tergabung, terurut menurun menurut skor."""
+    out: List[Passage] = []
+    for text, meta, score in sorted(items, key=lambda x: -x[2]):
+        if not (text or "").strip():
+            continue
+        p = Passage(text, meta, score)
+        # serap ke passage yang sudah ada; passage hasil gabungan bisa menjembatani passage lain
+        while True:
+            host = next((q for q in out if q.absorb(p)), None)
+            if host is None:
+                out.append(p)
+                break
+            out.remove(host)
+            p = host
+    out.sort(key=lambda q: -q.score)
+    return out
+
+def pack_context(items: Sequence[Tuple[str, Dict[str, Any], float]], budget: int, model: Optional[str] = None,
+                 label: Optional[Callable[[Dict[str, Any]], str]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Isi `budget` token dengan passage menurut urutan skor. `label(meta)` = header per passage di prompt,
+    ikut dihitung. Passage yang tidak muat dilewati; jika sisa budget cukup besar, passage dipotong per token.
+    """
+    packed: List[Tuple[str, Dict[str, Any]]] = []
+    left = budget
+    for p in merge_passages(items):
+        overhead = count_tokens(label(p.meta), model) if label else 0
+        need = overhead + count_tokens(p.text, model)
+        if need <= left:
+            packed.append((p.text, p.meta))
+            left -= need
+        elif left - overhead >= MIN_TAIL_TOKENS:
+            packed.append((truncate_tokens(p.text, left - overhead, model), p.meta))
+            left = 0
+        # sisa kecil tetap dipakai passage berikutnya yang muat utuh; hanya pemotongan yang butuh MIN_TAIL_TOKENS
+        if left <= 0:
+            break
+    return packed
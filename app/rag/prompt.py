@@ -1,21 +1,25 @@
-from langchain.schema import Document
+from langchain_core.documents import Document
+from typing import Optional, Sequence
+from app.core.config import settings
+from app.rag.packing import pack_context, context_budget, count_tokens
 
-MAX_CHARS = 1200  
 SYSTEM_INSTRUCTION = (
     "You are a helpful assistant that MUST answer ONLY using the provided context. "
     "Cite facts from the context; do not fabricate."
     "If the answer is not present, say so briefly."
 )
+SEPARATOR = "\n\n---\n\n"
 
-def build_prompt(context_docs, question: str) -> str:
-    context_texts = []
-    for d in context_docs:
-        txt = (d.page_content or "")[:MAX_CHARS]
-        src = d.metadata.get("source", "unknown")
-        page = d.metadata.get("page")
-        ref = f"(source: {src}, page: {page})" if page is not None else f"(source: {src})"
-        context_texts.append(f"{ref}\n{txt}")
-    joined_context = "\n\n---\n\n".join(context_texts)
+def _ref(meta) -> str:
+    src = meta.get("source", "unknown")
+    page, page_end = meta.get("page"), meta.get("page_end")
+    if page is None:
+        return f"(source: {src})"
+    if page_end is not None and page_end != page:
+        return f"(source: {src}, pages: {page}-{page_end})"
+    return f"(source: {src}, page: {page})"
+
+def _render(joined_context: str, question: str) -> str:
     return f"""{SYSTEM_INSTRUCTION}
 
 Context:
@@ -24,4 +28,15 @@ Context:
 Question: {question}
 
 Answer in the same language as the question."""
-    return prompt
+
+def build_prompt(context_docs, question: str, scores: Optional[Sequence[float]] = None, max_tokens: int = 512,
+                 model: Optional[str] = None) -> str:
+    # context dipacking per token: chunk bersambung dari sumber sama digabung, diisi menurut skor sampai budget
+    model = model or settings.LLM_MODEL
+    if scores is None:
+        scores = [-i for i in range(len(context_docs))]  # tanpa skor: urutan input = urutan relevansi
+    items = [(d.page_content or "", d.metadata or {}, float(s)) for d, s in zip(context_docs, scores)]
+    budget = context_budget(model, max_tokens, reserved=count_tokens(_render("", question), model))
+    packed = pack_context(items, budget, model, label=lambda md: _ref(md) + SEPARATOR)
+    joined_context = SEPARATOR.join(f"{_ref(md)}\n{txt}" for txt, md in packed)
+    return _render(joined_context, question)
@@ -0,0 +1,148 @@
+# app/rag/reranker.py
+import time, queue, threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.cache import LRUCache, normalize_question
+
+class Reranker:
+    """
+    CrossEncoder reranker: warm-up saat startup, cache skor (query, chunk_id),
+    passage dipotong ke budget token, dan micro-batching request yang datang bersamaan
+    menjadi satu panggilan `predict`.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", max_tokens: Optional[int] = None,
+                 cache_size: Optional[int] = None, batch_window_ms: Optional[float] = None, max_batch: Optional[int] = None,
+                 model=None):
+        self.model_name = model_name
+        self.max_tokens = max_tokens or settings.RERANK_MAX_TOKENS
+        self.batch_window = (settings.RERANK_BATCH_WINDOW_MS if batch_window_ms is None else batch_window_ms) / 1000
+        self.max_batch = max_batch or settings.RERANK_MAX_BATCH
+        self.scores = LRUCache(maxsize=cache_size or settings.RERANK_CACHE_SIZE)
+        self._model = model  # model siap pakai (mis. FakeCrossEncoder untuk benchmark); None = load lazy
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[List[Tuple[str, str]], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    # ---------- model ----------
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    t0 = time.perf_counter()
+                    if settings.RERANK_BACKEND == "onnx":
+                        from app.onnx_models import OnnxCrossEncoder
+                        self._model = OnnxCrossEncoder.load(self.model_name)
+                    else:
+                        from sentence_transformers import CrossEncoder
+                        self._model = CrossEncoder(self.model_name)
+                    logger.info(f"[rerank] loaded {self.model_name} ({settings.RERANK_BACKEND}) "
+                                f"in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return self._model
+
+    def warmup(self):
+        """Load model + satu predict dummy supaya user pertama tidak membayar biaya load/JIT."""
+        t0 = time.perf_counter()
+        self.model.predict([("warm up", "warm up passage")])
+        logger.info(f"[rerank] warm-up done in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    def _truncate(self, text: str) -> str:
+        tok = getattr(self.model, "tokenizer", None)
+        if tok is None:
+            words = text.split()
+            return " ".join(words[: self.max_tokens]) if len(words) > self.max_tokens else text
+        ids = tok.encode(text, add_special_tokens=False)
+        return text if len(ids) <= self.max_tokens else tok.decode(ids[: self.max_tokens])
+
+    # ---------- micro-batching ----------
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._load_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="rerank-batcher", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            n = len(jobs[0][0])
+            deadline = time.monotonic() + self.batch_window
+            while n < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=left)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                n += len(job[0])
+            pairs = [p for job_pairs, _ in jobs for p in job_pairs]
+            try:
+                out = self.model.predict(pairs, batch_size=self.max_batch)
+                pos = 0
+                for job_pairs, fut in jobs:
+                    fut.set_result([float(x) for x in out[pos:pos + len(job_pairs)]])
+                    pos += len(job_pairs)
+            except Exception as e:
+                for _, fut in jobs:
+                    fut.set_exception(e)
+
+    def predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        if not pairs:
+            return []
+        if self.batch_window <= 0:
+            return [float(x) for x in self.model.predict(pairs, batch_size=self.max_batch)]
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((pairs, fut))
+        return fut.result()
+
+    # ---------- API ----------
+    def score(self, query: str, items: Sequence[Tuple[str, str]], stats: Optional[Dict[str, Any]] = None) -> List[float]:
+        """items: [(chunk_id, text)] → skor CrossEncoder; skor (query, chunk_id) yang sudah pernah dihitung diambil dari cache."""
+        return self._score([(query, items)], self.predict, stats)[0]
+
+    def score_many(self, jobs: Sequence[Tuple[str, Sequence[Tuple[str, str]]]], stats: Optional[Dict[str, Any]] = None) -> List[List[float]]:
+        """Seperti `score` untuk banyak query sekaligus: semua pasangan yang belum di-cache jadi satu `predict` besar."""
+        return self._score(jobs, lambda pairs: [float(x) for x in self.model.predict(pairs, batch_size=self.max_batch)] if pairs else [], stats)
+
+    def _score(self, jobs, predict, stats: Optional[Dict[str, Any]]) -> List[List[float]]:
+        t0 = time.perf_counter()
+        out: List[List[Optional[float]]] = []
+        miss: List[Tuple[int, int, str, str]] = []  # (job, item, query ternormalisasi, chunk_id)
+        pairs: List[Tuple[str, str]] = []
+        for j, (query, items) in enumerate(jobs):
+            qn = normalize_question(query)
+            row: List[Optional[float]] = [self.scores.get((qn, cid)) for cid, _ in items]
+            for i, s in enumerate(row):
+                if s is None:
+                    miss.append((j, i, qn, items[i][0]))
+                    pairs.append((query, self._truncate(items[i][1])))
+            out.append(row)
+        if pairs:
+            for (j, i, qn, cid), s in zip(miss, predict(pairs)):
+                out[j][i] = s
+                self.scores.set((qn, cid), s)
+        if stats is not None:
+            total = sum(len(items) for _, items in jobs)
+            stats["rerank_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            stats["rerank_pairs"] = total
+            stats["rerank_cache_hits"] = total - len(pairs)
+        return [[float(s) for s in row] for row in out]
+
+_RERANKER: Optional[Reranker] = None
+
+def get_reranker() -> Reranker:
+    global _RERANKER
+    if _RERANKER is None:
+        _RERANKER = Reranker()
+    return _RERANKER
+
+def set_reranker(reranker: Optional[Reranker]):
+    """Ganti reranker global (mis. FakeCrossEncoder di benchmark); None = kembali ke default lazy."""
+    global _RERANKER
+    _RERANKER = reranker
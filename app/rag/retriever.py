@@ -1,63 +1,251 @@
 # app/rag/retriever.py
-from typing import List, Tuple
-from langchain.schema import Document
-from sentence_transformers import CrossEncoder
-from rank_bm25 import BM25Okapi
+from typing import List, Tuple, Optional, Dict, Any, FrozenSet, NamedTuple
+from langchain_core.documents import Document
+import hashlib
+from app.core.config import settings
+from app.rag.lexical_index import get_bm25_index
+from app.rag.cache import LRUCache, VersionedCache, normalize_question
+from app.rag.fusion import FusionParams, fuse
+from app.rag.filters import SearchFilter, chroma_where
+from app.ingest.manifest import IngestManifest
+from app.core.metrics import timed
 import numpy as np
 
-# cache model kecil untuk rerank (cepat, lokal)
-_CE = None
-def _ce():
-    global _CE
-    if _CE is None:
-        _CE = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-    return _CE
-
-def _bm25_from_docs(all_docs: List[Document]):
-    tokenized = [d.page_content.split() for d in all_docs]
-    bm25 = BM25Okapi(tokenized)
-    return bm25, tokenized
-
-def retrieve_with_scores(vs, query: str, top_k: int = 5) -> List[Tuple[Document, float]]:
-    """
-    Hybrid: vector (MMR) + BM25 → union → CrossEncoder rerank → top_k
-    """
-    # 1) vector MMR
-    vec_ret = vs.as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": min(top_k, 6), "fetch_k": 25, "lambda_mult": 0.6},
-    )
-    vec_docs = vec_ret.invoke(query)
-
-    # 2) BM25 keyword
-    raw = vs._collection.get(include=["documents", "metadatas"])
-    all_docs = [Document(page_content=t, metadata=m) for t, m in zip(raw["documents"], raw["metadatas"])]
-    bm25, tokenized = _bm25_from_docs(all_docs)
-    scores = bm25.get_scores(query.split())
-    bm_idx = np.argsort(scores)[::-1][:max(top_k, 5)]
-    bm_docs = [all_docs[i] for i in bm_idx]
-
-    # 3) union candidates
-    seen = set()
-    cands: List[Document] = []
-    for d in vec_docs + bm_docs:
-        key = (d.metadata.get("source"), d.metadata.get("page"), d.page_content[:60])
-        if key not in seen:
-            seen.add(key)
-            cands.append(d)
-
-    # 4) rerank dengan CrossEncoder
-    ce = _ce()
-    pairs = [(query, d.page_content) for d in cands]
-    if pairs:
-        ce_scores = ce.predict(pairs).tolist()
-    else:
-        ce_scores = []
-
-    ranked = sorted(zip(cands, ce_scores), key=lambda x: x[1], reverse=True)[:top_k]
+from app.rag.reranker import get_reranker
+
+def chunk_id_of(d: Document) -> str:
+    """ID chunk stabil: dari metadata (ingest baru), id Document, atau hash source+konten (index lama)."""
+    cid = d.metadata.get("chunk_id") or getattr(d, "id", None)
+    if cid:
+        return cid
+    return hashlib.sha256(f"{d.metadata.get('source')}\x00{d.page_content}".encode("utf-8")).hexdigest()[:32]
+
+# cache query embedding (tidak tergantung index) & hasil retrieval (dikosongkan saat versi index berubah)
+_QUERY_EMB = LRUCache(maxsize=settings.QUERY_CACHE_SIZE)
+_RETRIEVAL = VersionedCache(maxsize=settings.RETRIEVAL_CACHE_SIZE)
+# filter → (where, chunk_id yang lolos) per versi index
+_SCOPES = VersionedCache(maxsize=settings.FILTER_CACHE_SIZE)
+
+class Scope(NamedTuple):
+    where: Dict[str, Any]
+    ids: FrozenSet[str]
+
+def index_version(vs) -> str:
+    """Versi index Chroma = versi BM25 index (naik tiap kali indexer menyimpan perubahan)."""
+    return f"{vs._collection.name}@{get_bm25_index(vs).version}"
+
+def query_embedding(vs, query: str, stats: Dict[str, Any]):
+    """Embedding query (LRU); dipakai juga cache jawaban semantik di app/api/main.py, jadi query di-embed sekali."""
+    emb = _QUERY_EMB.get(query)
+    stats.setdefault("cache", {}).setdefault("embedding", "hit" if emb is not None else "miss")
+    if emb is None:
+        emb = vs.embeddings.embed_query(query)
+        _QUERY_EMB.set(query, emb)
+    return emb
+
+def _scope(vs, flt: Optional[SearchFilter], version: str, stats: Dict[str, Any]) -> Optional[Scope]:
+    """
+    Klausa `where` + himpunan chunk_id yang lolos filter (satu `collection.get` per filter per versi index).
+    Tipe file di-resolve ke nama source lewat manifest ingest. Scope kosong → ids kosong.
+    """
+    if flt is None:
+        return None
+    cacheable = _SCOPES.check_version(version)
+    scope = _SCOPES.get(flt) if cacheable else None
+    if scope is None:
+        known = IngestManifest.for_collection(vs._collection.name).files if flt.file_types else None
+        where = chroma_where(flt, known)
+        ids = frozenset(vs._collection.get(where=where, include=[])["ids"]) if where is not None else frozenset()
+        scope = Scope(where or {}, ids)
+        if cacheable:
+            _SCOPES.set(flt, scope)
+    stats["filter_chunks"] = len(scope.ids)
+    return scope
+
+def retrieve_with_scores(vs, query: str, top_k: int = 5, stats: Optional[Dict[str, Any]] = None,
+                         fusion: Optional[FusionParams] = None, flt: Optional[SearchFilter] = None) -> List[Tuple[Document, float]]:
+    """
+    Hybrid: vector (MMR) + BM25 → fusion skor per chunk_id → cutoff → CrossEncoder rerank → top_k
+    `stats` (opsional) diisi info cache hit/miss dan `timings_ms` per tahap untuk metadata response.
+    `flt` (opsional) dipush ke `where` vector search dan ke kandidat BM25, bukan disaring setelah rerank.
+    """
+    stats = stats if stats is not None else {}
+    fusion = fusion or FusionParams.resolve()
+    version = index_version(vs)
+    # versi yang sudah diganti (swap selama request) tidak membaca/mengisi cache
+    cacheable = _RETRIEVAL.check_version(version)
+    key = (normalize_question(query), top_k, fusion, flt)
+    cached = _RETRIEVAL.get(key) if cacheable else None
+    stats.setdefault("cache", {})["retrieval"] = "hit" if cached is not None else ("miss" if cacheable else "bypass")
+    stats["index_version"] = version
+    if cached is not None:
+        return list(cached)
+    scope = _scope(vs, flt, version, stats)
+    ranked = [] if scope is not None and not scope.ids else _retrieve(vs, query, top_k, stats, fusion, scope)
+    if cacheable:
+        _RETRIEVAL.set(key, ranked)
+    return list(ranked)
+
+VECTOR_QUERY_BATCH = 64  # query per panggilan collection.query di retrieve_many (embedding kandidat ikut dikirim balik)
+
+def _vector_hits_many(vs, embs: List[List[float]], k: int, fetch_k: int = 25, lambda_mult: float = 0.6,
+                      scope: Optional[Scope] = None) -> List[List[Tuple[Document, float]]]:
+    """
+    MMR seperti `max_marginal_relevance_search_by_vector` untuk banyak query sekaligus: satu
+    `collection.query` dengan daftar query_embeddings per batch, skor relevansi vektor ikut dikembalikan.
+    `scope`: filter metadata dijalankan Chroma (`where`) sebelum top-`fetch_k` diambil.
+    """
+    from langchain_chroma.vectorstores import maximal_marginal_relevance
+    relevance = vs._select_relevance_score_fn()
+    out: List[List[Tuple[Document, float]]] = []
+    for b in range(0, len(embs), VECTOR_QUERY_BATCH):
+        group = embs[b:b + VECTOR_QUERY_BATCH]
+        res = vs._collection.query(query_embeddings=group, n_results=min(fetch_k, len(scope.ids)) if scope else fetch_k,
+                                   where=scope.where if scope else None,
+                                   include=["documents", "metadatas", "distances", "embeddings"])
+        for q, emb in enumerate(group):
+            if not res["ids"] or not res["ids"][q]:
+                out.append([])
+                continue
+            selected = set(maximal_marginal_relevance(np.array(emb, dtype=np.float32), res["embeddings"][q],
+                                                      k=k, lambda_mult=lambda_mult))
+            rows = zip(res["ids"][q], res["documents"][q], res["metadatas"][q], res["distances"][q])
+            out.append([(Document(page_content=text, metadata={"chunk_id": cid, **(md or {})}), float(relevance(dist)))
+                        for i, (cid, text, md, dist) in enumerate(rows) if i in selected])
+    return out
+
+def _vector_hits(vs, emb, k: int, fetch_k: int = 25, lambda_mult: float = 0.6,
+                 scope: Optional[Scope] = None) -> List[Tuple[Document, float]]:
+    return _vector_hits_many(vs, [emb], k, fetch_k, lambda_mult, scope)[0]
+
+def _candidates(vs, query: str, emb, top_k: int, timings: Dict[str, float], fusion: FusionParams,
+                vec_hits: Optional[List[Tuple[Document, float]]] = None,
+                scope: Optional[Scope] = None) -> Tuple[List[Tuple[Document, float]], bool]:
+    """
+    Kandidat hasil fusion (terurut, sudah dipotong ke `rerank_candidates`) + flag True jika top-n
+    vector & BM25 sudah sepakat (rerank bisa dilewati). `vec_hits`: hasil vector search yang sudah
+    dihitung (retrieve_many), supaya tidak query ulang per pertanyaan.
+    """
+    if vec_hits is None:
+        with timed(timings, "vector_search"):
+            vec_hits = _vector_hits(vs, emb, k=min(top_k, 6), scope=scope)
+
+    # BM25 keyword (inverted index persisten, hanya postings term query yang disentuh; filter → slot yang lolos saja)
+    with timed(timings, "bm25"):
+        bm_hits = get_bm25_index(vs).top_n(query, max(top_k, 5), allowed=scope.ids if scope else None)
+
+    with timed(timings, "fusion"):
+        docs: Dict[str, Document] = {chunk_id_of(d): d for d, _ in vec_hits}
+        fused = fuse([(chunk_id_of(d), s) for d, s in vec_hits], bm_hits, fusion)
+        fused = fused[:max(top_k, fusion.rerank_candidates)]
+        # teks hanya diambil untuk kandidat BM25 yang lolos cutoff dan belum ada dari hasil vector
+        need = [cid for cid, _ in fused if cid not in docs]
+    if need:
+        with timed(timings, "bm25"):
+            raw = vs._collection.get(ids=need, include=["documents", "metadatas"])
+            for i, t, m in zip(raw["ids"], raw["documents"], raw["metadatas"]):
+                docs[i] = Document(page_content=t, metadata={"chunk_id": i, **(m or {})})
+    cands = [(docs[cid], s) for cid, s in fused if cid in docs]
+
+    n = min(top_k, len(vec_hits), len(bm_hits))
+    agree = bool(n) and {chunk_id_of(d) for d, _ in vec_hits[:n]} == {i for i, _ in bm_hits[:n]}
+    return cands, agree
+
+def _unranked(cands: List[Tuple[Document, float]], top_k: int) -> List[Tuple[Document, float]]:
+    # tanpa rerank: urutan & skor fusion (dinormalisasi 0..1 terhadap kandidat teratas)
+    top = cands[:top_k]
+    mx = max((s for _, s in top), default=0.0)
+    return [(d, s / mx if mx > 0 else 0.0) for d, s in top]
+
+def _rank(cands: List[Tuple[Document, float]], ce_scores: List[float], top_k: int) -> List[Tuple[Document, float]]:
+    ranked = sorted(zip((d for d, _ in cands), ce_scores), key=lambda x: x[1], reverse=True)[:top_k]
     # normalisasi skor 0..1 untuk metadata
     if ranked:
         mx, mn = max(s for _, s in ranked), min(s for _, s in ranked)
         rng = max(1e-6, mx - mn)
         ranked = [(d, (s - mn) / rng) for d, s in ranked]
     return ranked
+
+def _retrieve(vs, query: str, top_k: int, stats: Dict[str, Any], fusion: FusionParams,
+              scope: Optional[Scope] = None) -> List[Tuple[Document, float]]:
+    timings = stats.setdefault("timings_ms", {})
+    # 1) query embedding (di-cache), 2) vector MMR + BM25 → fusion per chunk_id → cutoff
+    with timed(timings, "embedding"):
+        emb = query_embedding(vs, query, stats)
+    cands, agree = _candidates(vs, query, emb, top_k, timings, fusion, scope=scope)
+    stats["rerank_candidates"] = len(cands)
+
+    # 3) rerank dengan CrossEncoder — dilewati kalau vector & BM25 sudah sepakat soal top-n
+    if agree:
+        stats.update(rerank_skipped=True, rerank_ms=0.0)
+        timings["rerank"] = 0.0
+        return _unranked(cands, top_k)
+    stats["rerank_skipped"] = False
+    with timed(timings, "rerank"):
+        ce_scores = get_reranker().score(query, [(chunk_id_of(d), d.page_content) for d, _ in cands], stats)
+    return _rank(cands, ce_scores, top_k)
+
+def _embed_queries(vs, queries: List[str]) -> List[List[float]]:
+    """Embedding banyak query: cache LRU dulu, sisanya satu panggilan batch ke provider."""
+    embs = [_QUERY_EMB.get(q) for q in queries]
+    miss = [i for i, e in enumerate(embs) if e is None]
+    if miss:
+        texts = [queries[i] for i in miss]
+        # OpenAI (& fake) memakai model yang sama untuk query dan dokumen → boleh satu request batch;
+        # provider lain (mis. Gemini task_type) tetap lewat embed_query per pertanyaan
+        if settings.EMBEDDINGS_PROVIDER in ("openai", "fake"):
+            fresh = vs.embeddings.embed_documents(texts)
+        else:
+            fresh = [vs.embeddings.embed_query(t) for t in texts]
+        for i, e in zip(miss, fresh):
+            embs[i] = e
+            _QUERY_EMB.set(queries[i], e)
+    return embs
+
+def retrieve_many(vs, queries: List[str], top_k: int = 5, stats: Optional[Dict[str, Any]] = None,
+                  fusion: Optional[FusionParams] = None, flt: Optional[SearchFilter] = None) -> List[List[Tuple[Document, float]]]:
+    """
+    Versi batch retrieve_with_scores: embedding semua query dalam satu batch, vector search multi-query,
+    lalu semua pasangan (query, kandidat) di-rerank dalam satu panggilan CrossEncoder. Hasil urut sesuai `queries`.
+    `flt` berlaku untuk semua query.
+    """
+    stats = stats if stats is not None else {}
+    fusion = fusion or FusionParams.resolve()
+    timings = stats.setdefault("timings_ms", {})
+    version = index_version(vs)
+    cacheable = _RETRIEVAL.check_version(version)
+    stats["index_version"] = version
+    keys = [(normalize_question(q), top_k, fusion, flt) for q in queries]
+    results: List[Optional[List[Tuple[Document, float]]]] = [_RETRIEVAL.get(k) if cacheable else None for k in keys]
+    todo = [i for i, r in enumerate(results) if r is None]
+    stats["cache"] = {"retrieval_hits": len(queries) - len(todo)}
+    if not todo:
+        return [list(r) for r in results]
+    scope = _scope(vs, flt, version, stats)
+    if scope is not None and not scope.ids:
+        return [list(r) if r is not None else [] for r in results]
+
+    with timed(timings, "embedding"):
+        embs = _embed_queries(vs, [queries[i] for i in todo])
+    # satu vector search multi-query (per VECTOR_QUERY_BATCH), bukan satu query per pertanyaan
+    with timed(timings, "vector_search"):
+        all_hits = _vector_hits_many(vs, embs, k=min(top_k, 6), scope=scope)
+    jobs = []
+    for i, emb, hits in zip(todo, embs, all_hits):
+        cands, agree = _candidates(vs, queries[i], emb, top_k, timings, fusion, vec_hits=hits, scope=scope)
+        if agree:
+            results[i] = _unranked(cands, top_k)
+        else:
+            jobs.append((i, cands))
+
+    stats["rerank_skipped"] = len(todo) - len(jobs)
+    if jobs:
+        with timed(timings, "rerank"):
+            scores = get_reranker().score_many(
+                [(queries[i], [(chunk_id_of(d), d.page_content) for d, _ in cands]) for i, cands in jobs], stats)
+        for (i, cands), sc in zip(jobs, scores):
+            results[i] = _rank(cands, sc, top_k)
+    if cacheable:
+        for i in todo:
+            _RETRIEVAL.set(keys[i], results[i])
+    return [list(r) for r in results]
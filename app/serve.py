@@ -0,0 +1,120 @@
+"""
+Launcher preload/fork: app diimport dan model + index dimuat SEKALI di proses parent, lalu N worker uvicorn
+di-fork dari situ dan berbagi halaman memori itu (copy-on-write), alih-alih tiap worker memuat salinan sendiri.
+
+    python -m app.serve app.server:app --workers 4 --port 8000      # stack FAISS
+    python -m app.serve app.api.main:app --workers 4 --port 8000    # stack Chroma
+
+Modul app boleh menyediakan `preload()` (tanpa thread/koneksi, aman sebelum fork); warm-up per worker
+tetap jalan di event startup dan GET /ready baru 200 setelah itu. Waktu per fase: GET /ready atau log [startup].
+Tanpa os.fork (Windows) atau --workers 1: satu proses uvicorn biasa (preload tetap dipakai).
+"""
+import os, gc, sys, time, signal, socket, argparse, importlib
+from typing import Dict
+
+from app.core.logger import logger
+from app.core.startup import STARTUP
+
+# worker yang mati lebih cepat dari ini setelah di-fork dianggap gagal start → tidak di-restart (hindari loop)
+MIN_UPTIME_S = 5.0
+
+def load_app(target: str):
+    """Import `module:attr` lalu jalankan `preload()` modul itu jika ada."""
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    preload = getattr(module, "preload", None)
+    if preload is not None:
+        t0 = time.perf_counter()
+        preload()
+        logger.info(f"[serve] preloaded {module_name} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    return getattr(module, attr or "app")
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _serve(app, sock: socket.socket, args):
+    import uvicorn
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _worker(app, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # proses worker: handler sinyal parent dilepas, uvicorn memasang handler shutdown sendiri
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    STARTUP.forked()
+    code = 0
+    try:
+        _serve(app, sock, args)
+    except BaseException as e:
+        logger.error(f"[serve] worker {os.getpid()} crashed: {type(e).__name__}: {e}")
+        code = 1
+    finally:
+        os._exit(code)
+
+def main():
+    ap = argparse.ArgumentParser(description="uvicorn dengan preload model/index di parent lalu fork worker")
+    ap.add_argument("target", nargs="?", default="app.server:app", help="module:attr (default app.server:app)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    ap.add_argument("--backlog", type=int, default=2048)
+    ap.add_argument("--keep-alive", type=int, default=5)
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args()
+
+    sock = _bind(args.host, args.port, args.backlog)
+    app = load_app(args.target)
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        _serve(app, sock, args)
+        return
+
+    # objek hasil preload dipindah ke generasi permanen: GC di worker tidak menulis header objek itu,
+    # jadi halamannya tetap dibagi dengan parent
+    gc.collect()
+    gc.freeze()
+    children: Dict[int, float] = {}
+    for _ in range(args.workers):
+        children[_worker(app, sock, args)] = time.monotonic()
+    logger.info(f"[serve] {len(children)} workers on {args.host}:{args.port}, pids {sorted(children)}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - started < MIN_UPTIME_S:
+            logger.error(f"[serve] worker {pid} exited with {code} during startup; not restarting")
+            continue
+        new = _worker(app, sock, args)
+        children[new] = time.monotonic()
+        logger.warning(f"[serve] worker {pid} exited with {code}; restarted as {new}")
+    sock.close()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -1,107 +1,411 @@
-import os, time, faiss, json
+import os, time, json, asyncio
+_IMPORT_T0 = time.perf_counter()
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, AsyncIterator, Optional
 
 import numpy as np
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
-from .utils import load_document, chunk_text, embedder, save_metadata
-from .utils import load_metadata, build_prompt
+from .utils import load_document, chunk_text, embedder
+from .utils import build_prompt
+from .chunk_store import ChunkStore
+from .rag.cache import LRUCache, SemanticCache, VersionedCache, normalize_question
+from .core.concurrency import run_blocking
+from .rag.filters import SearchFilter, store_ids
+from .core.schema import FilterOptions
+from .snapshots import SnapshotManager
+from .shards import ShardSet, is_sharded
+from .core import metrics
+from .core.metrics import timed, observe_request
+from .core.clients import on_close
+from .core.startup import STARTUP, warm_up_in_background
 
-
-# Providers
-from openai import OpenAI
-import ollama
+# faiss, sentence_transformers (torch), openai, ollama diimport saat pertama dipakai (preload/startup atau
+# request pertama ke provider tsb), bukan saat modul ini diimport
 
 load_dotenv()
+STARTUP.record("import", time.perf_counter() - _IMPORT_T0)
 
 STORAGE_DIR = Path(__file__).resolve().parents[1] / "storage"
+# layout lama tanpa storage/CURRENT: index + chunks langsung di storage/ (chunks.jsonl + metadata.json dikonversi sekali)
 INDEX_PATH = STORAGE_DIR / "index.faiss"
 META_PATH  = STORAGE_DIR / "metadata.json"
+CHUNKS_PATH = STORAGE_DIR / "chunks.jsonl"
 
 PROVIDER = os.getenv("PROVIDER", "openai").lower()
 TOP_K = int(os.getenv("TOP_K", "5"))
+MAX_TOKENS = int(os.getenv("MAX_TOKENS", "512"))  # batas jawaban; sisa context window dipakai untuk packing context
+TEMPERATURE = float(os.getenv("TEMPERATURE", "0.2"))  # dipakai semua provider dan ikut di key answer cache
+FILTER_CACHE_SIZE = int(os.getenv("FILTER_CACHE_SIZE", "256"))  # ID-selector per filter per snapshot
+
+# Embeddings model (local SentenceTransformer for retrieval); dimuat oleh preload()
+EMB = None
+
+def _load_snapshot(path: Path) -> Dict[str, Any]:
+    if is_sharded(path):
+        # index ter-shard (INDEX_SHARDS > 1): shard dimuat di thread/proses worker/shard server sesuai SHARD_MODE
+        shards = ShardSet(path)
+        return {"shards": shards, "info": shards.info, "close": shards.close}
+    from .faiss_index import load_index
+    # tipe index (flat/hnsw/ivfpq) + efSearch/nprobe diambil dari index_info.json yang ditulis ingest
+    index, info = load_index(path / "index.faiss")
+    # memory-mapped: teks & metadata tidak di-parse di depan, page cache dipakai bersama antar worker
+    chunks_dir = path / "chunks"
+    if ChunkStore.exists(chunks_dir):
+        store = ChunkStore(chunks_dir)
+    else:
+        store = ChunkStore.from_legacy(chunks_dir, CHUNKS_PATH, META_PATH)
+    store.ids_by("source")  # index id per source untuk filter, dihitung sekali per snapshot
+    # ID-selector per filter ikut snapshot: otomatis dibuang bersama versi index lama
+    return {"index": index, "info": info, "store": store, "scopes": LRUCache(maxsize=FILTER_CACHE_SIZE)}
+
+def _legacy_version() -> Optional[str]:
+    if not INDEX_PATH.exists():
+        return None
+    st = INDEX_PATH.stat()
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
 
-# Embeddings model (local SentenceTransformer for retrieval)
-EMB = embedder()
+def _index_swapped(snap):
+    # server yang start tanpa index (warm-up gagal) jadi ready begitu versi pertama berhasil dimuat
+    if not STARTUP.ready and EMB is not None:
+        STARTUP.mark_ready()
 
-# Load FAISS + metadata on startup
-if not INDEX_PATH.exists() or not META_PATH.exists():
-    raise RuntimeError("Index missing. Run: python -m app.ingest")
+# FAISS + chunk store dimuat oleh preload(); versi baru dimuat di background dan ditukar atomik (/reload atau polling)
+SNAPSHOTS = SnapshotManager(STORAGE_DIR, _load_snapshot, keep=int(os.getenv("INDEX_KEEP_VERSIONS", "2")),
+                            legacy_version=_legacy_version, on_swap=_index_swapped)
 
-INDEX = faiss.read_index(str(INDEX_PATH))
-METADATA = load_metadata(META_PATH)
+# Cache: query embedding (LRU), hasil retrieval (dikosongkan saat versi index berubah), jawaban (opsional, TTL)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "0"))
+_QUERY_EMB = LRUCache(maxsize=int(os.getenv("QUERY_CACHE_SIZE", "1024")))
+_RETRIEVAL = VersionedCache(maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")))
+_ANSWERS = LRUCache(maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "1024")), ttl=ANSWER_CACHE_TTL) if ANSWER_CACHE_TTL > 0 else None
+# cache jawaban semantik (opsional): pertanyaan yang embedding-nya mirip (EMB) memakai jawaban pertanyaan lama
+_SEMANTIC = SemanticCache(int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")), float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+                          float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))) \
+    if os.getenv("SEMANTIC_CACHE", "false").lower() == "true" else None
 
 class AskRequest(BaseModel):
     question: str
+    filter: Optional[FilterOptions] = None  # scope: source / tipe file / halaman (ID-selector FAISS)
+
+class AskBatchRequest(BaseModel):
+    questions: List[str]
+    filter: Optional[FilterOptions] = None
+
+def _filter(req) -> Optional[SearchFilter]:
+    try:
+        return SearchFilter.resolve(**req.filter.model_dump()) if req.filter else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "5000"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
 
 app = FastAPI(title="RAG Chatbot API", version="1.0.0")
 
-def retrieve(query: str, top_k: int = TOP_K) -> List[Tuple[str, Dict]]:
-    q_emb = EMB.encode([query], normalize_embeddings=True).astype("float32")
-    D, I = INDEX.search(q_emb, top_k)
-    results = []
-
-    CHUNKS_PATH = STORAGE_DIR / "chunks.jsonl"
-    if not CHUNKS_PATH.exists():
-        raise RuntimeError("chunks.jsonl missing. Re-run ingest with latest code.")
-    # lazy read once
-    if not hasattr(retrieve, "_chunks"):
-        retrieve._chunks = [json.loads(line)["text"] for line in CHUNKS_PATH.read_text(encoding="utf-8").splitlines() if line.strip()]
-    chunks = retrieve._chunks
-
-    for idx in I[0]:
-        if idx < 0 or idx >= len(METADATA): continue
-        results.append((chunks[idx], METADATA[idx]))
+def preload():
+    """
+    Load embedder + index sekali. `python -m app.serve` memanggil ini di parent sebelum fork supaya worker
+    berbagi halaman model/index (copy-on-write); tanpa launcher dipanggil dari thread warm-up worker.
+    Tidak membuat thread/koneksi, jadi aman sebelum fork.
+    """
+    global EMB
+    if EMB is None:
+        with STARTUP.phase("embedder"):
+            EMB = embedder()
+    if SNAPSHOTS.active is None:
+        with STARTUP.phase("index"):
+            SNAPSHOTS.load_initial()
+
+def _warm_up():
+    try:
+        preload()  # no-op jika sudah di-preload parent
+    finally:
+        # thread polling dibuat per worker (thread tidak ikut fork); tetap jalan walau index belum ada,
+        # supaya versi pertama yang di-publish ingest dimuat tanpa restart
+        SNAPSHOTS.watch(float(os.getenv("INDEX_POLL_SECONDS", "10")))
+    with STARTUP.phase("warmup"):
+        # satu encode + search supaya request pertama tidak membayar init torch/faiss
+        q = EMB.encode(["warm up"], normalize_embeddings=True).astype("float32")
+        with SNAPSHOTS.acquire() as snap:
+            _lookup(snap, q, 1, None)
+
+@app.on_event("startup")
+def _startup():
+    # server langsung menerima koneksi (/health, /ready); load + warm-up jalan di background
+    warm_up_in_background(_warm_up)
+
+def _require_loaded():
+    if EMB is None or SNAPSHOTS.active is None:
+        raise HTTPException(status_code=503, detail=STARTUP.error or "warming_up: model/index belum dimuat (lihat GET /ready)")
+
+def _scope(snap, flt: Optional[SearchFilter]):
+    """ID-selector bitmap untuk filter (dari index id per source di chunk store), di-cache per snapshot."""
+    if flt is None:
+        return None
+    from .faiss_index import IdScope
+    scope = snap.scopes.get(flt)
+    if scope is None:
+        scope = IdScope(snap.index, snap.info, store_ids(snap.store, flt))
+        snap.scopes.set(flt, scope)
+    return scope
+
+def _search(snap, q_embs: np.ndarray, top_k: int, scope) -> np.ndarray:
+    # filter dipakai di dalam search FAISS (id di luar scope dilewati), bukan disaring setelah top-k
+    if scope is None:
+        return snap.index.search(q_embs, top_k)[1]
+    if not len(scope):
+        return np.full((len(q_embs), top_k), -1, dtype=np.int64)
+    return scope.search(snap.index, q_embs, top_k)[1]
+
+def _lookup(snap, q_embs: np.ndarray, top_k: int, flt: Optional[SearchFilter],
+            stats: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, Dict]]]:
+    """Top-k (text, metadata) per query dari snapshot: index tunggal, atau scatter-gather ke semua shard."""
+    if "shards" in snap.data:
+        return snap.shards.search(q_embs, top_k, flt, stats)
+    scope = _scope(snap, flt)
+    if scope is not None and stats is not None:
+        stats["filter_chunks"] = len(scope)
+    # hanya baris top-k yang dibaca dari chunk store
+    return [snap.store.get(row) for row in _search(snap, q_embs, top_k, scope)]
+
+def _query_embedding(query: str, cache_info: Dict[str, Any]) -> np.ndarray:
+    q_emb = _QUERY_EMB.get(query)
+    cache_info.setdefault("embedding", "hit" if q_emb is not None else "miss")
+    if q_emb is None:
+        q_emb = EMB.encode([query], normalize_embeddings=True).astype("float32")
+        _QUERY_EMB.set(query, q_emb)
+    return q_emb
+
+def retrieve(query: str, top_k: int = TOP_K, stats: Dict[str, Any] = None,
+             flt: Optional[SearchFilter] = None, snap=None) -> List[Tuple[str, Dict]]:
+    """`snap`: snapshot yang sudah dipegang pemanggil (/ask memakai versinya juga untuk key cache jawaban)."""
+    if snap is None:
+        # index & chunk store diambil dari satu snapshot yang dipegang sampai selesai (tidak tercampur saat swap)
+        with SNAPSHOTS.acquire() as snap:
+            return retrieve(query, top_k, stats, flt, snap)
+    stats = stats if stats is not None else {}
+    cache_info = stats.setdefault("cache", {})
+    timings = stats.setdefault("timings_ms", {})
+    stats["index_version"] = snap.version
+    stats["index_type"] = snap.info["type"]
+    # snapshot lama yang masih dipegang setelah swap tidak membaca/mengisi cache
+    cacheable = _RETRIEVAL.check_version(snap.version)
+    key = (normalize_question(query), top_k, flt)
+    cached = _RETRIEVAL.get(key) if cacheable else None
+    cache_info["retrieval"] = "hit" if cached is not None else ("miss" if cacheable else "bypass")
+    if cached is not None:
+        return list(cached)
+
+    with timed(timings, "embedding"):
+        q_emb = _query_embedding(query, cache_info)
+    with timed(timings, "vector_search"):
+        results = _lookup(snap, q_emb, top_k, flt, stats)[0]
+    if cacheable:
+        _RETRIEVAL.set(key, results)
     return results
 
-def generate_with_openai(prompt: str) -> str:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def retrieve_many(queries: List[str], top_k: int = TOP_K, stats: Dict[str, Any] = None,
+                  flt: Optional[SearchFilter] = None) -> List[List[Tuple[str, Dict]]]:
+    """Batch: satu EMB.encode untuk semua query yang belum di-cache, lalu satu INDEX.search dengan matriks query."""
+    stats = stats if stats is not None else {}
+    timings = stats.setdefault("timings_ms", {})
+    with SNAPSHOTS.acquire() as snap:
+        stats["index_version"] = snap.version
+        cacheable = _RETRIEVAL.check_version(snap.version)
+        keys = [(normalize_question(q), top_k, flt) for q in queries]
+        results = [_RETRIEVAL.get(k) if cacheable else None for k in keys]
+        todo = [i for i, r in enumerate(results) if r is None]
+        stats["retrieval_cache_hits"] = len(queries) - len(todo)
+        if todo:
+            with timed(timings, "embedding"):
+                embs = [_QUERY_EMB.get(queries[i]) for i in todo]
+                miss = [j for j, e in enumerate(embs) if e is None]
+                if miss:
+                    fresh = EMB.encode([queries[todo[j]] for j in miss], normalize_embeddings=True).astype("float32")
+                    for j, e in zip(miss, fresh):
+                        embs[j] = e[None, :]
+                        _QUERY_EMB.set(queries[todo[j]], embs[j])
+            with timed(timings, "vector_search"):
+                found = _lookup(snap, np.vstack(embs), top_k, flt, stats)
+                for i, hits in zip(todo, found):
+                    results[i] = hits
+                    if cacheable:
+                        _RETRIEVAL.set(keys[i], hits)
+    return [list(r) for r in results]
+
+# Client provider dibuat sekali per proses; koneksi HTTP keep-alive di-pool (app.core.clients)
+_OPENAI = None
+_OLLAMA = None
+
+def openai_client():
+    global _OPENAI
+    if _OPENAI is None:
+        from openai import AsyncOpenAI
+        from .core.clients import async_http
+        _OPENAI = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=async_http())
+    return _OPENAI
+
+def ollama_client():
+    global _OLLAMA
+    if _OLLAMA is None:
+        import ollama
+        _OLLAMA = ollama.AsyncClient()
+    return _OLLAMA
+
+@on_close
+def _reset_clients():
+    global _OPENAI, _OLLAMA
+    _OPENAI = _OLLAMA = None
+
+SYSTEM_MESSAGE = {"role":"system","content":"You are a concise RAG assistant."}
+
+async def generate_with_openai(prompt: str) -> str:
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    resp = client.chat.completions.create(
+    resp = await openai_client().chat.completions.create(
         model=model,
-        messages=[{"role":"system","content":"You are a concise RAG assistant."},
-                  {"role":"user","content":prompt}],
-        temperature=0.2
+        messages=[SYSTEM_MESSAGE, {"role":"user","content":prompt}],
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
     )
     return resp.choices[0].message.content.strip()
 
-def generate_with_ollama(prompt: str) -> str:
+async def generate_with_ollama(prompt: str) -> str:
     model = os.getenv("OLLAMA_MODEL", "llama3")
-    resp = ollama.chat(model=model, messages=[{"role":"system","content":"You are a concise RAG assistant."},
-                                              {"role":"user","content":prompt}])
+    resp = await ollama_client().chat(model=model, messages=[SYSTEM_MESSAGE, {"role":"user","content":prompt}],
+                                      options={"num_predict": MAX_TOKENS, "temperature": TEMPERATURE})
     return resp["message"]["content"].strip()
 
-@app.post("/ask")
-def ask(req: AskRequest):
-    question = req.question.strip()
-    if not question:
-        raise HTTPException(status_code=400, detail="Empty question")
+async def generate_with_fake(prompt: str) -> str:
+    from .core.fakes import FakeStreamingLLM
+    return await FakeStreamingLLM().ainvoke(prompt)
+
+async def stream_with_openai(prompt: str, usage: Dict[str, Any]) -> AsyncIterator[str]:
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    stream = await openai_client().chat.completions.create(
+        model=model,
+        messages=[SYSTEM_MESSAGE, {"role":"user","content":prompt}],
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+        if chunk.usage:
+            usage["prompt_tokens"] = chunk.usage.prompt_tokens
+            usage["completion_tokens"] = chunk.usage.completion_tokens
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
-    contexts = retrieve(question, TOP_K)
-    prompt = build_prompt(question, contexts)
+async def stream_with_ollama(prompt: str, usage: Dict[str, Any]) -> AsyncIterator[str]:
+    model = os.getenv("OLLAMA_MODEL", "llama3")
+    async for chunk in await ollama_client().chat(model=model, messages=[SYSTEM_MESSAGE, {"role":"user","content":prompt}],
+                                                 options={"num_predict": MAX_TOKENS, "temperature": TEMPERATURE}, stream=True):
+        if chunk.get("done"):
+            usage["prompt_tokens"] = chunk.get("prompt_eval_count")
+            usage["completion_tokens"] = chunk.get("eval_count")
+        text = chunk["message"]["content"]
+        if text:
+            yield text
 
-    started = time.time()
+async def stream_with_fake(prompt: str, usage: Dict[str, Any]) -> AsyncIterator[str]:
+    from .core.fakes import FakeStreamingLLM
+    async for text in FakeStreamingLLM().astream(prompt):
+        yield text
+
+async def generate(prompt: str) -> str:
     if PROVIDER == "ollama":
-        answer = generate_with_ollama(prompt)
-        model_name = os.getenv("OLLAMA_MODEL", "llama3")
-        retriever_name = "FAISS"
-    else:
-        answer = generate_with_openai(prompt)
-        model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        retriever_name = "FAISS"
+        return await generate_with_ollama(prompt)
+    if PROVIDER == "fake":
+        return await generate_with_fake(prompt)
+    return await generate_with_openai(prompt)
 
-    # Build sources
+def stream(prompt: str, usage: Dict[str, Any]) -> AsyncIterator[str]:
+    if PROVIDER == "ollama":
+        return stream_with_ollama(prompt, usage)
+    if PROVIDER == "fake":
+        return stream_with_fake(prompt, usage)
+    return stream_with_openai(prompt, usage)
+
+def _model_name() -> str:
+    if PROVIDER == "ollama":
+        return os.getenv("OLLAMA_MODEL", "llama3")
+    if PROVIDER == "fake":
+        return "fake"
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+def _sources(contexts: List[Tuple[str, Dict]]) -> List[str]:
     sources = []
     for _, md in contexts:
         src = md.get("source", "unknown")
         loc = md.get("location", "")
+        if md.get("page") is not None:
+            pages = f"page {md['page']}" if md.get("page_end") in (None, md["page"]) else f"pages {md['page']}–{md['page_end']}"
+            loc = f"{pages}, {loc}" if loc else pages
         if loc:
             sources.append(f"{src}: {loc}")
         else:
             sources.append(src)
+    return sources
+
+def _semantic_get(question: str, version: str, scope: tuple, stats: Dict[str, Any]):
+    """(contexts, answer) dari pertanyaan lama yang cukup mirip, atau None; kemiripannya dicatat di stats."""
+    hit = _SEMANTIC.get(_query_embedding(question, stats["cache"])[0], scope, version)
+    stats["cache"]["semantic"] = "hit" if hit is not None else "miss"
+    if hit is None:
+        return None
+    stats["semantic"] = {"similarity": round(hit.similarity, 4), "question": hit.question}
+    return hit.value
+
+def _semantic_set(question: str, version: str, scope: tuple, value: tuple):
+    _SEMANTIC.set(_query_embedding(question, {})[0], scope, value, question, version)
+
+@app.post("/ask")
+async def ask(req: AskRequest):
+    question = req.question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="Empty question")
+    _require_loaded()
+
+    started = time.time()
+    stats: Dict[str, Any] = {"cache": {}, "timings_ms": {}}
+    timings = stats["timings_ms"]
+    model_name = _model_name()
+    retriever_name = "FAISS"
+    flt = _filter(req)
+    semantic_scope = (TOP_K, TEMPERATURE, MAX_TOKENS, model_name, flt)
+
+    try:
+        # satu snapshot untuk key cache dan retrieval: jawaban tidak tersimpan di bawah versi yang tidak dipakai
+        with SNAPSHOTS.acquire() as snap:
+            stats.update(index_version=snap.version, index_type=snap.info["type"])
+            answer_key = (normalize_question(question), TOP_K, TEMPERATURE, MAX_TOKENS, model_name, snap.version, flt)
+            cached = _ANSWERS.get(answer_key) if _ANSWERS is not None else None
+            stats["cache"]["answer"] = "hit" if cached is not None else ("miss" if _ANSWERS is not None else "disabled")
+            if cached is None and _SEMANTIC is not None:
+                cached = await run_blocking(_semantic_get, question, snap.version, semantic_scope, stats)
+            if cached is not None:
+                contexts, answer = cached
+            else:
+                contexts = await run_blocking(retrieve, question, TOP_K, stats=stats, flt=flt, snap=snap)
+                with timed(timings, "prompt_build"):
+                    prompt = build_prompt(question, contexts, max_tokens=MAX_TOKENS, model=_model_name())
+                with timed(timings, "generation"):
+                    answer = await generate(prompt)
+                if _ANSWERS is not None:
+                    _ANSWERS.set(answer_key, (contexts, answer))
+                if _SEMANTIC is not None:
+                    await run_blocking(_semantic_set, question, snap.version, semantic_scope, (contexts, answer))
+    except Exception:
+        observe_request("/ask", time.time() - started, timings, stats["cache"], status="error")
+        raise
+    observe_request("/ask", time.time() - started, timings, stats["cache"])
+
+    # Build sources
+    sources = _sources(contexts)
 
     return {
         "question": question,
@@ -112,15 +416,160 @@ def ask(req: AskRequest):
             "retrieval_engine": retriever_name,
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
             "latency_ms": int((time.time() - started) * 1000),
+            "index_version": stats["index_version"],
+            "index_type": stats["index_type"],
+            "shards": stats.get("shards"),
+            "cache": stats["cache"],
+            "semantic_cache": stats.get("semantic"),
+            "timings_ms": timings,
         },
     }
 
+@app.post("/ask-batch")
+async def ask_batch(req: AskBatchRequest):
+    """NDJSON per pertanyaan sesuai urutan selesai (`index` = posisi di `questions`), ditutup baris `summary`."""
+    questions = [q.strip() for q in req.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Empty question")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"Too many questions (max {BATCH_MAX_QUESTIONS})")
+    _require_loaded()
+    flt = _filter(req)
+
+    async def lines():
+        started = time.time()
+        stats: Dict[str, Any] = {"timings_ms": {}}
+        timings = stats["timings_ms"]
+        model_name = _model_name()
+        sem = asyncio.Semaphore(max(1, BATCH_LLM_CONCURRENCY))
+        errors = 0
+
+        async def answer(i: int, question: str, contexts) -> Dict[str, Any]:
+            nonlocal errors
+            try:
+                prompt = build_prompt(question, contexts, max_tokens=MAX_TOKENS, model=_model_name())
+                async with sem:
+                    t_gen = time.perf_counter()
+                    text = await generate(prompt)
+                    gen_ms = round((time.perf_counter() - t_gen) * 1000, 2)
+                timings["generation"] = round(timings.get("generation", 0.0) + gen_ms, 2)
+                return {"index": i, "question": question, "context_sources": _sources(contexts), "answer": text,
+                        "metadata": {"model": model_name, "latency_ms": int((time.time() - started) * 1000),
+                                     "generation_ms": gen_ms, "index_version": stats.get("index_version")}}
+            except Exception as e:
+                errors += 1
+                return {"index": i, "question": question, "error": str(e)}
+
+        # retrieval semua pertanyaan sekaligus (satu encode + satu search matriks), LLM paralel terbatas
+        all_contexts = await run_blocking(retrieve_many, questions, TOP_K, stats=stats, flt=flt)
+        tasks = [asyncio.create_task(answer(i, q, ctx)) for i, (q, ctx) in enumerate(zip(questions, all_contexts))]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield json.dumps(await fut, ensure_ascii=False) + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+        observe_request("/ask-batch", time.time() - started, timings)
+        yield json.dumps({"summary": {"questions": len(questions), "errors": errors,
+                                      "latency_ms": int((time.time() - started) * 1000),
+                                      "retrieval_cache_hits": stats.get("retrieval_cache_hits", 0),
+                                      "index_version": stats.get("index_version"), "shards": stats.get("shards"),
+                                      "timings_ms": timings}}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """SSE: event `sources`, lalu `token` per potongan jawaban, ditutup `done` (ttft_ms, latency_ms, token counts)."""
+    question = req.question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="Empty question")
+    _require_loaded()
+    flt = _filter(req)
+
+    async def events():
+        started = time.time()
+        stats: Dict[str, Any] = {"cache": {}, "timings_ms": {}}
+        timings = stats["timings_ms"]
+        usage: Dict[str, Any] = {}
+        ttft_ms, n_chunks, prompt = None, 0, ""
+        try:
+            contexts = await run_blocking(retrieve, question, TOP_K, stats=stats, flt=flt)
+            yield _sse("sources", {"context_sources": _sources(contexts)})
+            with timed(timings, "prompt_build"):
+                prompt = build_prompt(question, contexts, max_tokens=MAX_TOKENS, model=_model_name())
+            t_gen = time.perf_counter()
+            async for text in stream(prompt, usage):
+                if ttft_ms is None:
+                    ttft_ms = int((time.time() - started) * 1000)
+                n_chunks += 1
+                yield _sse("token", {"text": text})
+            timings["generation"] = round((time.perf_counter() - t_gen) * 1000, 2)
+        except Exception as e:
+            observe_request("/ask/stream", time.time() - started, timings, stats["cache"], status="error")
+            yield _sse("error", {"detail": str(e)})
+            return
+        observe_request("/ask/stream", time.time() - started, timings, stats["cache"])
+        yield _sse("done", {"metadata": {
+            "model": _model_name(),
+            "retrieval_engine": "FAISS",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "ttft_ms": ttft_ms,
+            "latency_ms": int((time.time() - started) * 1000),
+            "prompt_tokens": usage.get("prompt_tokens") or len(prompt) // 4 + 1,
+            "completion_tokens": usage.get("completion_tokens") or n_chunks,
+            "index_version": stats.get("index_version"),
+            "shards": stats.get("shards"),
+            "cache": stats["cache"],
+            "timings_ms": timings,
+        }})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.on_event("shutdown")
+async def _close_clients():
+    from .core.clients import aclose
+    await aclose()
+
+@app.on_event("shutdown")
+def _close_shards():
+    # proses worker shard (SHARD_MODE=process) dihentikan bersama server
+    snap = SNAPSHOTS.active
+    if snap is not None and snap.data and "close" in snap.data:
+        snap.data["close"]()
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "provider": PROVIDER, "model": _model_name(), "index": SNAPSHOTS.status(),
+            "shards": _shard_status(), "startup": STARTUP.status(),
+            "semantic_cache": _SEMANTIC.stats() if _SEMANTIC is not None else None}
+
+def _shard_status() -> Optional[Dict[str, Any]]:
+    snap = SNAPSHOTS.active
+    data = snap.data if snap is not None else None
+    return data["shards"].status() if data and "shards" in data else None
+
+@app.get("/shards")
+def shards():
+    # jumlah shard, mode (thread/process/remote), replika + latency EWMA per shard; null jika index tidak ter-shard
+    return {"index_version": SNAPSHOTS.version, "shards": _shard_status()}
+
+@app.get("/ready")
+def ready():
+    # readiness probe: 200 hanya setelah model + index dimuat dan warm-up selesai (liveness tetap /health)
+    return JSONResponse(STARTUP.status(), status_code=200 if STARTUP.ready else 503)
+
 @app.post("/reload")
-def reload_index():
-    global INDEX, METADATA
-    INDEX = faiss.read_index(str(INDEX_PATH))
-    METADATA = load_metadata(META_PATH)
-    # drop cached chunks so they re-load
-    if hasattr(retrieve, "_chunks"):
-        delattr(retrieve, "_chunks")
-    return {"status": "ok", "message": "Index reloaded"}
+async def reload_index(wait: bool = False):
+    # versi baru dimuat di background; request yang sedang jalan tetap memakai snapshot lama sampai selesai
+    if wait:
+        return await run_blocking(SNAPSHOTS.reload, True)
+    return SNAPSHOTS.reload()
@@ -0,0 +1,470 @@
+"""
+Index FAISS ter-shard untuk korpus yang terlalu besar untuk satu proses.
+
+Layout (INDEX_SHARDS > 1 saat ingest):
+    storage/versions/<version>/shards.json               jumlah shard, cara partisi, ntotal + source per shard
+    storage/versions/<version>/shards/<NN>/              index.faiss, index_info.json, chunks/ milik shard itu
+
+Partisi (INDEX_SHARD_BY): "hash" = hash (source, teks chunk) → shard merata; "source" = satu dokumen utuh di
+satu shard, jadi pertanyaan yang di-scope ke source tertentu hanya menyentuh shard yang memuatnya.
+
+Server (app/server.py) meng-query shard paralel lalu menggabung top-k per shard dengan heap (SHARD_MODE):
+    thread    shard dimuat di proses server, search paralel di thread pool (FAISS melepas GIL)
+    process   tiap shard dimuat di SHARD_REPLICAS proses worker lokal; server hanya memegang manifest
+    remote    shard server terpisah di localhost; SHARD_URLS = replika per shard dipisah ",", shard dipisah ";"
+
+Shard server (satu per shard / replika, ikut hot-swap versi lewat storage/CURRENT):
+    python -m app.shards serve --shard 0 --port 8101
+"""
+import os, json, time, heapq, hashlib, argparse, threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .chunk_store import ChunkStore, ChunkStoreWriter
+from .core.metrics import SHARD_SECONDS
+from .rag.cache import LRUCache
+from .rag.filters import SearchFilter, store_ids
+
+SHARDS_FILE = "shards.json"
+SHARD_BY = ("hash", "source")
+SHARD_MODES = ("thread", "process", "remote")
+
+SHARD_MODE = os.getenv("SHARD_MODE", "thread").lower()
+SHARD_REPLICAS = int(os.getenv("SHARD_REPLICAS", "1"))  # proses worker per shard (SHARD_MODE=process)
+SHARD_URLS = os.getenv("SHARD_URLS", "")
+SHARD_TIMEOUT_S = float(os.getenv("SHARD_TIMEOUT_S", "10"))
+SHARD_RETRY_S = float(os.getenv("SHARD_RETRY_S", "5"))  # replika yang gagal dilewati selama ini
+FILTER_CACHE_SIZE = int(os.getenv("FILTER_CACHE_SIZE", "256"))
+
+# satu hit = (skor inner product, teks, metadata); list per query terurut skor menurun
+Hit = Tuple[float, str, Dict[str, Any]]
+
+def shard_dir(version_dir: Path, i: int) -> Path:
+    return Path(version_dir) / "shards" / f"{i:02d}"
+
+def shard_of(text: str, meta: Dict[str, Any], n: int, by: str = "hash") -> int:
+    """Shard tujuan chunk; blake2b (bukan hash() yang di-salt per proses) supaya stabil antar ingest."""
+    source = str(meta.get("source", ""))
+    key = source if by == "source" else f"{source}\x00{text}"
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") % n
+
+def is_sharded(version_dir: Path) -> bool:
+    return (Path(version_dir) / SHARDS_FILE).exists()
+
+# ---------- ingest ----------
+
+class ShardedWriter:
+    """
+    Chunk + embedding dibagi ke N shard saat streaming ingest (chunk store + file embedding per shard);
+    `finish()` membangun index FAISS tiap shard lalu menulis shards.json.
+    """
+
+    def __init__(self, version_dir: Path, n: int, by: str = "hash"):
+        if by not in SHARD_BY:
+            raise ValueError(f"Unsupported INDEX_SHARD_BY: {by}. Use one of {', '.join(SHARD_BY)}.")
+        self.version_dir = Path(version_dir)
+        self.n, self.by = n, by
+        self.rows = [0] * n
+        self.sources: List[set] = [set() for _ in range(n)]
+        self.dim: Optional[int] = None
+        self._stack = ExitStack()
+        self.stores: List[ChunkStoreWriter] = []
+        self.emb_files = []
+        for i in range(n):
+            d = shard_dir(self.version_dir, i)
+            d.mkdir(parents=True, exist_ok=True)
+            self.stores.append(self._stack.enter_context(ChunkStoreWriter(d / "chunks")))
+            self.emb_files.append(self._stack.enter_context(open(d / "embeddings.f32", "wb")))
+
+    def __enter__(self) -> "ShardedWriter":
+        return self
+
+    def __exit__(self, *exc):
+        return self._stack.__exit__(*exc)
+
+    def add(self, texts: Sequence[str], metas: Sequence[Dict[str, Any]], embs: np.ndarray):
+        self.dim = embs.shape[1]
+        for text, meta, emb in zip(texts, metas, embs):
+            s = shard_of(text, meta, self.n, self.by)
+            self.emb_files[s].write(emb.tobytes())
+            self.stores[s].add(text, meta)
+            self.rows[s] += 1
+            self.sources[s].add(str(meta.get("source", "")))
+
+    def finish(self) -> Dict[str, Any]:
+        """Dipanggil setelah writer ditutup: index per shard (shard kosong tidak punya index) + shards.json."""
+        from .faiss_index import build_index, save_index
+        shards, kind = [], None
+        for i, rows in enumerate(self.rows):
+            d = shard_dir(self.version_dir, i)
+            entry: Dict[str, Any] = {"shard": i, "path": str(d.relative_to(self.version_dir)), "ntotal": rows,
+                                     "sources": sorted(self.sources[i])}
+            if rows:
+                embs = np.memmap(d / "embeddings.f32", dtype="float32", mode="r", shape=(rows, self.dim))
+                index, info = build_index(embs)
+                del embs
+                save_index(index, info, d / "index.faiss")
+                kind = kind or info["type"]
+                entry.update(type=info["type"], build_seconds=info["build_seconds"])
+                print(f"Shard {i}: {info['factory']} index ({rows} vectors) in {info['build_seconds']}s")
+            (d / "embeddings.f32").unlink()
+            shards.append(entry)
+        manifest = {"count": self.n, "by": self.by, "index_type": kind, "dim": self.dim,
+                    "ntotal": sum(self.rows), "shards": shards}
+        (self.version_dir / SHARDS_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        return manifest
+
+# ---------- search satu shard ----------
+
+def load_shard(path: Path) -> Dict[str, Any]:
+    from .faiss_index import load_index
+    index, info = load_index(Path(path) / "index.faiss")
+    store = ChunkStore(Path(path) / "chunks")
+    store.ids_by("source")
+    return {"index": index, "info": info, "store": store, "scopes": LRUCache(maxsize=FILTER_CACHE_SIZE)}
+
+def search_shard(shard: Dict[str, Any], q_embs: np.ndarray, k: int,
+                 flt: Optional[SearchFilter] = None) -> Tuple[List[List[Hit]], Optional[int]]:
+    """Top-k satu shard per query + jumlah chunk dalam scope filter (None tanpa filter)."""
+    index, store = shard["index"], shard["store"]
+    q_embs = np.ascontiguousarray(q_embs, dtype="float32")
+    if flt is None:
+        D, I = index.search(q_embs, k)
+        n_scope = None
+    else:
+        from .faiss_index import IdScope
+        scope = shard["scopes"].get(flt)
+        if scope is None:
+            scope = IdScope(index, shard["info"], store_ids(store, flt))
+            shard["scopes"].set(flt, scope)
+        n_scope = len(scope)
+        if not n_scope:
+            return [[] for _ in q_embs], 0
+        D, I = scope.search(index, q_embs, k)
+    out = []
+    for drow, irow in zip(D, I):
+        keep = irow >= 0
+        out.append([(float(d), text, meta) for d, (text, meta) in zip(drow[keep], store.get(irow[keep]))])
+    return out, n_scope
+
+def merge_topk(per_shard: Sequence[List[Hit]], k: int) -> List[Hit]:
+    """Gabung list top-k per shard (masing-masing terurut menurun) lewat heap; berhenti setelah k hit."""
+    return list(islice(heapq.merge(*per_shard, key=lambda h: -h[0]), k))
+
+# ---------- backend ----------
+
+class _ThreadShards:
+    mode = "thread"
+
+    def __init__(self, paths: Dict[int, Path]):
+        self.shards = {i: load_shard(p) for i, p in paths.items()}
+
+    def search(self, i: int, q_embs: np.ndarray, k: int, flt: Optional[SearchFilter]):
+        hits, n_scope = search_shard(self.shards[i], q_embs, k, flt)
+        return hits, n_scope, "local"
+
+    def status(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self):
+        self.shards = {}
+
+_WORKER_SHARD: Optional[Dict[str, Any]] = None
+
+def _init_worker(path: str):
+    global _WORKER_SHARD
+    _WORKER_SHARD = load_shard(Path(path))
+    # server mati tanpa shutdown rapi (SIGKILL, crash) → worker ikut keluar, tidak jadi proses yatim
+    parent = os.getppid()
+
+    def orphan_watch():
+        while os.getppid() == parent:
+            time.sleep(1.0)
+        os._exit(0)
+    threading.Thread(target=orphan_watch, name="shard-orphan-watch", daemon=True).start()
+
+def _worker_search(q_embs: np.ndarray, k: int, flt: Optional[SearchFilter]):
+    hits, n_scope = search_shard(_WORKER_SHARD, q_embs, k, flt)
+    return hits, n_scope, os.getpid()
+
+class _ProcessShards:
+    """Satu ProcessPoolExecutor (spawn) per shard; replika = proses worker di pool itu, dipilih oleh pool."""
+    mode = "process"
+
+    def __init__(self, paths: Dict[int, Path], replicas: int = SHARD_REPLICAS):
+        self.paths = paths
+        self.replicas = max(1, replicas)
+        self._pools: Dict[int, ProcessPoolExecutor] = {}
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _pool(self, i: int) -> ProcessPoolExecutor:
+        # pool dibuat per proses (lazy): thread manajer executor tidak ikut fork launcher preload
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pools, self._pid = {}, os.getpid()
+            if i not in self._pools:
+                import multiprocessing
+                self._pools[i] = ProcessPoolExecutor(max_workers=self.replicas, mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_init_worker, initargs=(str(self.paths[i]),))
+            return self._pools[i]
+
+    def search(self, i: int, q_embs: np.ndarray, k: int, flt: Optional[SearchFilter]):
+        hits, n_scope, pid = self._pool(i).submit(_worker_search, q_embs, k, flt).result(timeout=SHARD_TIMEOUT_S)
+        return hits, n_scope, f"pid:{pid}"
+
+    def status(self) -> Dict[str, Any]:
+        return {"replicas_per_shard": self.replicas, "pools": sorted(self._pools) if self._pid == os.getpid() else []}
+
+    def close(self):
+        with self._lock:
+            pools = self._pools if self._pid == os.getpid() else {}
+            self._pools = {}
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+def parse_urls(spec: str) -> List[List[str]]:
+    """"http://a:8101,http://a:8111;http://a:8102" → [[replika shard 0...], [replika shard 1...]]."""
+    return [[u.strip().rstrip("/") for u in part.split(",") if u.strip()] for part in spec.split(";") if part.strip()]
+
+class _RemoteShards:
+    """
+    Shard server di localhost (python -m app.shards serve). Replika dipilih yang paling sedikit request
+    in-flight lalu latency EWMA terendah; replika yang error dilewati SHARD_RETRY_S detik (failover ke berikutnya).
+    """
+    mode = "remote"
+
+    def __init__(self, urls: List[List[str]], version: Optional[str] = None, client=None):
+        self.urls = urls
+        self.version = version
+        self.client = client
+        self._lock = threading.Lock()
+        self.inflight = {u: 0 for reps in urls for u in reps}
+        self.ewma_ms = {u: 0.0 for u in self.inflight}
+        self.down_until = {u: 0.0 for u in self.inflight}
+        self.errors = {u: 0 for u in self.inflight}
+
+    def _http(self):
+        if self.client is None:
+            from .core.clients import sync_http
+            return sync_http()
+        return self.client
+
+    def _order(self, i: int) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.urls[i], key=lambda u: (self.down_until[u] > now, self.inflight[u], self.ewma_ms[u]))
+
+    def search(self, i: int, q_embs: np.ndarray, k: int, flt: Optional[SearchFilter]):
+        import httpx
+        body = {"queries": np.asarray(q_embs, dtype="float32").tolist(), "k": k,
+                "filter": flt._asdict() if flt is not None else None}
+        last: Optional[Exception] = None
+        for url in self._order(i):
+            with self._lock:
+                self.inflight[url] += 1
+            t0 = time.perf_counter()
+            try:
+                r = self._http().post(f"{url}/search", json=body, timeout=SHARD_TIMEOUT_S)
+                r.raise_for_status()
+                data = r.json()
+            except httpx.HTTPError as e:
+                last = e
+                with self._lock:
+                    self.errors[url] += 1
+                    self.down_until[url] = time.monotonic() + SHARD_RETRY_S
+                continue
+            finally:
+                with self._lock:
+                    self.inflight[url] -= 1
+            ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self.ewma_ms[url] = ms if not self.ewma_ms[url] else 0.8 * self.ewma_ms[url] + 0.2 * ms
+            if self.version and data.get("version") != self.version:
+                # shard server belum/sudah pindah versi: hasil tetap dipakai, tapi terlihat di stats
+                url = f"{url} (version {data.get('version')})"
+            hits = [[(float(s), t, m) for s, t, m in row] for row in data["hits"]]
+            return hits, data.get("filter_chunks"), url
+        raise RuntimeError(f"shard {i}: all replicas failed ({', '.join(self.urls[i])}): {last}")
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {"replicas": [[{"url": u, "inflight": self.inflight[u], "ewma_ms": round(self.ewma_ms[u], 2),
+                                   "errors": self.errors[u], "down": self.down_until[u] > now} for u in reps]
+                                 for reps in self.urls]}
+
+    def close(self):
+        pass
+
+class ShardSet:
+    """Coordinator satu versi ter-shard: scatter query ke shard yang relevan, gather top-k lewat heap."""
+
+    def __init__(self, version_dir: Path, mode: Optional[str] = None, urls: Optional[List[List[str]]] = None,
+                 replicas: Optional[int] = None, client=None):
+        self.path = Path(version_dir)
+        self.manifest = json.loads((self.path / SHARDS_FILE).read_text(encoding="utf-8"))
+        self.count = self.manifest["count"]
+        self.by = self.manifest["by"]
+        self.sources = [set(s["sources"]) for s in self.manifest["shards"]]
+        self.live = [s["shard"] for s in self.manifest["shards"] if s["ntotal"]]
+        self.info = {"type": self.manifest.get("index_type") or "flat", "shards": self.count, "by": self.by,
+                     "ntotal": self.manifest["ntotal"]}
+        mode = (mode or SHARD_MODE).lower()
+        paths = {i: shard_dir(self.path, i) for i in self.live}
+        if mode == "thread":
+            self.backend = _ThreadShards(paths)
+        elif mode == "process":
+            self.backend = _ProcessShards(paths, SHARD_REPLICAS if replicas is None else replicas)
+        elif mode == "remote":
+            urls = urls if urls is not None else parse_urls(SHARD_URLS)
+            if len(urls) != self.count:
+                raise RuntimeError(f"SHARD_URLS lists {len(urls)} shards but index {self.path.name} has {self.count}")
+            self.backend = _RemoteShards(urls, self.path.name, client)
+        else:
+            raise ValueError(f"Unsupported SHARD_MODE: {mode}. Use one of {', '.join(SHARD_MODES)}.")
+        self.mode = mode
+        self.latency_ms = {i: 0.0 for i in self.live}  # EWMA per shard (panggilan pertama = cold start)
+        self.last_ms = {i: 0.0 for i in self.live}
+        self.calls = {i: 0 for i in self.live}
+        self._fanout: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._fanout is None or self._pid != os.getpid():
+                self._fanout = ThreadPoolExecutor(max_workers=max(1, len(self.live)), thread_name_prefix="shard-fanout")
+                self._pid = os.getpid()
+            return self._fanout
+
+    def targets(self, flt: Optional[SearchFilter]) -> List[int]:
+        """Shard yang perlu di-query: shard kosong dilewati, begitu juga shard tanpa source yang lolos filter."""
+        if flt is None or not flt.scopes_sources:
+            return list(self.live)
+        return [i for i in self.live if any(flt.allows_source(s) for s in self.sources[i])]
+
+    def _search_one(self, i: int, q_embs: np.ndarray, k: int, flt: Optional[SearchFilter]):
+        t0 = time.perf_counter()
+        hits, n_scope, replica = self.backend.search(i, q_embs, k, flt)
+        ms = (time.perf_counter() - t0) * 1000
+        SHARD_SECONDS.observe(ms / 1000, str(i), self.mode)
+        with self._lock:
+            self.calls[i] += 1
+            self.last_ms[i] = ms
+            self.latency_ms[i] = ms if self.calls[i] == 1 else 0.8 * self.latency_ms[i] + 0.2 * ms
+        return hits, n_scope, replica, ms
+
+    def search(self, q_embs: np.ndarray, k: int, flt: Optional[SearchFilter] = None,
+               stats: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, Dict[str, Any]]]]:
+        """(text, metadata) top-k gabungan per query; stats["shards"] = shard yang di-query, replika, latency."""
+        targets = self.targets(flt)
+        pool = self._pool()
+        futures = {i: pool.submit(self._search_one, i, q_embs, k, flt) for i in targets}
+        per_shard, results, in_scope = [], {}, 0
+        for i, fut in futures.items():
+            hits, n_scope, replica, ms = fut.result()
+            results[i] = hits
+            in_scope += n_scope or 0
+            per_shard.append({"shard": i, "replica": replica, "ms": round(ms, 2), "hits": sum(len(h) for h in hits)})
+        merged = [[(t, m) for _, t, m in merge_topk([results[i][qi] for i in targets], k)] for qi in range(len(q_embs))]
+        if stats is not None:
+            stats["shards"] = {"count": self.count, "queried": len(targets), "mode": self.mode, "per_shard": per_shard}
+            if flt is not None:
+                stats["filter_chunks"] = in_scope
+        return merged
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            latency = {str(i): round(v, 2) for i, v in self.latency_ms.items()}
+            last = {str(i): round(v, 2) for i, v in self.last_ms.items()}
+            calls = {str(i): n for i, n in self.calls.items()}
+        return {"count": self.count, "by": self.by, "mode": self.mode, "live": self.live,
+                "ntotal": [s["ntotal"] for s in self.manifest["shards"]], "ewma_ms": latency, "last_ms": last,
+                "calls": calls, **self.backend.status()}
+
+    def close(self):
+        self.backend.close()
+        if self._fanout is not None and self._pid == os.getpid():
+            self._fanout.shutdown(wait=False)
+
+# ---------- shard server ----------
+
+def create_app(shard: int, storage_dir: Path, poll_s: float = 0.0):
+    """FastAPI satu shard: POST /search (query embedding → top-k hit), GET /health. Versi ikut storage/CURRENT."""
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+    from .core.concurrency import run_blocking
+    from .core.schema import FilterOptions
+    from .snapshots import SnapshotManager
+
+    def loader(version_dir: Path) -> Dict[str, Any]:
+        if not is_sharded(version_dir):
+            raise RuntimeError(f"{version_dir.name} is not sharded (ingest with INDEX_SHARDS > 1)")
+        manifest = json.loads((version_dir / SHARDS_FILE).read_text(encoding="utf-8"))
+        if shard >= manifest["count"]:
+            raise RuntimeError(f"{version_dir.name} has {manifest['count']} shards, no shard {shard}")
+        # shard kosong: tidak ada index, search selalu kosong
+        data = load_shard(shard_dir(version_dir, shard)) if manifest["shards"][shard]["ntotal"] else {}
+        return {**data, "ntotal": manifest["shards"][shard]["ntotal"]}
+
+    snapshots = SnapshotManager(storage_dir, loader)
+    snapshots.load_initial()
+    app = FastAPI(title=f"RAG shard {shard}")
+
+    class SearchRequest(BaseModel):
+        queries: List[List[float]]
+        k: int = 5
+        filter: Optional[FilterOptions] = None
+
+    def search(req: SearchRequest) -> Dict[str, Any]:
+        flt = SearchFilter.resolve(**req.filter.model_dump()) if req.filter else None
+        q = np.asarray(req.queries, dtype="float32")
+        with snapshots.acquire() as snap:
+            if not snap.ntotal:
+                return {"shard": shard, "version": snap.version, "hits": [[] for _ in req.queries],
+                        "filter_chunks": 0 if flt else None}
+            hits, n_scope = search_shard(snap.data, q, req.k, flt)
+            return {"shard": shard, "version": snap.version, "hits": hits, "filter_chunks": n_scope}
+
+    @app.post("/search")
+    async def search_endpoint(req: SearchRequest):
+        try:
+            return await run_blocking(search, req)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @app.get("/health")
+    def health():
+        snap = snapshots.active
+        return {"status": "ok", "shard": shard, "pid": os.getpid(), "ntotal": snap.ntotal if snap else None,
+                "index": snapshots.status()}
+
+    @app.on_event("startup")
+    def _watch():
+        snapshots.watch(poll_s)
+
+    return app
+
+def main():
+    ap = argparse.ArgumentParser(description="FAISS shard tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("serve", help="jalankan shard server untuk SHARD_MODE=remote")
+    sp.add_argument("--shard", type=int, required=True)
+    sp.add_argument("--host", default="127.0.0.1")
+    sp.add_argument("--port", type=int, required=True)
+    sp.add_argument("--storage", default=str(Path(__file__).resolve().parents[1] / "storage"))
+    sp.add_argument("--log-level", default="warning")
+    args = ap.parse_args()
+    if args.cmd == "serve":
+        import uvicorn
+        app = create_app(args.shard, Path(args.storage), float(os.getenv("INDEX_POLL_SECONDS", "10")))
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+
+if __name__ == "__main__":
+    main()
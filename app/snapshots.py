@@ -0,0 +1,226 @@
+"""
+Snapshot index FAISS berversi untuk hot-swap tanpa downtime.
+
+Layout:
+    storage/versions/<version>/   index.faiss, index_info.json, chunks/
+    storage/CURRENT               nama versi aktif (ditulis atomik via os.replace)
+
+Ingest menulis ke `<version>.tmp`, rename ke `<version>`, lalu memindah CURRENT.
+Server memuat versi baru di thread background lalu menukarnya di bawah lock; request yang sedang
+berjalan tetap memegang snapshot lama (reference count) sampai selesai, baru setelah itu snapshot lama
+dilepas dan direktori versi lama di-GC.
+"""
+import os, time, shutil, threading, uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from app.core.logger import logger
+
+VERSIONS = "versions"
+CURRENT = "CURRENT"
+
+def versions_dir(root: Path) -> Path:
+    return Path(root) / VERSIONS
+
+def new_version_dir(root: Path) -> Path:
+    """Direktori kerja untuk versi baru (belum terlihat server sampai publish)."""
+    version = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    path = versions_dir(root) / f"{version}.tmp"
+    path.mkdir(parents=True)
+    return path
+
+def publish(root: Path, tmp_dir: Path) -> str:
+    """Rename `<version>.tmp` → `<version>` lalu pindahkan CURRENT secara atomik."""
+    final = tmp_dir.with_name(tmp_dir.name[: -len(".tmp")])
+    os.replace(tmp_dir, final)
+    cur = Path(root) / CURRENT
+    tmp = cur.with_name(f"{CURRENT}.{os.getpid()}.tmp")
+    tmp.write_text(final.name, encoding="utf-8")
+    os.replace(tmp, cur)
+    return final.name
+
+def current_version(root: Path) -> Optional[str]:
+    cur = Path(root) / CURRENT
+    if not cur.exists():
+        return None
+    version = cur.read_text(encoding="utf-8").strip()
+    return version if (versions_dir(root) / version).is_dir() else None
+
+def gc_versions(root: Path, keep: int = 2, in_use: Set[str] = frozenset(), tmp_max_age_s: float = 3600):
+    """Hapus versi lama: simpan CURRENT, versi yang masih dipakai, dan `keep` versi terbaru."""
+    vdir = versions_dir(root)
+    if not vdir.exists():
+        return []
+    protected = set(in_use) | {current_version(root)}
+    done = sorted(p for p in vdir.iterdir() if p.is_dir() and not p.name.endswith(".tmp"))
+    protected |= {p.name for p in done[-keep:]} if keep > 0 else set()
+    removed = []
+    for p in done:
+        if p.name not in protected:
+            # di Windows file yang masih di-mmap proses lain gagal dihapus → dicoba lagi di GC berikutnya
+            shutil.rmtree(p, ignore_errors=True)
+            if not p.exists():
+                removed.append(p.name)
+    now = time.time()
+    for p in vdir.glob("*.tmp"):
+        if now - p.stat().st_mtime > tmp_max_age_s:  # sisa ingest yang crash
+            shutil.rmtree(p, ignore_errors=True)
+    return removed
+
+class Snapshot:
+    """Satu versi index yang sudah dimuat; `data` dilepas setelah di-retire dan pembaca terakhir selesai."""
+
+    def __init__(self, version: str, path: Path, data: Dict[str, Any]):
+        self.version = version
+        self.path = path
+        self.data = data
+        self.refs = 0
+        self.retired = False
+        self.loaded_at = time.time()
+
+    def __getattr__(self, name):
+        data = self.__dict__.get("data")
+        if data is not None and name in data:
+            return data[name]
+        raise AttributeError(name)
+
+class SnapshotManager:
+    """
+    Pegang snapshot aktif; `acquire()` memberi handle ber-refcount untuk satu request.
+    `loader(path) -> dict` membangun isi snapshot (mis. index FAISS + chunk store).
+    `on_swap(snapshot)` dipanggil setelah reload berhasil (mis. server yang start tanpa index jadi ready).
+    """
+
+    def __init__(self, root: Path, loader: Callable[[Path], Dict[str, Any]], keep: int = 2,
+                 legacy_version: Optional[Callable[[], str]] = None,
+                 on_swap: Optional[Callable[[Snapshot], None]] = None):
+        self.root = Path(root)
+        self.loader = loader
+        self.keep = keep
+        self.legacy_version = legacy_version
+        self.on_swap = on_swap
+        self.active: Optional[Snapshot] = None
+        self.loading: Optional[str] = None
+        self._retired: List[Snapshot] = []  # sudah diganti tapi masih dipegang request (refs > 0)
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def _target(self):
+        version = current_version(self.root)
+        if version is not None:
+            return version, versions_dir(self.root) / version
+        if self.legacy_version is not None:
+            # layout lama: index.faiss + chunks langsung di storage/
+            return self.legacy_version(), self.root
+        return None, None
+
+    def load_initial(self) -> Snapshot:
+        version, path = self._target()
+        if version is None:
+            raise RuntimeError("Index missing. Run: python -m app.ingest")
+        self.active = Snapshot(version, path, self.loader(path))
+        return self.active
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.active.version if self.active else None
+
+    @contextmanager
+    def acquire(self) -> Iterator[Snapshot]:
+        with self._lock:
+            snap = self.active
+            snap.refs += 1
+        try:
+            yield snap
+        finally:
+            self._release(snap)
+
+    def _release(self, snap: Snapshot):
+        with self._lock:
+            snap.refs -= 1
+            free = snap.retired and snap.refs == 0
+        if free:
+            self._free(snap)
+
+    def _free(self, snap: Snapshot):
+        data, snap.data = snap.data, None
+        # resource di luar memori (mis. proses worker shard) dilepas lewat data["close"]
+        close = (data or {}).get("close")
+        if close is not None:
+            close()
+        with self._lock:
+            if snap in self._retired:
+                self._retired.remove(snap)
+            # versi yang masih dibaca request lain (chunk store ter-memmap) tidak boleh dihapus
+            in_use = {self.version, self.loading} | {s.version for s in self._retired if s.refs > 0}
+        if snap.path != self.root:
+            gc_versions(self.root, self.keep, in_use=in_use - {None})
+
+    def _swap(self, snap: Snapshot):
+        with self._lock:
+            old, self.active = self.active, snap
+            if old is None:  # load_initial gagal (server start tanpa index): tidak ada snapshot yang di-retire
+                return
+            old.retired = True
+            free = old.refs == 0
+            if not free:
+                self._retired.append(old)
+        if free:
+            self._free(old)
+
+    def _load(self, version: str, path: Path):
+        try:
+            t0 = time.perf_counter()
+            snap = Snapshot(version, path, self.loader(path))
+            self._swap(snap)
+            self.last_error = None
+            logger.info(f"[snapshot] swapped to {version} (load {time.perf_counter() - t0:.2f}s)")
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            logger.error(f"[snapshot] failed to load {version}: {e}")
+            return
+        finally:
+            with self._lock:
+                self.loading = None
+        if self.on_swap is not None:
+            try:
+                self.on_swap(snap)
+            except Exception as e:
+                logger.error(f"[snapshot] on_swap hook failed for {version}: {e}")
+
+    def reload(self, wait: bool = False) -> Dict[str, Any]:
+        """Mulai memuat versi CURRENT di background jika berbeda dari versi aktif."""
+        version, path = self._target()
+        with self._lock:
+            if version is None or version == self.version:
+                return {"status": "unchanged", "version": self.version}
+            if self.loading is not None:
+                return {"status": "loading", "version": self.version, "loading": self.loading}
+            self.loading = version
+        t = threading.Thread(target=self._load, args=(version, path), name="snapshot-load", daemon=True)
+        t.start()
+        if wait:
+            t.join()
+            return {"status": "ok" if self.version == version else "error", "version": self.version, "error": self.last_error}
+        return {"status": "loading", "version": self.version, "loading": version}
+
+    def watch(self, interval_s: float):
+        """Poll CURRENT tiap `interval_s` detik dan reload otomatis (0 = nonaktif)."""
+        if interval_s <= 0 or self._watcher is not None:
+            return
+        def loop():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"[snapshot] watch error: {e}")
+        self._watcher = threading.Thread(target=loop, name="snapshot-watch", daemon=True)
+        self._watcher.start()
+
+    def status(self) -> Dict[str, Any]:
+        snap = self.active
+        return {"version": snap.version if snap else None, "loading": self.loading,
+                "loaded_at": snap.loaded_at if snap else None, "in_flight": snap.refs if snap else 0,
+                "last_error": self.last_error}
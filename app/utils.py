@@ -1,20 +1,21 @@
 import os, json, re
-from typing import List, Tuple, Dict
+from typing import Iterator, List, Tuple, Dict, Optional
 from pathlib import Path
 
-from sentence_transformers import SentenceTransformer
-from pypdf import PdfReader
-from markdown import markdown
-from bs4 import BeautifulSoup
-from PIL import Image
+# sentence_transformers / pypdf / markdown / PIL diimport saat dipakai: server.py hanya butuh build_prompt +
+# embedder, jadi import modul ini tidak ikut memuat torch dan parser dokumen
 
 # OCR optional
 ENABLE_OCR = os.getenv("ENABLE_OCR", "true").lower() == "true"
-try:
-    import pytesseract  # requires system Tesseract
-except Exception:
-    pytesseract = None
-    ENABLE_OCR = False
+
+def _tesseract():
+    if not ENABLE_OCR:
+        return None
+    try:
+        import pytesseract  # requires system Tesseract
+    except Exception:
+        return None
+    return pytesseract
 
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 120
@@ -25,41 +26,54 @@ def clean_text(t: str) -> str:
     t = re.sub(r"\n{3,}", "\n\n", t)
     return t.strip()
 
+def chunk_spans(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP, unit: Optional[str] = None,
+                tokenizer=None):
+    # chunker bersama dengan stack Chroma: potong di batas paragraf/baris/kalimat, simpan offset + rentang baris;
+    # `tokenizer` = tokenizer embedder (dipakai jika CHUNK_UNIT=tokens)
+    from app.ingest.chunker import split_text
+    return split_text(text, size, overlap, unit=unit, tokenizer=tokenizer)
+
+def chunk_pages(pages, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP, unit: Optional[str] = None,
+                tokenizer=None):
+    # (nomor halaman, teks) → chunk yang boleh melewati batas halaman (page/page_end), streaming
+    from app.ingest.chunker import split_pages
+    return split_pages(pages, size, overlap, unit=unit, tokenizer=tokenizer)
+
 def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
-    text = clean_text(text)
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(start + size, len(text))
-        chunks.append(text[start:end])
-        if end == len(text): break
-        start = end - overlap
-    return [c for c in chunks if c.strip()]
+    return [t for t in (clean_text(c.text) for c in chunk_spans(text, size, overlap)) if t.strip()]
 
 def load_txt(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="ignore")
 
 def load_md(path: Path) -> str:
+    from markdown import markdown
+    from bs4 import BeautifulSoup
     raw = path.read_text(encoding="utf-8", errors="ignore")
     html = markdown(raw)
     soup = BeautifulSoup(html, "html.parser")
     return soup.get_text("\n")
 
-def load_pdf(path: Path) -> str:
+def iter_pdf_pages(path: Path) -> Iterator[Tuple[int, str]]:
+    # (nomor halaman 1-based, teks) satu per satu; halaman sebelumnya tidak ditahan di memori
+    from pypdf import PdfReader
     reader = PdfReader(str(path))
-    out = []
-    for page in reader.pages:
-        out.append(page.extract_text() or "")
-    return "\n".join(out)
+    for i, page in enumerate(reader.pages, 1):
+        yield i, page.extract_text() or ""
+
+def load_pdf(path: Path) -> str:
+    return "\n".join(text for _, text in iter_pdf_pages(path))
 
 def load_png(path: Path) -> str:
-    if not ENABLE_OCR or pytesseract is None:
+    pytesseract = _tesseract()
+    if pytesseract is None:
         return ""
+    from PIL import Image
     img = Image.open(str(path))
     text = pytesseract.image_to_string(img, lang="eng")
     return text or ""
 
 def load_document(path: Path) -> str:
+    path = Path(path)
     suffix = path.suffix.lower()
     if suffix in [".txt"]:
         return load_txt(path)
@@ -71,9 +85,35 @@ def load_document(path: Path) -> str:
         return load_png(path)
     return ""
 
-def embedder(model_name: str = "all-MiniLM-L6-v2") -> SentenceTransformer:
-    # local, no key required
-    return SentenceTransformer(model_name)
+def load_documents(paths: List[Path], workers: Optional[int] = None, errors: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    load_document paralel (process pool yang sama dengan loader Chroma); urutan sesuai input.
+    File gagal → "" di posisinya dan dicatat ke `errors` ({filename: pesan}); tanpa `errors` → LoadError.
+    """
+    from app.ingest.parallel import map_files, LoadError
+    results = map_files(load_document, [str(p) for p in paths], workers)
+    failed = {Path(r.path).name: r.error for r in results if r.error}
+    if failed and errors is None:
+        raise LoadError(failed)
+    if errors is not None:
+        errors.update(failed)
+    return [r.value or "" for r in results]
+
+def embedder(model_name: str = "all-MiniLM-L6-v2"):
+    # local, no key required; dibungkus cache on-disk yang sama dengan stack Chroma.
+    # EMBED_BACKEND=onnx: graph ONNX (int8) tanpa torch; key cache beda karena vektornya tidak identik
+    from app.core.config import settings
+    if settings.EMBED_BACKEND == "onnx":
+        from app.onnx_models import OnnxEmbedder
+        model = OnnxEmbedder.load(model_name)
+        key = f"onnx-{'int8' if model.quantized else 'fp32'}:{model_name}"
+    else:
+        from sentence_transformers import SentenceTransformer
+        model, key = SentenceTransformer(model_name), f"st:{model_name}"
+    if settings.EMBED_CACHE:
+        from app.core.embedding_cache import CachedSentenceTransformer
+        return CachedSentenceTransformer(model, key)
+    return model
 
 def save_metadata(meta_path: Path, meta: List[Dict]):
     meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -83,13 +123,7 @@ def load_metadata(meta_path: Path) -> List[Dict]:
         return json.loads(meta_path.read_text(encoding="utf-8"))
     return []
 
-def build_prompt(question: str, contexts: List[Tuple[str, Dict]]) -> str:
-    # contexts: list of (chunk_text, metadata_dict)
-    joined = ""
-    for i, (ct, md) in enumerate(contexts, 1):
-        src = md.get("source", "unknown")
-        loc = md.get("location", "")
-        joined += f"[{i}] Source: {src} {loc}\n{ct}\n\n"
+def _prompt(question: str, joined: str) -> str:
     return (
         "You are a helpful RAG assistant. Answer concisely using ONLY the context.\n"
         "If the answer isn't present, say you don't know.\n\n"
@@ -97,3 +131,16 @@ def build_prompt(question: str, contexts: List[Tuple[str, Dict]]) -> str:
         f"User question: {question}\n"
         "Answer:"
     )
+
+def _header(i: int, md: Dict) -> str:
+    return f"[{i}] Source: {md.get('source', 'unknown')} {md.get('location', '')}\n"
+
+def build_prompt(question: str, contexts: List[Tuple[str, Dict]], max_tokens: int = 512, model: Optional[str] = None) -> str:
+    # contexts: list of (chunk_text, metadata_dict), terurut menurut relevansi.
+    # Chunk bersambung dari file yang sama digabung (overlap dibuang), lalu diisi sampai budget token model.
+    from app.rag.packing import pack_context, context_budget, count_tokens
+    model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    items = [(ct, md, -float(i)) for i, (ct, md) in enumerate(contexts)]
+    budget = context_budget(model, max_tokens, reserved=count_tokens(_prompt(question, ""), model))
+    packed = pack_context(items, budget, model, label=lambda md: _header(len(contexts), md) + "\n\n")
+    return _prompt(question, "".join(f"{_header(i, md)}{ct}\n\n" for i, (ct, md) in enumerate(packed, 1)))
@@ -6,14 +6,26 @@ import chromadb
 from chromadb.config import Settings
 
 def _embedding_fn():
-    if settings.PROVIDER == "openai":
+    emb = _base_embedding_fn()
+    if settings.EMBED_CACHE:
+        from app.core.embedding_cache import CachedEmbeddings
+        return CachedEmbeddings(emb, f"{settings.EMBEDDINGS_PROVIDER}:{settings.EMBEDDING_MODEL}")
+    return emb
+
+def _base_embedding_fn():
+    provider = settings.EMBEDDINGS_PROVIDER
+    if provider == "openai":
         from langchain_openai import OpenAIEmbeddings
-        return OpenAIEmbeddings(model=settings.EMBEDDING_MODEL)
-    elif settings.PROVIDER == "gemini":
+        from app.core.clients import sync_http, async_http
+        return OpenAIEmbeddings(model=settings.EMBEDDING_MODEL, http_client=sync_http(), http_async_client=async_http())
+    elif provider == "gemini":
         from langchain_google_genai import GoogleGenerativeAIEmbeddings
         return GoogleGenerativeAIEmbeddings(model=settings.EMBEDDING_MODEL)
+    elif provider == "fake":
+        from app.core.fakes import FakeEmbeddings
+        return FakeEmbeddings()
     else:
-        raise ValueError(f"Unsupported provider: {settings.PROVIDER}")
+        raise ValueError(f"Unsupported provider: {provider}")
 
 def _collection_name() -> str:
     m = re.sub(r"[^a-zA-Z0-9_]+", "_", settings.EMBEDDING_MODEL)
@@ -0,0 +1,13 @@
+import os, sys, tempfile
+
+# provider lokal tanpa API key; direktori data/index sementara supaya tidak menyentuh ./data dan ./index
+_TMP = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "PROVIDER": "fake",
+    "EMBEDDINGS_PROVIDER": "fake",
+    "DATA_DIR": os.path.join(_TMP, "data"),
+    "PERSIST_DIR": os.path.join(_TMP, "index"),
+    "EMBED_CACHE": "false",
+    "RERANK_WARMUP": "false",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
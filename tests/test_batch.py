@@ -0,0 +1,67 @@
+import json, os
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.fakes import FakeCrossEncoder
+
+QUESTIONS = ["capital of Peru?", "What is Machu Picchu?", "Where is Lake Titicaca?"]
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    from app.api import main
+    from app.ingest.indexer import build_index_from_dir
+    from app.rag.reranker import get_reranker
+    root = tmp_path_factory.mktemp("batch")
+    with pytest.MonkeyPatch.context() as mp:
+        # data dir + koleksi sendiri: index yang dipakai test lain tidak ikut berubah
+        mp.setattr(settings, "DATA_DIR", str(root / "data"))
+        mp.setattr(settings, "PERSIST_DIR", str(root / "index"))
+        mp.setattr(settings, "EMBEDDING_MODEL", "batch-test")
+        mp.setattr(main, "_VS", None)
+        os.makedirs(settings.DATA_DIR)
+        with open(os.path.join(settings.DATA_DIR, "peru.txt"), "w", encoding="utf-8") as f:
+            f.write("Lima is the capital of Peru. Machu Picchu is an Inca citadel. Lake Titicaca borders Peru and Bolivia.")
+        build_index_from_dir()
+        get_reranker()._model = FakeCrossEncoder()
+        with TestClient(main.app) as c:
+            yield c
+
+@pytest.fixture(autouse=True)
+def no_answer_cache(monkeypatch):
+    from app.api import main
+    monkeypatch.setattr(main, "_ANSWERS", None)
+
+def _lines(client):
+    r = client.post("/ask-batch", json={"questions": QUESTIONS})
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    return sorted(lines[:-1], key=lambda x: x["index"]), lines[-1]["summary"]
+
+def test_batch_answers_every_question(client):
+    lines, summary = _lines(client)
+    assert [x["index"] for x in lines] == [0, 1, 2] and all(x["answer"] for x in lines)
+    assert summary["questions"] == 3 and summary["errors"] == 0
+
+def test_short_retrieval_result_is_reported_instead_of_hanging(client, monkeypatch):
+    from app.api import main
+    real = main.retrieve_many
+    monkeypatch.setattr(main, "retrieve_many", lambda vs, qs, **kw: real(vs, qs, **kw)[:-1])
+    lines, summary = _lines(client)
+    assert [x["index"] for x in lines] == [0, 1, 2]
+    assert all("retrieve_many returned 2 results for 3 questions" in x["error"] for x in lines)
+    assert summary["errors"] == 3
+
+def test_producer_failure_outside_the_block_try_ends_the_stream(client, monkeypatch):
+    from app.api import main
+    real = main.normalize_question
+
+    def flaky(q):
+        if q == QUESTIONS[2]:
+            raise ValueError("cannot normalize")
+        return real(q)
+
+    monkeypatch.setattr(main, "normalize_question", flaky)
+    lines, summary = _lines(client)
+    assert [x["index"] for x in lines] == [0, 1, 2]
+    assert all(x["error"] == "cannot normalize" for x in lines)
+    assert summary["errors"] == 3
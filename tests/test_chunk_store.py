@@ -0,0 +1,59 @@
+import json
+import numpy as np
+import pytest
+from app.chunk_store import DICT_MIN_VALUES, ChunkStore, ChunkStoreWriter
+
+def _rows(n):
+    texts, metas = [], []
+    for i in range(n):
+        md = {"source": f"doc{i % 7}.txt", "location": f"chunk {i}", "start_index": i * 100, "line_start": i + 1}
+        if i % 3 == 0:
+            md["page"] = i // 3 + 1
+        if i == 5:
+            md["score"] = 0.5
+        texts.append(f"chunk text {i}")
+        metas.append(md)
+    return texts, metas
+
+def test_columns_use_dictionary_only_for_low_cardinality(tmp_path):
+    texts, metas = _rows(3 * DICT_MIN_VALUES)
+    ChunkStore.write(tmp_path / "chunks", texts, metas)
+    store = ChunkStore(tmp_path / "chunks")
+    assert store.kinds == {"source": "dict", "location": "json", "start_index": "int",
+                           "line_start": "int", "page": "int", "score": "float"}
+    assert sorted(p.name for p in (tmp_path / "chunks").glob("meta.*.npy")) == [
+        "meta.line_start.num.npy", "meta.location.off.npy", "meta.page.num.npy", "meta.score.num.npy",
+        "meta.source.codes.npy", "meta.source.vocab.off.npy", "meta.start_index.num.npy"]
+    assert [store.meta(i) for i in range(len(store))] == metas
+    assert list(store.iter_texts()) == texts
+    assert store.ids_by("source")["doc3.txt"].tolist() == list(range(3, len(texts), 7))
+    assert store.ids_by("location")["chunk 9"].tolist() == [9]
+    page = store.numeric_column("page")
+    assert page[0] == 1 and page[3] == 2 and np.isnan(page[1])
+
+def test_column_changing_type_moves_to_json(tmp_path):
+    with ChunkStoreWriter(tmp_path / "chunks") as w:
+        w.add("a", {"page": 1})
+        w.add("b", {})
+        w.add("c", {"page": "iv"})
+        w.add("d", {"page": 2, "flag": True})
+    store = ChunkStore(tmp_path / "chunks")
+    assert store.kinds == {"page": "json", "flag": "dict"}
+    assert [store.meta(i) for i in range(4)] == [{"page": 1}, {}, {"page": "iv"}, {"page": 2, "flag": True}]
+    assert store.numeric_column("page")[[0, 3]].tolist() == [1.0, 2.0]
+
+def test_reads_stores_written_with_column_list(tmp_path):
+    ChunkStore.write(tmp_path / "chunks", ["x", "y"], [{"source": "a.txt"}, {"source": "b.txt"}])
+    info = tmp_path / "chunks" / "columns.json"
+    info.write_text(json.dumps({"columns": ["source"], "rows": 2}), encoding="utf-8")
+    store = ChunkStore(tmp_path / "chunks")
+    assert store.get([1, 0, 5]) == [("y", {"source": "b.txt"}), ("x", {"source": "a.txt"})]
+
+def test_failed_write_keeps_the_old_store(tmp_path):
+    ChunkStore.write(tmp_path / "chunks", ["old"], [{"source": "a.txt"}])
+    with pytest.raises(RuntimeError):
+        with ChunkStoreWriter(tmp_path / "chunks") as w:
+            w.add("new", {"source": "b.txt", "start_index": 0})
+            raise RuntimeError("ingest failed")
+    assert list(ChunkStore(tmp_path / "chunks").iter_texts()) == ["old"]
+    assert [p.name for p in tmp_path.iterdir()] == ["chunks"]
@@ -0,0 +1,75 @@
+import random
+import pytest
+from app.ingest.chunker import split_text, split_pages
+
+def _corpus(seed=0, n=400):
+    rnd = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    out = []
+    for _ in range(n):
+        sent = " ".join(rnd.choice(words) for _ in range(rnd.randint(3, 25)))
+        out.append(sent + rnd.choice([". ", "? ", "\n", "\n\n", " ", ".\n"]))
+    return "".join(out)
+
+def _check(text, chunks, first_line=1):
+    assert chunks
+    for c in chunks:
+        assert text[c.start:c.end] == c.text
+        assert c.text == c.text.strip() and c.text
+        assert c.line_start == first_line + text.count("\n", 0, c.start)
+        assert c.line_end == first_line + text.count("\n", 0, c.end - 1)
+    # tidak ada teks non-whitespace yang terlewat di antara chunk
+    covered = 0
+    for c in chunks:
+        assert not text[covered:c.start].strip()
+        covered = max(covered, c.end)
+    assert not text[covered:].strip()
+
+@pytest.mark.parametrize("size,overlap", [(200, 40), (800, 120), (57, 0)])
+def test_offsets_and_line_ranges_are_exact(size, overlap):
+    text = _corpus()
+    chunks = split_text(text, size, overlap, unit="chars")
+    _check(text, chunks)
+    assert all(len(c.text) <= size for c in chunks)
+
+def test_token_unit_respects_budget():
+    text = _corpus(1)
+    chunks = split_text(text, 64, 8, unit="tokens")
+    _check(text, chunks)
+    assert all(c.tokens <= 64 for c in chunks)
+
+def test_text_without_breaks_is_hard_cut():
+    text = "x" * 1000
+    chunks = split_text(text, 300, 50, unit="chars")
+    _check(text, chunks)
+    assert max(len(c.text) for c in chunks) == 300
+
+def test_page_ranges_and_offsets_into_joined_document():
+    rnd = random.Random(2)
+    pages = [(p, _corpus(p, rnd.randint(0, 30))) for p in range(1, 9)]
+    doc = "\n".join(t for _, t in pages)
+    page_starts, pos = [], 0
+    for _, t in pages:
+        page_starts.append(pos)
+        pos += len(t) + 1
+    chunks = list(split_pages(iter(pages), 300, 60, unit="chars"))
+    _check(doc, chunks)
+    for c in chunks:
+        assert c.page_start == max(i for i, s in enumerate(page_starts, 1) if s <= c.start)
+        assert c.page_end == max(i for i, s in enumerate(page_starts, 1) if s <= c.end - 1)
+    assert any(c.page_end != c.page_start for c in chunks)  # chunk melewati batas halaman
+
+class _WordTokenizer:
+    """Tokenizer 'fast' palsu: satu token per kata, offset seperti HF offset_mapping."""
+    is_fast = True
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False, verbose=True):
+        import re
+        return {"offset_mapping": [m.span() for m in re.finditer(r"\S+", text)]}
+
+def test_embedder_tokenizer_sizes_chunks_in_its_own_tokens():
+    text = "  " + _corpus(3)
+    chunks = split_text(text, 20, 4, unit="tokens", tokenizer=_WordTokenizer())
+    _check(text, chunks)
+    assert all(len(c.text.split()) <= 20 for c in chunks)
+    assert max(len(c.text.split()) for c in chunks) >= 15
@@ -0,0 +1,15 @@
+import asyncio
+from app.core import clients
+from app.rag import generator
+
+def test_aclose_resets_pool_and_cached_llms():
+    http = clients.sync_http()
+    generator._llm(0.2, 64)
+    assert generator._LLMS
+
+    asyncio.run(clients.aclose())
+    assert http.is_closed
+    assert not generator._LLMS
+    # startup berikutnya di proses yang sama mendapat pool baru yang masih terbuka
+    assert not clients.sync_http().is_closed
+    asyncio.run(clients.aclose())
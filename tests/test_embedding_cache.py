@@ -0,0 +1,30 @@
+import numpy as np
+from app.core.embedding_cache import EmbeddingCache
+
+def _vec(i, dim=8):
+    return np.full(dim, float(i), dtype=np.float32)
+
+def test_roundtrip_and_reopen(tmp_path):
+    a = EmbeddingCache("m", root=str(tmp_path), max_bytes=0)
+    a.put_many(["x", "y"], [_vec(1), _vec(2)])
+    b = EmbeddingCache("m", root=str(tmp_path), max_bytes=0)
+    got = b.get_many(["y", "x", "z"])
+    assert got[0][0] == 2 and got[1][0] == 1 and got[2] is None
+
+def test_other_process_sees_compaction_even_after_it_appends(tmp_path):
+    itemsize = 16 + 8 * 4
+    a = EmbeddingCache("m", root=str(tmp_path), max_bytes=itemsize * 20)
+    b = EmbeddingCache("m", root=str(tmp_path), max_bytes=itemsize * 20)
+    b.put_many([f"t{i}" for i in range(10)], [_vec(i) for i in range(10)])
+    assert b.get_many(["t3"])[0][0] == 3
+
+    # A menulis cukup banyak sampai file dipadatkan (row bergeser), lalu B append lagi:
+    # ukuran file bisa >= jumlah row yang B kenal, tapi generation berubah → index B dibangun ulang
+    a.put_many([f"a{i}" for i in range(15)], [_vec(100 + i) for i in range(15)])
+    b.put_many([f"b{i}" for i in range(5)], [_vec(200 + i) for i in range(5)])
+    for i in range(5):
+        assert b.get_many([f"b{i}"])[0][0] == 200 + i
+    for i, v in enumerate(b.get_many([f"a{i}" for i in range(15)])):
+        assert v is None or v[0] == 100 + i
+    for i, v in enumerate(b.get_many([f"t{i}" for i in range(10)])):
+        assert v is None or v[0] == i
@@ -0,0 +1,43 @@
+import argparse, json
+import numpy as np
+import pytest
+from app.chunk_store import ChunkStore
+from app.snapshots import new_version_dir, publish
+
+faiss = pytest.importorskip("faiss")
+from app import faiss_index
+
+class HashEncoder:
+    """Embedder lokal deterministik (tanpa model): vektor acak per teks, dinormalisasi."""
+
+    def encode(self, texts, normalize_embeddings=True):
+        out = np.stack([np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(16) for t in texts])
+        return (out / np.linalg.norm(out, axis=1, keepdims=True)).astype("float32")
+
+def test_report_reads_the_published_versioned_chunk_store(tmp_path, monkeypatch):
+    texts = [f"chunk number {i} about topic {i % 7}" for i in range(40)]
+    version_dir = new_version_dir(tmp_path)
+    ChunkStore.write(version_dir / "chunks", texts, [{"source": "a.txt"}] * len(texts))
+    version = publish(tmp_path, version_dir)
+    assert faiss_index.chunk_dirs(tmp_path) == [tmp_path / "versions" / version / "chunks"]
+
+    monkeypatch.setattr("app.utils.embedder", lambda: HashEncoder())
+    out = tmp_path / "report.json"
+    faiss_index._report(argparse.Namespace(storage=str(tmp_path), queries=None, sample=10, k=5, json=str(out)))
+    rows = json.loads(out.read_text(encoding="utf-8"))
+    assert rows[0] == {**rows[0], "index": "flat", "recall": 1.0}
+
+def test_chunk_dirs_falls_back_to_the_legacy_layout(tmp_path):
+    assert faiss_index.chunk_dirs(tmp_path) == [tmp_path / "chunks"]
+
+def test_chunk_dirs_lists_every_shard_of_a_sharded_version(tmp_path):
+    from app.shards import ShardedWriter
+    texts = [f"chunk {i}" for i in range(12)]
+    version_dir = new_version_dir(tmp_path)
+    with ShardedWriter(version_dir, 3) as writer:
+        writer.add(texts, [{"source": f"{i}.txt"} for i in range(12)], HashEncoder().encode(texts))
+    writer.finish()
+    version = publish(tmp_path, version_dir)
+    dirs = faiss_index.chunk_dirs(tmp_path)
+    assert dirs == [tmp_path / "versions" / version / "shards" / f"{i:02d}" / "chunks" for i in range(3)]
+    assert sorted(t for d in dirs for t in ChunkStore(d).iter_texts()) == sorted(texts)
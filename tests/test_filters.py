@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from app.chunk_store import ChunkStore
+from app.faiss_index import build_index, IdScope
+from app.rag.filters import SearchFilter, chroma_where, store_ids
+from app.rag.lexical_index import BM25Index
+
+ROWS = [
+    ("a.pdf", {"page": 1}), ("a.pdf", {"page": 2, "page_end": 3}), ("a.pdf", {"page": 4}),
+    ("b.md", {}), ("b.md", {}), ("c.pdf", {"page": 3}), ("c.txt", {}), ("a.pdf", {"page": 5}),
+]
+
+@pytest.fixture
+def store(tmp_path):
+    ChunkStore.write(tmp_path / "chunks", [f"text {i}" for i in range(len(ROWS))],
+                     [{"source": s, **md} for s, md in ROWS])
+    return ChunkStore(tmp_path / "chunks")
+
+def test_resolve_normalizes_and_empty_is_none():
+    assert SearchFilter.resolve() is None
+    assert SearchFilter.resolve(sources=[], file_types=[]) is None
+    flt = SearchFilter.resolve(sources=["b", "a", "a"], file_types=[".PDF"])
+    assert flt == SearchFilter(sources=("a", "b"), file_types=("pdf",))
+    with pytest.raises(ValueError):
+        SearchFilter.resolve(page_from=3, page_to=1)
+
+def test_chroma_where():
+    assert chroma_where(SearchFilter.resolve(sources=["a.pdf"])) == {"source": {"$in": ["a.pdf"]}}
+    assert chroma_where(SearchFilter.resolve(file_types=["md"]), ["a.pdf", "b.md"]) == {"source": {"$in": ["b.md"]}}
+    assert chroma_where(SearchFilter.resolve(file_types=["docx"]), ["a.pdf"]) is None
+    assert chroma_where(SearchFilter.resolve(page_from=2, page_to=4)) == {"$and": [
+        {"page": {"$lte": 4}}, {"$or": [{"page": {"$gte": 2}}, {"page_end": {"$gte": 2}}]}]}
+
+def test_store_ids_from_source_index_and_pages(store):
+    assert {k: v.tolist() for k, v in store.ids_by("source").items()} == \
+        {"a.pdf": [0, 1, 2, 7], "b.md": [3, 4], "c.pdf": [5], "c.txt": [6]}
+    assert store_ids(store, SearchFilter.resolve(sources=["b.md", "c.txt"])).tolist() == [3, 4, 6]
+    assert store_ids(store, SearchFilter.resolve(file_types=["pdf"])).tolist() == [0, 1, 2, 5, 7]
+    # chunk halaman 2–3 ikut karena menyentuh halaman 3; chunk tanpa halaman tidak
+    assert store_ids(store, SearchFilter.resolve(page_from=3, page_to=4)).tolist() == [1, 2, 5]
+    assert store_ids(store, SearchFilter.resolve(sources=["a.pdf"], page_from=3)).tolist() == [1, 2, 7]
+    assert store_ids(store, SearchFilter.resolve(sources=["missing"])).tolist() == []
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+def test_id_scope_search_matches_brute_force(kind):
+    rng = np.random.default_rng(0)
+    embs = rng.normal(size=(500, 16)).astype("float32")
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    index, info = build_index(embs, kind)
+    ids = np.sort(rng.choice(500, size=60, replace=False)).astype(np.int64)
+    scope = IdScope(index, info, ids)
+    q = embs[:3]
+    _, I = scope.search(index, q, 5)
+    expect = ids[np.argsort(-(q @ embs[ids].T), axis=1)[:, :5]]
+    assert set(I.ravel()) <= set(ids.tolist())
+    if kind == "flat":
+        assert I.tolist() == expect.tolist()
+
+def test_bm25_top_n_only_scores_allowed_ids():
+    idx = BM25Index("/nonexistent/bm25.json.gz")
+    idx.add(["x", "y", "z"], ["apple banana", "apple apple", "banana cherry"])
+    assert {i for i, _ in idx.top_n("apple", 3)} == {"x", "y"}
+    assert [i for i, _ in idx.top_n("apple", 3, allowed={"x", "z"})] == ["x"]
+    assert idx.top_n("apple", 3, allowed=set()) == []
@@ -0,0 +1,40 @@
+import pytest
+from app.rag.fusion import FusionParams, fuse
+
+WEIGHTED = FusionParams(method="weighted", vector_weight=0.5, bm25_weight=0.5)
+RRF = FusionParams(method="rrf", vector_weight=1.0, bm25_weight=1.0, rrf_k=60)
+
+def test_weighted_normalizes_each_modality_and_keys_by_chunk_id():
+    vector = [("a", 0.9), ("b", 0.5), ("c", 0.1)]
+    lexical = [("c", 12.0), ("d", 6.0), ("a", 0.0)]
+    got = dict(fuse(vector, lexical, WEIGHTED))
+    # a: v=1, l=0 · b: v=0.5, tidak ada di BM25 · c: v=0, l=1 · d: l=0.5, tidak ada di vektor
+    assert got == pytest.approx({"a": 0.5, "b": 0.25, "c": 0.5, "d": 0.25})
+
+def test_missing_modality_keeps_the_other_ranking():
+    vector = [("a", 0.8), ("b", 0.6), ("c", 0.2)]
+    assert [c for c, _ in fuse(vector, [], WEIGHTED)] == ["a", "b", "c"]
+    assert [c for c, _ in fuse([], vector, RRF)] == ["a", "b", "c"]
+    assert fuse([], [], WEIGHTED) == []
+
+def test_single_candidate_and_equal_scores_are_not_zeroed():
+    assert fuse([("a", 0.3)], [], WEIGHTED) == [("a", 0.5)]
+    got = fuse([("a", 0.4), ("b", 0.4)], [], WEIGHTED)
+    assert [s for _, s in got] == [0.5, 0.5]
+
+def test_ties_keep_first_seen_order():
+    # skor gabungan sama persis → urutan pertama muncul (vektor dulu, lalu BM25) dipertahankan
+    got = fuse([("a", 1.0), ("b", 0.0)], [("b", 1.0), ("a", 0.0)], WEIGHTED)
+    assert [c for c, _ in got] == ["a", "b"] and got[0][1] == got[1][1]
+    got = fuse([("x", 1.0)], [("y", 1.0)], RRF)
+    assert [c for c, _ in got] == ["x", "y"]
+
+def test_rrf_sums_reciprocal_ranks_with_weights():
+    params = RRF._replace(bm25_weight=2.0)
+    got = dict(fuse([("a", 0.9), ("b", 0.1)], [("b", 3.0)], params))
+    assert got == pytest.approx({"a": 1 / 61, "b": 1 / 62 + 2 / 61})
+
+def test_resolve_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        FusionParams.resolve("max")
+    assert FusionParams.resolve("RRF", vector_weight=2).vector_weight == 2.0
@@ -0,0 +1,38 @@
+import os
+from app.core.config import settings
+
+INTRO = "Rome travel notes, collected over several trips to Italy with family and friends."
+TAIL = "The Colosseum is in Rome and hosted gladiator games for centuries."
+
+def _write(name, text):
+    with open(os.path.join(settings.DATA_DIR, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+def _meta_of(vs, text):
+    got = vs._collection.get(where_document={"$contains": text}, include=["metadatas", "embeddings"])
+    assert len(got["ids"]) == 1
+    return got["metadatas"][0], list(got["embeddings"][0])
+
+def test_edit_above_an_unchanged_paragraph_moves_its_citation(tmp_path, monkeypatch):
+    from app.ingest.indexer import build_index_from_dir
+    from app.vectorstore.chroma_store import new_vectorstore
+    # koleksi, data dir, dan manifest terpisah dari index test lain
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(settings, "PERSIST_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "relocate-test")
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 100)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 0)
+    os.makedirs(settings.DATA_DIR)
+
+    _write("rome.txt", f"{INTRO}\n\n{TAIL}")
+    build_index_from_dir()
+    before, emb_before = _meta_of(new_vectorstore(), TAIL)
+    assert (before["start_index"], before["line_start"]) == (83, 3)
+
+    _write("rome.txt", f"{INTRO}\nUpdated for the spring season.\nNew museum hours added.\n\n{TAIL}")
+    stats = build_index_from_dir()
+    after, emb_after = _meta_of(new_vectorstore(), TAIL)
+    # isi sama → tidak di-embed ulang, tapi lokasinya mengikuti file baru
+    assert stats["added_chunks"] == 1 and stats["deleted_chunks"] == 0
+    assert after["chunk_id"] == before["chunk_id"] and emb_after == emb_before
+    assert (after["start_index"], after["end_index"], after["line_start"], after["line_end"]) == (138, 204, 5, 5)
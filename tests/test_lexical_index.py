@@ -0,0 +1,62 @@
+import pytest
+from rank_bm25 import BM25Okapi
+from app.rag.lexical_index import BM25Index
+
+DOCS = {
+    "a": "the cat sat on the mat",
+    "b": "the dog chased the cat",
+    "c": "dogs and cats living together",
+    "d": "a bird sang on the roof",
+    "e": "the cat and the bird",
+}
+
+def _index(path, docs=DOCS):
+    idx = BM25Index(str(path))
+    idx.add(list(docs), list(docs.values()))
+    return idx
+
+@pytest.mark.parametrize("query", ["cat", "the dog", "bird roof", "cats together", "zebra"])
+def test_scores_match_rank_bm25(tmp_path, query):
+    idx = _index(tmp_path / "bm25.json.gz")
+    ref = BM25Okapi([t.split() for t in DOCS.values()])
+    expect = dict(zip(DOCS, ref.get_scores(query.split())))
+    got = dict(idx.top_n(query, len(DOCS)))
+    assert got.keys() <= expect.keys()
+    for doc_id, score in got.items():
+        assert score == pytest.approx(expect[doc_id])
+    # dokumen tanpa term query tidak diskor sama sekali
+    assert all(set(query.split()) & set(DOCS[i].split()) for i in got)
+
+def test_remove_and_re_add_only_touch_that_documents_terms(tmp_path):
+    idx = _index(tmp_path / "bm25.json.gz")
+    idx.remove(["b", "missing"])
+    assert len(idx) == 4 and "chased" not in idx.postings
+    assert "b" not in {i for i, _ in idx.top_n("dog", 5)}
+    # add dengan id yang sudah ada menggantikan isinya
+    idx.add(["a"], ["a parrot on the mat"])
+    assert [i for i, _ in idx.top_n("parrot", 5)] == ["a"]
+    assert "sat" not in idx.postings
+    fresh = _index(tmp_path / "other.json.gz", {**{k: v for k, v in DOCS.items() if k != "b"}, "a": "a parrot on the mat"})
+    for q in ("the cat", "mat", "bird"):
+        assert dict(idx.top_n(q, 5)) == pytest.approx(dict(fresh.top_n(q, 5)))
+
+def test_save_load_round_trip_and_skip_when_unchanged(tmp_path):
+    path = tmp_path / "bm25.json.gz"
+    idx = _index(path)
+    idx.remove(["c"])
+    idx.save()
+    assert idx.version == 1
+    loaded = BM25Index(str(path)).load()
+    assert loaded.version == 1 and len(loaded) == 4
+    for q in ("cat", "the bird", "dog"):
+        assert loaded.top_n(q, 5) == idx.top_n(q, 5)
+    # term per dokumen dibangun ulang saat load, jadi remove setelah load tetap benar
+    loaded.remove(["d"])
+    assert "roof" not in loaded.postings and "sang" not in loaded.postings
+    # tanpa perubahan save() tidak menulis ulang file dan versi tidak naik
+    mtime = path.stat().st_mtime_ns
+    idx.save()
+    assert idx.version == 1 and path.stat().st_mtime_ns == mtime
+    idx.touch()
+    idx.save()
+    assert idx.version == 2
@@ -0,0 +1,85 @@
+import json
+import numpy as np
+import pytest
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from app.onnx_models import (TOLERANCE, OnnxCrossEncoder, OnnxEmbedder, compare, embedding_parity, export,
+                             length_buckets, ranking_parity, rerank_jobs, within_tolerance)
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa".split()
+
+@pytest.fixture
+def tokenizer_file(tmp_path):
+    vocab = {"[PAD]": 0, "[UNK]": 1, "[CLS]": 2, "[SEP]": 3, **{w: i + 4 for i, w in enumerate(WORDS)}}
+    tok = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tok.pre_tokenizer = pre_tokenizers.Whitespace()
+    tok.post_processor = processors.TemplateProcessing(single="[CLS] $A [SEP]", pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+                                                       special_tokens=[("[CLS]", 2), ("[SEP]", 3)])
+    path = tmp_path / "tokenizer.json"
+    tok.save(str(path))
+    return path
+
+class FakeSession:
+    """Hidden state = id token di semua dimensi (embedder) atau logit = jumlah token - 6 (reranker)."""
+
+    def __init__(self, kind):
+        self.kind, self.shapes = kind, []
+
+    def run(self, feeds):
+        self.shapes.append(feeds["input_ids"].shape)
+        if self.kind == "embedder":
+            return [np.repeat(feeds["input_ids"][:, :, None].astype(np.float32), 3, axis=2)]
+        return [(feeds["attention_mask"].sum(axis=1, keepdims=True) - 6).astype(np.float32)]
+
+def test_length_buckets_sort_by_length_and_cover_every_input():
+    buckets = length_buckets([5, 1, 9, 2, 7], 2)
+    assert [b.tolist() for b in buckets] == [[1, 3], [0, 4], [2]]
+
+def test_embedder_pads_per_bucket_and_restores_input_order(tokenizer_file):
+    session = FakeSession("embedder")
+    model = OnnxEmbedder(session, tokenizer_file, {"pooling": "mean", "max_length": 6}, batch_size=2)
+    texts = ["alpha beta gamma delta epsilon zeta eta", "alpha", "beta gamma", "iota"]
+    out = model.encode(texts)
+    # mean pooling id token (termasuk [CLS]/[SEP]); teks pertama dipotong ke max_length 6
+    expected = [np.mean([2, 4, 5, 6, 7, 3]), np.mean([2, 4, 3]), np.mean([2, 5, 6, 3]), np.mean([2, 12, 3])]
+    assert np.allclose(out[:, 0], expected)
+    # bucket [alpha, iota] lebar 3, [beta gamma, teks panjang] lebar 6 — bukan semua di-pad ke 6
+    assert session.shapes == [(2, 3), (2, 6)]
+    single = model.encode("beta gamma", normalize_embeddings=True)
+    assert single.shape == (3,) and np.isclose(np.linalg.norm(single), 1.0)
+
+def test_cross_encoder_sigmoid_scores_and_hf_style_tokenizer(tokenizer_file):
+    model = OnnxCrossEncoder(FakeSession("reranker"), tokenizer_file, {"num_labels": 1, "activation": "sigmoid",
+                                                                       "max_length": 512})
+    scores = model.predict([("alpha", "beta gamma delta"), ("alpha", "beta")], batch_size=1)
+    assert np.allclose(scores, 1 / (1 + np.exp(-np.array([1.0, -1.0]))))
+    # tokenizer tanpa truncation untuk Reranker._truncate dan chunker token
+    tok = model.tokenizer
+    ids = tok.encode(" ".join(WORDS * 60), add_special_tokens=False)
+    assert len(ids) == 600 and tok.decode(ids[:2]) == "alpha beta"
+    assert tok("alpha  beta", add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"] == [(0, 5), (7, 11)]
+
+def test_parity_metrics_and_tolerance():
+    ref = np.eye(3, dtype=np.float32)
+    emb = embedding_parity(ref, ref + 0.01)
+    assert emb["min_cosine"] > 0.99
+    rank = ranking_parity([[0.9, 0.1, 0.5]], [[0.8, 0.2, 0.6]])
+    assert rank["top1_agreement"] == 1.0 and rank["mean_spearman"] == 1.0
+    assert within_tolerance({**emb, **rank})
+    assert not within_tolerance(ranking_parity([[0.9, 0.1, 0.5]], [[0.1, 0.9, 0.5]]))
+    jobs = rerank_jobs([f"{w} passage text" for w in WORDS], queries=3, per_query=4)
+    assert len(jobs) == 3 and all(len(ps) <= 4 and ps[0].startswith(q) for q, ps in jobs)
+
+def test_onnx_matches_pytorch_within_tolerance(tmp_path):
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("onnx")
+    for kind, name in (("embedder", "all-MiniLM-L6-v2"), ("reranker", "cross-encoder/ms-marco-MiniLM-L-6-v2")):
+        try:
+            export(name, kind, str(tmp_path))
+        except OSError as e:  # model belum ada di cache HF dan tidak ada jaringan
+            pytest.skip(f"cannot fetch {name}: {e}")
+    texts = [f"{a} is related to {b}, see section {i} of the handbook for the {a} policy."
+             for i, (a, b) in enumerate(zip(WORDS * 4, reversed(WORDS * 4)))]
+    report = compare(texts, ("embedder", "reranker"), str(tmp_path))
+    assert all(row["ok"] for row in report.values()), json.dumps(report)
+    assert report["embedder"]["mean_cosine"] >= TOLERANCE["mean_cosine"]
@@ -0,0 +1,73 @@
+import random
+import pytest
+from app.rag import packing
+from app.rag.packing import MIN_OVERLAP_CHARS, MIN_TAIL_TOKENS, Passage, _suffix_prefix, merge_passages, pack_context
+
+# kalimat unik (kata acak) supaya chunk yang tidak bersebelahan tidak kebetulan overlap
+_RND = random.Random(3)
+DOC = " ".join(" ".join(_RND.choice("abcdefghij") * _RND.randint(2, 7) for _ in range(6)) + "." for _ in range(60))
+
+@pytest.fixture(autouse=True)
+def char_tokens(monkeypatch):
+    # tanpa tiktoken: token = len // 4 + 1, jadi budget di test bisa dihitung pasti
+    monkeypatch.setattr(packing, "_encoding", lambda model: None)
+
+def _chunk(start, end, n, source="handbook.txt", score=1.0):
+    return DOC[start:end], {"source": source, "location": f"chunk {n}"}, score
+
+def test_suffix_prefix_needs_min_overlap():
+    a, b = "x" * 10 + "overlapping tail text", "overlapping tail text and more"
+    assert _suffix_prefix(a, b) == len("overlapping tail text")
+    assert _suffix_prefix("abc short", "short xyz") == 0  # overlap < MIN_OVERLAP_CHARS
+    # head yang muncul berulang: dipilih posisi yang benar-benar menyambung sampai akhir `a`
+    rep = "0123456789abcdef"
+    assert _suffix_prefix(rep + "-" + rep + "gh", rep + "gh tail") == MIN_OVERLAP_CHARS + 2
+    assert _suffix_prefix("anything", "") == 0
+
+def test_overlapping_chunks_merge_without_duplicate_text():
+    first, second = _chunk(0, 200, 1, score=0.4), _chunk(150, 320, 2, score=0.9)
+    [p] = merge_passages([first, second])
+    assert p.text == DOC[0:320] and p.score == 0.9
+    assert p.meta["location"] == "chunks 1–2"
+
+def test_adjacent_chunks_join_in_document_order_and_sources_stay_apart():
+    later, earlier = _chunk(200, 300, 4, score=0.9), _chunk(100, 200, 3, score=0.5)
+    other = _chunk(100, 200, 3, source="other.txt", score=0.7)
+    out = merge_passages([later, earlier, other])
+    assert [p.source for p in out] == ["handbook.txt", "other.txt"]
+    assert out[0].text == DOC[100:200] + "\n" + DOC[200:300]
+    assert out[0].meta["location"] == "chunks 3–4"
+    assert not Passage(*_chunk(0, 50, 1)).absorb(Passage(*_chunk(400, 450, 9)))
+
+def test_merged_passage_bridges_two_existing_ones():
+    # chunk 1 dan 3 terpisah sampai chunk 2 datang dan menyambung keduanya
+    items = [_chunk(0, 100, 1, score=0.9), _chunk(200, 300, 3, score=0.8), _chunk(100, 200, 2, score=0.1)]
+    [p] = merge_passages(items)
+    assert p.text.replace("\n", "") == DOC[0:300]
+    assert p.meta["location"] == "chunks 1–3" and p.score == 0.9
+
+def test_empty_chunks_are_dropped():
+    assert merge_passages([("  ", {"source": "a"}, 1.0)]) == []
+
+def _tokens(text):
+    return len(text) // 4 + 1
+
+def test_budget_keeps_best_passages_and_truncates_the_tail():
+    items = [_chunk(0, 400, 1, score=0.9), _chunk(600, 1000, 10, score=0.5)]
+    first = _tokens(DOC[0:400])
+    # sisa budget setelah passage pertama cukup untuk potongan >= MIN_TAIL_TOKENS
+    packed = pack_context(items, first + MIN_TAIL_TOKENS + 5)
+    assert [m["location"] for _, m in packed] == ["chunk 1", "chunk 10"]
+    assert packed[0][0] == DOC[0:400]
+    assert DOC[600:1000].startswith(packed[1][0]) and len(packed[1][0]) < 400
+    # sisa di bawah MIN_TAIL_TOKENS → passage berikutnya dilewati, bukan dipotong kecil-kecil
+    packed = pack_context(items, first + MIN_TAIL_TOKENS - 1)
+    assert [m["location"] for _, m in packed] == ["chunk 1"]
+
+def test_label_overhead_counts_against_the_budget():
+    items = [_chunk(0, 100, 1, score=0.9), _chunk(600, 700, 10, score=0.5)]
+    label = lambda meta: f"[{meta['source']} | {meta['location']}]"
+    exact = sum(_tokens(label(m)) + _tokens(t) for t, m, _ in items)
+    assert len(pack_context(items, exact, label=label)) == 2
+    # satu token kurang: passage kedua tidak muat dan sisanya terlalu kecil untuk dipotong
+    assert len(pack_context(items, exact - 1, label=label)) == 1
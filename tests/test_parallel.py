@@ -0,0 +1,17 @@
+import time
+from app.ingest.parallel import iter_files_ordered
+
+def _slow_echo(path):
+    # file awal paling lambat → urutan selesai terbalik dari urutan input
+    time.sleep(0.05 * (4 - int(path)))
+    if path == "2":
+        raise ValueError("broken file")
+    return path
+
+def test_ordered_iteration_keeps_input_order_and_reports_errors():
+    paths = [str(i) for i in range(5)]
+    results = list(iter_files_ordered(_slow_echo, paths, workers=3, window=3))
+    assert [r.index for r in results] == list(range(5))
+    assert [r.value for r in results] == ["0", "1", None, "3", "4"]
+    assert results[2].error == "ValueError: broken file"
+    assert all(r.elapsed_ms > 0 for r in results)
@@ -0,0 +1,79 @@
+import os
+import pytest
+from app.core.config import settings
+from app.core.fakes import FakeCrossEncoder
+
+DOCS = {
+    "france.txt": "Paris is the capital of France. The Eiffel Tower stands in Paris.",
+    "germany.txt": "Berlin is the capital of Germany. The Brandenburg Gate is in Berlin.",
+    "japan.md": "# Japan\n\nTokyo is the capital of Japan. Mount Fuji is near Tokyo.",
+    "italy.txt": "Rome is the capital of Italy. The Colosseum is in Rome.",
+}
+
+@pytest.fixture(scope="module")
+def vs():
+    from app.ingest.indexer import build_index_from_dir
+    from app.vectorstore.chroma_store import get_vectorstore
+    from app.rag.reranker import get_reranker
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+    for name, text in DOCS.items():
+        with open(os.path.join(settings.DATA_DIR, name), "w", encoding="utf-8") as f:
+            f.write(text)
+    build_index_from_dir()
+    get_reranker()._model = FakeCrossEncoder()
+    return get_vectorstore(create_if_missing=False)
+
+def _ids(hits):
+    return [(d.metadata["chunk_id"], round(s, 6)) for d, s in hits]
+
+def test_retrieve_many_matches_single_queries(vs):
+    from app.rag import retriever
+    qs = ["capital of France", "Brandenburg Gate Berlin", "Mount Fuji", "Colosseum Rome"]
+    many = retriever.retrieve_many(vs, qs, top_k=3)
+    retriever._RETRIEVAL.clear()
+    single = [retriever.retrieve_with_scores(vs, q, top_k=3) for q in qs]
+    assert [_ids(h) for h in many] == [_ids(h) for h in single]
+    assert many[0][0][0].metadata["source"] == "france.txt"
+
+def test_retrieve_many_issues_one_vector_query_per_batch(vs, monkeypatch):
+    from app.rag import retriever
+    retriever._RETRIEVAL.clear()
+    calls = []
+    real = vs._collection.query
+    monkeypatch.setattr(vs._collection, "query", lambda **kw: calls.append(len(kw["query_embeddings"])) or real(**kw))
+    retriever.retrieve_many(vs, ["Paris", "Berlin", "Tokyo", "Rome", "Eiffel"], top_k=2)
+    assert calls == [5]
+
+def test_filter_is_pushed_into_vector_search_and_bm25(vs, monkeypatch):
+    from app.rag import retriever
+    from app.rag.filters import SearchFilter
+    from app.rag.lexical_index import BM25Index
+    retriever._RETRIEVAL.clear()
+    wheres, scopes = [], []
+    real_query, real_top_n = vs._collection.query, BM25Index.top_n
+
+    def top_n(self, query, n, allowed=None):
+        scopes.append(allowed)
+        return real_top_n(self, query, n, allowed)
+
+    monkeypatch.setattr(vs._collection, "query", lambda **kw: wheres.append(kw.get("where")) or real_query(**kw))
+    monkeypatch.setattr(BM25Index, "top_n", top_n)
+
+    flt = SearchFilter.resolve(sources=["germany.txt", "italy.txt"])
+    hits = retriever.retrieve_with_scores(vs, "capital of France", top_k=3, flt=flt)
+    assert hits and {d.metadata["source"] for d, _ in hits} <= {"germany.txt", "italy.txt"}
+    assert wheres == [{"source": {"$in": ["germany.txt", "italy.txt"]}}]
+    assert scopes[0] and {d.metadata["chunk_id"] for d, _ in hits} <= scopes[0]
+
+    # tipe file di-resolve lewat manifest ingest; batch memakai filter yang sama untuk semua pertanyaan
+    md_only = SearchFilter.resolve(file_types=[".MD"])
+    many = retriever.retrieve_many(vs, ["Paris", "Tokyo"], top_k=3, flt=md_only)
+    assert all(d.metadata["source"] == "japan.md" for hits in many for d, _ in hits)
+    assert many[1]
+
+def test_filter_without_matches_returns_nothing(vs):
+    from app.rag import retriever
+    from app.rag.filters import SearchFilter
+    assert retriever.retrieve_with_scores(vs, "Paris", top_k=3, flt=SearchFilter.resolve(file_types=["pdf"])) == []
+    # teks tanpa halaman tidak lolos filter halaman
+    assert retriever.retrieve_with_scores(vs, "Paris", top_k=3, flt=SearchFilter.resolve(page_from=1)) == []
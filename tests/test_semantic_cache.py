@@ -0,0 +1,96 @@
+import os
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.fakes import FakeCrossEncoder
+from app.rag.cache import SemanticCache, VersionedCache
+
+def _vec(*xs):
+    return np.array(xs, dtype=np.float32)
+
+def test_hit_needs_threshold_same_scope_and_same_version():
+    cache = SemanticCache(maxsize=4, threshold=0.9)
+    cache.set(_vec(1, 0, 0), "s", "paris", "capital of france?", version="v1")
+    hit = cache.get(_vec(0.95, 0.1, 0), "s", "v1")
+    assert hit.value == "paris" and hit.question == "capital of france?" and hit.similarity > 0.9
+    assert cache.get(_vec(0.5, 0.5, 0), "s", "v1") is None
+    assert cache.get(_vec(1, 0, 0), "other", "v1") is None
+    # versi index baru → entry lama tidak dipakai lagi
+    assert cache.get(_vec(1, 0, 0), "s", "v2") is None and len(cache) == 0
+    cache.set(_vec(1, 0, 0), "s", "stale", version="v1")
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"], stats["version"]) == (1, 3, 0.25, "v2")
+
+def test_retired_version_bypasses_instead_of_clearing():
+    cache = SemanticCache(maxsize=4, threshold=0.9)
+    cache.set(_vec(1, 0, 0), "s", "old", version="v1")
+    cache.set(_vec(1, 0, 0), "s", "new", version="v2")
+    # request yang masih memegang snapshot v1 selesai setelah swap: tidak membalik versi ke v1
+    assert cache.get(_vec(1, 0, 0), "s", "v1") is None
+    cache.set(_vec(0, 1, 0), "s", "stale", version="v1")
+    assert cache.version == "v2" and len(cache) == 1
+    assert cache.get(_vec(1, 0, 0), "s", "v2").value == "new"
+    assert cache.get(_vec(1, 0, 0), "s", "v3") is None and cache.version == "v3" and len(cache) == 0
+
+def test_versioned_cache_only_moves_forward():
+    cache = VersionedCache(maxsize=4)
+    assert cache.check_version("v1")
+    cache.set("q", "a1")
+    assert cache.check_version("v2") and cache.get("q") is None
+    cache.set("q", "a2")
+    assert not cache.check_version("v1")
+    assert cache.version == "v2" and cache.get("q") == "a2"
+    assert cache.check_version("v2") and cache.check_version("v3") and cache.get("q") is None
+
+def test_near_duplicates_overwrite_and_lru_slot_is_evicted():
+    cache = SemanticCache(maxsize=2, threshold=0.9)
+    cache.set(_vec(1, 0), "s", "a")
+    cache.set(_vec(0.99, 0.05), "s", "a2")
+    assert len(cache) == 1 and cache.get(_vec(1, 0), "s").value == "a2"
+    cache.set(_vec(0, 1), "s", "b")
+    cache.get(_vec(1, 0), "s")
+    cache.set(_vec(-1, 0), "s", "c")
+    # "b" paling lama tidak diakses → slotnya dipakai "c"
+    assert cache.get(_vec(0, 1), "s") is None and cache.get(_vec(-1, 0), "s").value == "c"
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_expires_entries(monkeypatch):
+    import app.rag.cache as mod
+    now = [100.0]
+    monkeypatch.setattr(mod.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(maxsize=2, ttl=10, threshold=0.9)
+    cache.set(_vec(1, 0), "s", "a")
+    now[0] += 11
+    assert cache.get(_vec(1, 0), "s") is None and len(cache) == 0
+    cache.set(_vec(0, 1), "s", "b")
+    assert cache.stats()["expired"] == 1
+
+@pytest.fixture(scope="module")
+def client():
+    from app.api import main
+    from app.ingest.indexer import build_index_from_dir
+    from app.rag.reranker import get_reranker
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+    with open(os.path.join(settings.DATA_DIR, "spain.txt"), "w", encoding="utf-8") as f:
+        f.write("Madrid is the capital of Spain. The Prado museum is in Madrid.")
+    build_index_from_dir()
+    get_reranker()._model = FakeCrossEncoder()
+    with TestClient(main.app) as c:
+        yield c
+
+def test_ask_reuses_answer_for_a_paraphrased_question(client, monkeypatch):
+    from app.api import main
+    monkeypatch.setattr(main, "_ANSWERS", None)
+    monkeypatch.setattr(main, "_SEMANTIC", SemanticCache(maxsize=8, threshold=0.85))
+    first = client.post("/ask", json={"question": "what is the capital city of Spain"}).json()
+    assert first["metadata"]["cache"]["semantic"] == "miss"
+    again = client.post("/ask", json={"question": "so what is the capital city of Spain"}).json()
+    assert again["metadata"]["cache"]["semantic"] == "hit"
+    assert again["metadata"]["semantic_cache"]["question"] == "what is the capital city of Spain"
+    assert (again["answer"], again["context_sources"]) == (first["answer"], first["context_sources"])
+    other = client.post("/ask", json={"question": "Prado museum opening hours"}).json()
+    assert other["metadata"]["cache"]["semantic"] == "miss"
+    health = client.get("/health").json()["semantic_cache"]
+    assert health["hits"] == 1 and health["misses"] == 2 and health["size"] == 2
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.rag.filters import SearchFilter
+from app.shards import ShardSet, ShardedWriter, create_app, merge_topk, shard_of
+from app.snapshots import new_version_dir, publish
+
+faiss = pytest.importorskip("faiss")
+
+N, DIM, SOURCES = 120, 16, ["a.txt", "b.md", "c.pdf", "d.txt", "e.md"]
+
+def _corpus():
+    rng = np.random.default_rng(7)
+    embs = rng.standard_normal((N, DIM)).astype("float32")
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    texts = [f"chunk {i}" for i in range(N)]
+    metas = [{"source": SOURCES[i % len(SOURCES)], "location": f"chunk {i}"} for i in range(N)]
+    return embs, texts, metas
+
+def _publish(root, shards=3, by="hash"):
+    embs, texts, metas = _corpus()
+    version_dir = new_version_dir(root)
+    with ShardedWriter(version_dir, shards, by) as writer:
+        for i in range(0, N, 50):
+            writer.add(texts[i:i + 50], metas[i:i + 50], embs[i:i + 50])
+    writer.finish()
+    return root / "versions" / publish(root, version_dir), embs, texts
+
+def _exact(embs, texts, q, k, allowed=None):
+    scores = embs @ q
+    if allowed is not None:
+        scores = np.where(allowed, scores, -np.inf)
+    return [[texts[i] for i in np.argsort(-row)[:k] if np.isfinite(row[i])] for row in scores.T]
+
+def test_shard_routing_is_stable_and_merge_keeps_global_order():
+    meta = {"source": "a.txt"}
+    assert shard_of("x", meta, 4) == shard_of("x", meta, 4)
+    assert {shard_of(t, meta, 4, by="source") for t in "xyz"} == {shard_of("", meta, 4, by="source")}
+    merged = merge_topk([[(0.9, "a", {}), (0.2, "b", {})], [(0.5, "c", {}), (0.4, "d", {})], []], 3)
+    assert [t for _, t, _ in merged] == ["a", "c", "d"]
+
+def test_thread_shards_match_a_single_exact_index(tmp_path):
+    path, embs, texts = _publish(tmp_path)
+    shards = ShardSet(path, mode="thread")
+    q = embs[:4] + 0.01
+    stats = {}
+    found = shards.search(q, 5, stats=stats)
+    assert [[t for t, _ in row] for row in found] == _exact(embs, texts, q.T, 5)
+    assert stats["shards"]["count"] == 3 and stats["shards"]["queried"] == len(shards.live)
+    assert {p["replica"] for p in stats["shards"]["per_shard"]} == {"local"}
+    assert set(shards.status()["ewma_ms"]) == {str(i) for i in shards.live}
+
+def test_source_sharding_prunes_shards_for_scoped_questions(tmp_path):
+    path, embs, texts = _publish(tmp_path, shards=4, by="source")
+    shards = ShardSet(path, mode="thread")
+    flt = SearchFilter.resolve(sources=["c.pdf"])
+    stats = {}
+    found = shards.search(embs[:2], 3, flt, stats)
+    allowed = np.array([i % len(SOURCES) == 2 for i in range(N)])[:, None]
+    assert [[t for t, _ in row] for row in found] == _exact(embs, texts, embs[:2].T, 3, allowed)
+    assert stats["shards"]["queried"] == 1 and stats["filter_chunks"] == N // len(SOURCES)
+
+def test_process_shards_match_thread_shards(tmp_path):
+    path, embs, _ = _publish(tmp_path, shards=2)
+    local, procs = ShardSet(path, mode="thread"), ShardSet(path, mode="process", replicas=1)
+    try:
+        stats = {}
+        assert procs.search(embs[:3], 4, stats=stats) == local.search(embs[:3], 4)
+        assert all(p["replica"].startswith("pid:") for p in stats["shards"]["per_shard"])
+    finally:
+        procs.close()
+
+def test_remote_shards_fail_over_to_a_healthy_replica(tmp_path):
+    path, embs, _ = _publish(tmp_path, shards=2)
+    hub = FastAPI()
+    for i in range(2):
+        hub.mount(f"/s{i}", create_app(i, tmp_path))
+    client = TestClient(hub)
+    # replika pertama shard 0 tidak ada (404) → dilewati, replika kedua menjawab
+    urls = [["http://testserver/dead", "http://testserver/s0"], ["http://testserver/s1"]]
+    remote = ShardSet(path, mode="remote", urls=urls, client=client)
+    stats = {}
+    flt = SearchFilter.resolve(file_types=["md"])
+    assert remote.search(embs[:2], 4, flt, stats) == ShardSet(path, mode="thread").search(embs[:2], 4, flt)
+    replicas = {p["shard"]: p["replica"] for p in stats["shards"]["per_shard"]}
+    assert replicas == {0: "http://testserver/s0", 1: "http://testserver/s1"}
+    status = remote.status()["replicas"][0]
+    assert status[0]["errors"] == 1 and status[0]["down"] is True
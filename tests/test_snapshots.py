@@ -0,0 +1,70 @@
+import pytest
+from app.snapshots import SnapshotManager, versions_dir, new_version_dir, publish
+
+def _publish(root):
+    d = new_version_dir(root)
+    (d / "marker").write_text("x")
+    return publish(root, d)
+
+def test_gc_keeps_versions_still_held_by_requests(tmp_path):
+    root = tmp_path
+    v1 = _publish(root)
+    mgr = SnapshotManager(root, lambda p: {"path": p}, keep=0)
+    mgr.load_initial()
+
+    with mgr.acquire() as s1:
+        assert s1.version == v1
+        v2 = _publish(root)
+        mgr.reload(wait=True)
+        with mgr.acquire() as s2:
+            assert s2.version == v2
+            v3 = _publish(root)
+            mgr.reload(wait=True)
+        # s2 dilepas: GC boleh menghapus v2, tapi v1 masih dipegang s1
+        assert (versions_dir(root) / v1).is_dir()
+        assert not (versions_dir(root) / v2).exists()
+    assert not (versions_dir(root) / v1).exists()
+    assert (versions_dir(root) / v3).is_dir()
+
+def test_reload_after_starting_without_an_index(tmp_path):
+    swapped = []
+    mgr = SnapshotManager(tmp_path, lambda p: {"path": p}, on_swap=swapped.append)
+    with pytest.raises(RuntimeError):
+        mgr.load_initial()
+    assert mgr.reload(wait=True)["status"] == "unchanged"
+    v1 = _publish(tmp_path)
+    status = mgr.reload(wait=True)
+    assert status == {"status": "ok", "version": v1, "error": None}
+    assert [s.version for s in swapped] == [v1]
+    with mgr.acquire() as snap:
+        assert snap.path == versions_dir(tmp_path) / v1
+
+def test_ask_uses_one_snapshot_for_answer_cache_and_retrieval(tmp_path, monkeypatch):
+    import asyncio
+    from app import server
+    from app.rag.cache import LRUCache
+    v1 = _publish(tmp_path)
+    mgr = SnapshotManager(tmp_path, lambda p: {"path": p, "info": {"type": "flat"}}, keep=0)
+    mgr.load_initial()
+    answers = LRUCache(maxsize=8, ttl=60)
+    seen = []
+
+    def retrieve(question, top_k, stats=None, flt=None, snap=None):
+        # index baru di-publish di tengah request: retrieval tetap memakai snapshot yang sama dengan key cache
+        mgr.reload(wait=True)
+        seen.append(snap.version)
+        return [("text", {"source": "a.txt"})]
+
+    async def generate(prompt):
+        return "answer"
+
+    monkeypatch.setattr(server, "SNAPSHOTS", mgr)
+    monkeypatch.setattr(server, "EMB", object())
+    monkeypatch.setattr(server, "_ANSWERS", answers)
+    monkeypatch.setattr(server, "_SEMANTIC", None)
+    monkeypatch.setattr(server, "retrieve", retrieve)
+    monkeypatch.setattr(server, "generate", generate)
+    _publish(tmp_path)
+    out = asyncio.run(server.ask(server.AskRequest(question="What is x?")))
+    assert seen == [v1] and out["metadata"]["index_version"] == v1
+    assert [key[5] for key in answers._data] == [v1]
@@ -0,0 +1,47 @@
+import os, sys, json, time, subprocess
+from fastapi.testclient import TestClient
+from app.core.startup import Startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_phases_accumulate_and_fork_resets_readiness():
+    st = Startup()
+    with st.phase("index"):
+        time.sleep(0.01)
+    st.record("index", 0.005)
+    assert st.phases["index"] >= 15
+    st.mark_ready()
+    st.forked()
+    status = st.status()
+    assert status["ready"] is False and status["preloaded"] is True
+    assert status["total_ms"] == st.phases["index"]
+
+def test_importing_apps_defers_heavy_modules():
+    heavy = ["faiss", "openai", "ollama", "torch", "sentence_transformers", "chromadb", "pypdf", "pytesseract",
+             "langchain_community"]
+    code = ("import sys, json, app.server, app.api.main; "
+            f"print(json.dumps([m for m in {heavy!r} if m in sys.modules]))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=os.environ.copy(), capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+
+def test_ready_turns_green_after_warm_up():
+    from app.api import main
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 10
+        r = client.get("/ready")
+        while r.status_code != 200 and time.monotonic() < deadline:
+            assert r.status_code == 503 and r.json()["ready"] is False
+            time.sleep(0.05)
+            r = client.get("/ready")
+        assert r.status_code == 200
+        assert "vector_store" in r.json()["phases_ms"]
+
+def test_first_index_swap_marks_a_failed_startup_ready(monkeypatch):
+    from app import server
+    st = Startup()
+    monkeypatch.setattr(server, "STARTUP", st)
+    monkeypatch.setattr(server, "EMB", object())
+    st.fail(RuntimeError("Index missing. Run: python -m app.ingest"))
+    server._index_swapped(None)
+    assert st.status()["ready"] is True and st.error is None
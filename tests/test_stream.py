@@ -0,0 +1,70 @@
+import json, os
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.fakes import FakeCrossEncoder
+from app.rag.cache import LRUCache
+
+@pytest.fixture(scope="module")
+def client():
+    from app.api import main
+    from app.ingest.indexer import build_index_from_dir
+    from app.rag.reranker import get_reranker
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+    with open(os.path.join(settings.DATA_DIR, "egypt.txt"), "w", encoding="utf-8") as f:
+        f.write("Cairo is the capital of Egypt. The pyramids of Giza are near Cairo.")
+    build_index_from_dir()
+    get_reranker()._model = FakeCrossEncoder()
+    with TestClient(main.app) as c:
+        yield c
+
+def _events(client, question):
+    """[(event, data)] dari respons SSE /ask/stream."""
+    with client.stream("POST", "/ask/stream", json={"question": question}) as r:
+        assert r.status_code == 200 and r.headers["content-type"].startswith("text/event-stream")
+        body = "".join(r.iter_text())
+    out = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+def test_stream_sends_sources_then_tokens_then_done(client, monkeypatch):
+    from app.api import main
+    monkeypatch.setattr(main, "_ANSWERS", None)
+    monkeypatch.setattr(main, "_SEMANTIC", None)
+    events = _events(client, "What is the capital of Egypt?")
+    kinds = [e for e, _ in events]
+    assert kinds[0] == "sources" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"token"} and len(kinds) > 3
+    assert any(s.startswith("egypt.txt") for s in events[0][1]["context_sources"])
+    answer = "".join(d["text"] for e, d in events if e == "token")
+    assert answer.startswith("Based on the context:")
+    meta = events[-1][1]["metadata"]
+    assert meta["completion_tokens"] == len(kinds) - 2 and meta["ttft_ms"] <= meta["latency_ms"]
+
+def test_stream_reports_generation_failure_as_error_event(client, monkeypatch):
+    from app.api import main
+    monkeypatch.setattr(main, "_ANSWERS", None)
+    monkeypatch.setattr(main, "_SEMANTIC", None)
+
+    async def broken(prompt, **kwargs):
+        yield "partial"
+        raise RuntimeError("llm went away")
+
+    monkeypatch.setattr(main, "astream_answer", broken)
+    events = _events(client, "Where are the pyramids of Giza?")
+    assert [e for e, _ in events] == ["sources", "token", "error"]
+    assert events[-1][1] == {"detail": "llm went away"}
+
+def test_stream_replays_a_cached_answer_as_one_token(client, monkeypatch):
+    from app.api import main
+    monkeypatch.setattr(main, "_ANSWERS", LRUCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(main, "_SEMANTIC", None)
+    first = _events(client, "Which city is the capital of Egypt?")
+    again = _events(client, "which city is the capital of egypt?")
+    assert first[-1][1]["metadata"]["cache"]["answer"] == "miss"
+    assert [e for e, _ in again] == ["sources", "token", "done"]
+    assert again[0][1] == first[0][1]
+    assert again[1][1]["text"] == "".join(d["text"] for e, d in first if e == "token")
+    assert again[-1][1]["metadata"]["cache"]["answer"] == "hit"
@@ -0,0 +1,35 @@
+import base64, os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.ingest.loader import _save_base64
+from app.ingest.uploads import UploadSizeLimit
+
+@pytest.mark.parametrize("wrap_from", [0, 5000])
+def test_save_base64_accepts_line_wrapping_anywhere(wrap_from):
+    raw = os.urandom(20000)
+    enc = base64.b64encode(raw).decode()
+    # bungkus per 76 karakter (MIME) mulai dari posisi `wrap_from`, juga melewati batas blok
+    head, tail = enc[:wrap_from], enc[wrap_from:]
+    wrapped = head + "\r\n".join(tail[i:i + 76] for i in range(0, len(tail), 76))
+    path = _save_base64("wrapped.bin", wrapped, block=1000)
+    with open(path, "rb") as f:
+        assert f.read() == raw
+
+def test_upload_size_limit_rejects_before_reading_body(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_MB", 1)
+    seen = []
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit)
+
+    @app.put("/ingest/upload/{name}")
+    async def put(name: str, request: Request):
+        seen.append(len(await request.body()))
+        return {"ok": True}
+
+    with TestClient(app) as c:
+        assert c.put("/ingest/upload/a.txt", content=b"x" * 100).status_code == 200
+        r = c.put("/ingest/upload/a.txt", content=b"x" * (1024 * 1024 + 1))
+        assert r.status_code == 413 and "UPLOAD_MAX_MB" in r.json()["detail"]
+    assert seen == [100]
@@ -0,0 +1,85 @@
+import pytest
+from app.core.fakes import FakeEmbeddings, FakeRateLimitError
+from app.ingest.upsert import UpsertScheduler, estimate_tokens, is_rate_limit
+
+def _items(n, words=10):
+    return [(f"id{i}", " ".join(f"w{i}_{j}" for j in range(words)), {"i": i}) for i in range(n)]
+
+class _Sink:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, ids, texts, metas, vectors):
+        assert len(ids) == len(texts) == len(metas) == len(vectors)
+        self.batches.append(list(ids))
+
+def test_batches_respect_item_and_token_budget_in_order():
+    items = _items(50)
+    sink = _Sink()
+    per_item = estimate_tokens(items[0][1])
+    sched = UpsertScheduler(FakeEmbeddings(16), sink, concurrency=3, max_tokens=per_item * 4, max_items=3)
+    stats = sched.run_stream(iter(items), total=len(items))
+
+    assert stats["chunks"] == 50 and stats["retries"] == 0
+    assert all(len(b) <= 3 for b in sink.batches)
+    # write_fn dipanggil berurutan sesuai input walau embedding paralel
+    assert [i for b in sink.batches for i in b] == [it[0] for it in items]
+
+def test_oversized_item_still_gets_its_own_batch():
+    items = [("big", "x " * 1000, {}), ("small", "y", {})]
+    sink = _Sink()
+    UpsertScheduler(FakeEmbeddings(16), sink, concurrency=1, max_tokens=10, max_items=10).run_stream(items)
+    assert sink.batches == [["big"], ["small"]]
+
+def test_rate_limit_backoff_retries_and_recovers_budget():
+    emb = FakeEmbeddings(16, rate_limit_every=3)
+    budgets = []
+    sink = _Sink()
+    sched = UpsertScheduler(emb, lambda *a: (sink(*a), budgets.append(sched._budget)), concurrency=2,
+                            max_tokens=4000, max_items=5, base_delay=0.001, max_delay=0.002)
+    stats = sched.run(*map(list, zip(*_items(60))))
+
+    assert stats["chunks"] == 60
+    assert stats["retries"] > 0
+    assert min(budgets) < sched.max_tokens
+    assert sorted(i for b in sink.batches for i in b) == sorted(f"id{i}" for i in range(60))
+
+    # setelah 429 berhenti, budget tumbuh kembali ke max_tokens
+    emb.rate_limit_every = 0
+    sched.run_stream(_items(100))
+    assert sched._budget == sched.max_tokens
+
+def test_budget_halves_on_rate_limit_and_grows_back():
+    sched = UpsertScheduler(FakeEmbeddings(16), _Sink(), max_tokens=1600)
+    sched._on_rate_limit()
+    sched._on_rate_limit()
+    assert sched._budget == 400
+    for _ in range(4):
+        sched._on_rate_limit()
+    assert sched._budget == 1600 // 16  # batas bawah
+    for _ in range(30):
+        sched._on_success()
+    assert sched._budget == 1600
+
+def test_gives_up_after_max_retries():
+    emb = FakeEmbeddings(16, rate_limit_every=1)
+    sched = UpsertScheduler(emb, _Sink(), concurrency=1, max_retries=2, base_delay=0.001, max_delay=0.001)
+    with pytest.raises(FakeRateLimitError):
+        sched.run_stream(_items(3))
+    assert emb.calls == 3  # 1 percobaan + 2 retry
+
+def test_rate_limit_detection_ignores_message_text():
+    class RateLimitError(Exception):
+        pass
+
+    class HTTPError(Exception):
+        def __init__(self, status):
+            super().__init__("boom")
+            self.response = type("R", (), {"status_code": status, "headers": {}})()
+
+    assert is_rate_limit(FakeRateLimitError("x"))
+    assert is_rate_limit(RateLimitError("x"))
+    assert is_rate_limit(HTTPError(429))
+    assert not is_rate_limit(HTTPError(500))
+    assert not is_rate_limit(ValueError("chunk id 4291 not found"))
+    assert not is_rate_limit(RuntimeError("GET https://api/429/items failed"))